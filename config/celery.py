@@ -13,7 +13,15 @@ app.conf.task_routes = {
     "scraper.tasks.comments_scraper_cron_task": {"queue": "scrapers_queue"},
     "scraper.tasks.main_page_threads_scraper_cron_task": {"queue": "scrapers_queue"},
     "scraper.tasks.new_threads_scraper_cron_task": {"queue": "scrapers_queue"},
+    "scraper.tasks.delete_expired_items_task": {"queue": "scrapers_queue"},
     "telegram_feed.tasks.send_alerts_task": {"queue": "send_messages_queue"},
+    # chunks are searched in parallel by the workers of their own queue, they only write messages to outbox,
+    # so send_messages_queue keeps one worker and one sender within telegram flood limits
+    "telegram_feed.tasks.send_alerts_chunk_task": {"queue": "search_alerts_queue"},
+    "telegram_feed.tasks.match_alerts_task": {"queue": "send_messages_queue"},
+    "telegram_feed.tasks.send_outbox_messages_task": {"queue": "send_messages_queue"},
+    # runs between alerts sending, so "already sent" rows aren't deleted while alerts are searched
+    "telegram_feed.tasks.delete_sent_alerts_task": {"queue": "send_messages_queue"},
     "telegram_feed.tasks.respond_to_messages_task": {"queue": "respond_to_updates_queue"},
 }
 
@@ -30,13 +38,28 @@ app.conf.beat_schedule = {
         "task": "scraper.tasks.comments_scraper_cron_task",
         "schedule": crontab(minute="*/1"),
     },
+    "delete_expired_items_task": {
+        "task": "scraper.tasks.delete_expired_items_task",
+        "schedule": crontab(hour="4", minute="0"),
+    },
+    "delete_sent_alerts_task": {
+        "task": "telegram_feed.tasks.delete_sent_alerts_task",
+        "schedule": crontab(minute="15"),
+    },
     "respond_to_messages_task": {
         "task": "telegram_feed.tasks.respond_to_messages_task",
         "schedule": 6.0,
     },
+    "send_outbox_messages_task": {
+        "task": "telegram_feed.tasks.send_outbox_messages_task",
+        "schedule": 5.0,
+        # tasks queued while previous one is still sending are dropped
+        "options": {"expires": 5.0},
+    },
+    # alerts are queued by match_alerts_task right after scraping, this catches up alerts it missed
     "send_alerts_task": {
         "task": "telegram_feed.tasks.send_alerts_task",
-        "schedule": 30,
+        "schedule": crontab(minute="*/5"),
     },
 }
 
@@ -103,6 +103,8 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
 CELERY_ENABLED = True
 broker_url = env("CELERY_BROKER_URL")
 result_backend = env("CELERY_RESULT_BACKEND")
@@ -110,9 +112,55 @@ result_backend = env("CELERY_RESULT_BACKEND")
 
 TELEGRAM_TOKEN = env("TELEGRAM_TOKEN")
 TELEGRAM_TOKEN_TEST = env("TELEGRAM_TOKEN_TEST")
+TELEGRAM_API_URL = env("TELEGRAM_API_URL", default="https://api.telegram.org/")
+# keep-alive connections to telegram API kept by a worker process, one per concurrent request
+TELEGRAM_CLIENT_POOL_SIZE = env.int("TELEGRAM_CLIENT_POOL_SIZE", default=30)
 
 
 HACKERNEWS_URL = "https://news.ycombinator.com/"
+# shared by all scrapers of a worker process
+HACKERNEWS_REQUESTS_PER_SECOND = env.float("HACKERNEWS_REQUESTS_PER_SECOND", default=2.0)
+HACKERNEWS_REQUESTS_BURST = env.int("HACKERNEWS_REQUESTS_BURST", default=2)
+HACKERNEWS_FETCH_WORKERS = env.int("HACKERNEWS_FETCH_WORKERS", default=4)
+# unchanged listing pages are skipped for at most this many seconds
+HACKERNEWS_PAGE_HASH_TIMEOUT = env.int("HACKERNEWS_PAGE_HASH_TIMEOUT", default=3600)
+# last saved state of threads, LRU (per worker process) or CACHE (Django cache, shared by workers with Redis)
+HACKERNEWS_THREAD_STATE_STORE = env("HACKERNEWS_THREAD_STATE_STORE", default="LRU")
+HACKERNEWS_THREAD_STATE_LRU_SIZE = env.int("HACKERNEWS_THREAD_STATE_LRU_SIZE", default=10000)
+HACKERNEWS_THREAD_STATE_TIMEOUT = env.int("HACKERNEWS_THREAD_STATE_TIMEOUT", default=3600)
+
+# threads and comments are deleted this many days after they were scraped
+ITEMS_RETENTION_DAYS = env.int("ITEMS_RETENTION_DAYS", default=30)
+ITEMS_RETENTION_BATCH_SIZE = env.int("ITEMS_RETENTION_BATCH_SIZE", default=5000)
+
+# ASYNC (concurrent, flood control aware) or SYNC (one message at a time)
+TELEGRAM_MESSAGE_SENDER = env("TELEGRAM_MESSAGE_SENDER", default="ASYNC")
+# telegram flood control limits: messages per second to all chats, seconds between messages to one chat
+TELEGRAM_MESSAGES_PER_SECOND = env.float("TELEGRAM_MESSAGES_PER_SECOND", default=30.0)
+TELEGRAM_CHAT_MESSAGE_INTERVAL = env.float("TELEGRAM_CHAT_MESSAGE_INTERVAL", default=1.0)
+TELEGRAM_GROUP_CHAT_MESSAGE_INTERVAL = env.float("TELEGRAM_GROUP_CHAT_MESSAGE_INTERVAL", default=3.0)
+TELEGRAM_SENDER_MAX_IN_FLIGHT = env.int("TELEGRAM_SENDER_MAX_IN_FLIGHT", default=30)
+# outbox messages claimed by one batch, failed messages are retried until max attempts
+TELEGRAM_OUTBOX_BATCH_SIZE = env.int("TELEGRAM_OUTBOX_BATCH_SIZE", default=300)
+TELEGRAM_OUTBOX_MAX_ATTEMPTS = env.int("TELEGRAM_OUTBOX_MAX_ATTEMPTS", default=5)
+
+# alert messages rendered by one alerts search task, kept for items sent to many feeds
+TELEGRAM_RENDER_CACHE_SIZE = env.int("TELEGRAM_RENDER_CACHE_SIZE", default=5000)
+
+# ICONTAINS (whole-word keywords are searched surrounded by spaces) or FULLTEXT (whole-word keywords and phrases
+# are searched in generated tsvector columns of thread titles and comment bodies)
+KEYWORD_MATCH_MODE = env("KEYWORD_MATCH_MODE", default="ICONTAINS")
+
+# seconds an alerts matcher of user feed predicates is kept by a worker process when it isn't invalidated by signals
+ALERT_MATCHER_MAX_AGE = env.int("ALERT_MATCHER_MAX_AGE", default=300)
+
+# user feeds searched for alerts by one send_alerts_chunk_task
+SEND_ALERTS_CHUNK_SIZE = env.int("SEND_ALERTS_CHUNK_SIZE", default=100)
+
+HACKERNEWS_API_URL = env("HACKERNEWS_API_URL", default="https://hacker-news.firebaseio.com/v0/")
+HACKERNEWS_API_REQUESTS_PER_SECOND = env.float("HACKERNEWS_API_REQUESTS_PER_SECOND", default=50.0)
+HACKERNEWS_API_REQUESTS_BURST = env.int("HACKERNEWS_API_REQUESTS_BURST", default=50)
+HACKERNEWS_API_FETCH_WORKERS = env.int("HACKERNEWS_API_FETCH_WORKERS", default=16)
 
 
 sentry_sdk.init(
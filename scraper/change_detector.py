@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable, Mapping
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+
+from scraper.types import ScrapedThreadData
+
+# score, comments count and title
+ThreadState = tuple[int, int, str]
+
+
+class LRUStore:
+    """Bounded in-process store, least recently used keys are evicted"""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.items: OrderedDict[Hashable, Any] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[Hashable]) -> dict[Hashable, Any]:
+        values = {}
+        with self.lock:
+            for key in keys:
+                if key in self.items:
+                    self.items.move_to_end(key)
+                    values[key] = self.items[key]
+
+        return values
+
+    def set_many(self, values: Mapping[Hashable, Any]) -> None:
+        with self.lock:
+            for key, value in values.items():
+                self.items[key] = value
+                self.items.move_to_end(key)
+
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+
+class CacheStore:
+    """Store in Django cache, shared by all scraper workers when cache is Redis"""
+
+    def __init__(self, key_prefix: str, timeout: int) -> None:
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+
+    def get_many(self, keys: Iterable[Hashable]) -> dict[Hashable, Any]:
+        keys_by_cache_key = {f"{self.key_prefix}:{key}": key for key in keys}
+        values = cache.get_many(list(keys_by_cache_key))
+
+        return {keys_by_cache_key[cache_key]: value for cache_key, value in values.items()}
+
+    def set_many(self, values: Mapping[Hashable, Any]) -> None:
+        cache.set_many({f"{self.key_prefix}:{key}": value for key, value in values.items()}, timeout=self.timeout)
+
+
+class ThreadChangeDetector:
+    """
+    Filter out scraped threads whose score, comments count and title did not change since they were saved
+
+    >>> thread_change_detector = ThreadChangeDetector(store=LRUStore(max_size=10000))
+    >>> changed_threads = thread_change_detector.filter_changed(scraped_threads)
+    >>> bulk_upsert(Thread, rows=changed_threads, ...)
+    >>> thread_change_detector.remember(changed_threads)
+    >>> thread_change_detector.skip_ratio
+    -> 0.85
+    """
+
+    def __init__(self, store: LRUStore | CacheStore) -> None:
+        self.store = store
+        self.checked_count = 0
+        self.skipped_count = 0
+
+    @property
+    def skip_ratio(self) -> float:
+        """share of checked threads that were skipped since detector was created"""
+
+        return self.skipped_count / self.checked_count if self.checked_count else 0.0
+
+    def filter_changed(self, scraped_threads: list[ScrapedThreadData]) -> list[ScrapedThreadData]:
+        thread_states = self.store.get_many(int(scraped_thread["thread_id"]) for scraped_thread in scraped_threads)
+
+        changed_threads = [
+            scraped_thread
+            for scraped_thread in scraped_threads
+            if thread_states.get(int(scraped_thread["thread_id"])) != get_thread_state(scraped_thread)
+        ]
+
+        self.checked_count += len(scraped_threads)
+        self.skipped_count += len(scraped_threads) - len(changed_threads)
+
+        return changed_threads
+
+    def remember(self, scraped_threads: list[ScrapedThreadData]) -> None:
+        self.store.set_many(
+            {int(scraped_thread["thread_id"]): get_thread_state(scraped_thread) for scraped_thread in scraped_threads}
+        )
+
+
+def get_thread_state(scraped_thread: ScrapedThreadData) -> ThreadState:
+    return (scraped_thread["score"], scraped_thread["comments_count"], scraped_thread["title"])
+
+
+def get_thread_state_store() -> LRUStore | CacheStore:
+    if settings.HACKERNEWS_THREAD_STATE_STORE == "CACHE":
+        return CacheStore(key_prefix="thread_state", timeout=settings.HACKERNEWS_THREAD_STATE_TIMEOUT)
+
+    return LRUStore(max_size=settings.HACKERNEWS_THREAD_STATE_LRU_SIZE)
+
+
+# one detector per worker process, its store is shared by all workers if HACKERNEWS_THREAD_STATE_STORE is CACHE
+thread_change_detector = ThreadChangeDetector(store=get_thread_state_store())
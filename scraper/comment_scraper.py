@@ -1,12 +1,14 @@
-from time import sleep
-
 from bs4 import BeautifulSoup
 from dateutil import parser, tz
 from django.conf import settings
+from django.db.models import Case, Value, When
+from lxml import html as lxml_html
 
-from scraper.models import Comment
-from scraper.types import ScrapedCommentData
-from scraper.utils import start_request_session
+from scraper.fetcher import PageFetcher
+from scraper.models import Comment, CommentIdGap, ScraperWatermark
+from scraper.types import ScrapedCommentData, UpsertStats
+from scraper.upsert import bulk_upsert
+from scraper.utils import parse_hn_timestamp, start_request_session
 
 
 class CommentScraper:
@@ -17,32 +19,113 @@ class CommentScraper:
     >>> comment_scraper = CommentScraper()
     >>> comment_scraper.scrape()
     -> <list[Comment]>
+
+    Comments are created or updated in one INSERT ... ON CONFLICT statement,
+    only inserted and updated comments are returned
+
+    Paging stops once the highest comment id scraped by previous run (watermark) is reached.
+    Without a watermark page_count pages are scraped. If the watermark is not reached after page_count pages,
+    paging continues up to max_page_count pages and unreached comment ids are saved as CommentIdGap
+    >>> comment_scraper = CommentScraper(page_count=5, max_page_count=20)
+    >>> comment_scraper.scrape()
+    -> <list[Comment]>
+    >>> comment_scraper.pages_fetched
+    -> 2
+
+    Parse pages with lxml XPath instead of BeautifulSoup
+    >>> comment_scraper = CommentScraper(parser_backend=CommentScraper.LXML_PARSER)
     """
 
-    def __init__(self, page_count: int = 10) -> None:
+    BS4_PARSER = "BS4"
+    LXML_PARSER = "LXML"
+
+    WATERMARK_NAME = "newcomments"
+    UPSERT_UPDATE_FIELDS = ["parent_comment", "thread_id_int", "body", "username", "comment_created_at"]
+
+    def __init__(
+        self, page_count: int = 10, max_page_count: int | None = None, parser_backend: str = BS4_PARSER
+    ) -> None:
         self.page_count = page_count
+        self.parser_backend = parser_backend
+        self.lxml_comment_parser = LxmlCommentParser()
+        self.max_page_count = max(max_page_count or page_count, page_count)
+        self.pages_fetched = 0
+        self.comment_id_gap: CommentIdGap | None = None
+        self.upsert_stats = UpsertStats()
         self.hn_request_session = start_request_session(domen=settings.HACKERNEWS_URL)
+        self.page_fetcher = PageFetcher(session=self.hn_request_session)
 
     def scrape(self) -> list[Comment]:
-        scraped_comments = []
+        watermark = ScraperWatermark.objects.filter(name=self.WATERMARK_NAME).first()
+
+        scraped_comments = self.scrape_newcomments_pages(watermark_comment_id=watermark.item_id if watermark else None)
+        if not scraped_comments:
+            return []
+
+        comments = self.create_or_update_comments(scraped_comments=scraped_comments)
+
+        # move watermark only after comments are saved
+        max_comment_id = max(int(scraped_comment["comment_id"]) for scraped_comment in scraped_comments)
+        if watermark is None:
+            ScraperWatermark.objects.create(name=self.WATERMARK_NAME, item_id=max_comment_id)
+        elif max_comment_id > watermark.item_id:
+            watermark.item_id = max_comment_id
+            watermark.save(update_fields=["item_id", "modified"])
+
+        return comments
+
+    def scrape_newcomments_pages(self, watermark_comment_id: int | None) -> list[ScrapedCommentData]:
+        scraped_comments: list[ScrapedCommentData] = []
 
+        # each page url depends on the last comment of the previous page, so pages are fetched in sequence
         last_comment_id = None
-        for _ in range(self.page_count):
-            sleep(0.5)
+        watermark_reached = False
+        for page_number in range(1, self.max_page_count + 1):
+            if watermark_comment_id is None and page_number > self.page_count:
+                break
 
             url = f"{settings.HACKERNEWS_URL}newcomments"
             if last_comment_id:
                 url += f"?next={last_comment_id}"
 
-            response = self.hn_request_session.get(url, timeout=30)
-            page = BeautifulSoup(response.text, "lxml")
+            page_html = self.page_fetcher.fetch(url)
+            self.pages_fetched += 1
+
+            scraped_comments_by_page = self.parse_page(page_html=page_html)
+            if not scraped_comments_by_page:
+                break
 
-            scraped_comments_by_page = self.parse_newcomments_page(bs4_page_data=page)
             last_comment_id = scraped_comments_by_page[-1]["comment_id"]
 
             scraped_comments.extend(scraped_comments_by_page)
 
-        return self.create_or_update_comments(scraped_comments=scraped_comments)
+            if watermark_comment_id is not None and int(last_comment_id) <= watermark_comment_id:
+                watermark_reached = True
+                break
+
+        if watermark_comment_id is not None and not watermark_reached and scraped_comments:
+            self.save_comment_id_gap(
+                watermark_comment_id=watermark_comment_id,
+                oldest_comment_id=min(int(scraped_comment["comment_id"]) for scraped_comment in scraped_comments),
+            )
+
+        return scraped_comments
+
+    def save_comment_id_gap(self, watermark_comment_id: int, oldest_comment_id: int) -> None:
+        """save comment ids between the watermark and the oldest scraped comment"""
+
+        if oldest_comment_id - watermark_comment_id <= 1:
+            return
+
+        self.comment_id_gap = CommentIdGap.objects.create(
+            start_comment_id=watermark_comment_id + 1, end_comment_id=oldest_comment_id - 1
+        )
+
+    def parse_page(self, page_html: str) -> list[ScrapedCommentData]:
+        if self.parser_backend == self.LXML_PARSER:
+            return self.lxml_comment_parser.parse(page_html=page_html)
+
+        return self.parse_newcomments_page(bs4_page_data=BeautifulSoup(page_html, "lxml"))
 
     def parse_newcomments_page(self, bs4_page_data: BeautifulSoup) -> list[ScrapedCommentData]:
         scraped_comments = []
@@ -59,14 +142,14 @@ class CommentScraper:
 
                 thread_id_int = row.find_all("span")[4].a["href"].replace("item?id=", "")
 
-                parent_comment = None
+                parent_comment_id_int = None
                 parent_id = row.find_all("a")[3]["href"].replace("item?id=", "")
                 if parent_id != thread_id_int:
-                    parent_comment = Comment.objects.filter(comment_id=parent_id).first()
+                    parent_comment_id_int = int(parent_id)
 
                 scraped_comment = ScrapedCommentData(
                     comment_id=row["id"],
-                    parent_comment=parent_comment,
+                    parent_comment_id_int=parent_comment_id_int,
                     thread_id_int=thread_id_int,
                     body=body_with_whitespaces,
                     username=row.find_all("a")[1].text,
@@ -77,11 +160,118 @@ class CommentScraper:
         return scraped_comments
 
     def create_or_update_comments(self, scraped_comments: list[ScrapedCommentData]) -> list[Comment]:
-        comments = []
-        for scraped_comment in scraped_comments:
-            comment, _ = Comment.objects.update_or_create(
-                comment_id=scraped_comment["comment_id"], defaults=dict(scraped_comment)
-            )
-            comments.append(comment)
-
+        comments, self.upsert_stats = create_or_update_comments(scraped_comments=scraped_comments)
         return comments
+
+
+class LxmlCommentParser:
+    """
+    Parse comments from Hacker News /newcomments page with lxml XPath,
+    output is identical to CommentScraper.parse_newcomments_page
+
+    >>> parser = LxmlCommentParser()
+    >>> parser.parse(page_html=page_html)
+    -> <list[ScrapedCommentData]>
+    """
+
+    COMMENT_ROWS_XPATH = "//tr[@class='athing' or starts-with(@class, 'athing ')]"
+
+    def parse(self, page_html: str) -> list[ScrapedCommentData]:
+        if not page_html.strip():
+            return []
+
+        page = lxml_html.fromstring(page_html)
+        return [self.parse_comment_data(data_row=row) for row in page.xpath(self.COMMENT_ROWS_XPATH)]
+
+    def parse_comment_data(self, data_row) -> ScrapedCommentData:
+        created_at = parse_hn_timestamp(data_row.find(".//span[@class='age']").get("title"))
+
+        body = data_row.find(".//div[@class='comment']//span").text_content()
+
+        thread_id_int = data_row.find(".//span[@class='onstory']/a").get("href").replace("item?id=", "")
+
+        parent_comment_id_int = None
+        parent_id = data_row.find(".//span[@class='navs']/a").get("href").replace("item?id=", "")
+        if parent_id != thread_id_int:
+            parent_comment_id_int = int(parent_id)
+
+        return ScrapedCommentData(
+            comment_id=data_row.get("id"),
+            parent_comment_id_int=parent_comment_id_int,
+            thread_id_int=thread_id_int,
+            # add whitespaces before and after for full word matching
+            body=f" {body} ",
+            username=data_row.find(".//a[@class='hnuser']").text_content(),
+            comment_created_at=created_at,
+        )
+
+
+def create_or_update_comments(scraped_comments: list[ScrapedCommentData]) -> tuple[list[Comment], UpsertStats]:
+    """
+    Create or update comments in one INSERT ... ON CONFLICT statement
+
+    Parent comments are resolved with one query, parents created in the same batch are set afterwards
+    """
+
+    parent_comment_ids = {
+        scraped_comment["parent_comment_id_int"]
+        for scraped_comment in scraped_comments
+        if scraped_comment["parent_comment_id_int"] is not None
+    }
+    comment_pks_by_comment_id = dict(
+        Comment.objects.filter(comment_id__in=parent_comment_ids).values_list("comment_id", "id")
+    )
+
+    comments_rows = []
+    for scraped_comment in scraped_comments:
+        comment_row = {k: v for k, v in scraped_comment.items() if k != "parent_comment_id_int"}
+        parent_comment_id = scraped_comment["parent_comment_id_int"]
+        comment_row["parent_comment"] = (
+            comment_pks_by_comment_id.get(parent_comment_id) if parent_comment_id is not None else None
+        )
+        comments_rows.append(comment_row)
+
+    comments, upsert_stats = bulk_upsert(
+        Comment, rows=comments_rows, unique_field="comment_id", update_fields=CommentScraper.UPSERT_UPDATE_FIELDS
+    )
+
+    set_parent_comments_from_batch(scraped_comments=scraped_comments, comments=comments)
+
+    return comments, upsert_stats
+
+
+def set_parent_comments_from_batch(scraped_comments: list[ScrapedCommentData], comments: list[Comment]) -> None:
+    """set parent comments that were created in the same batch as their replies"""
+
+    comment_pks_by_comment_id = {comment.comment_id: comment.pk for comment in comments}
+
+    parent_pks_by_comment_id = {}
+    for scraped_comment in scraped_comments:
+        parent_comment_id = scraped_comment["parent_comment_id_int"]
+        if parent_comment_id is None:
+            continue
+
+        parent_pk = comment_pks_by_comment_id.get(parent_comment_id)
+        comment_id = int(scraped_comment["comment_id"])
+        if parent_pk and comment_pks_by_comment_id.get(comment_id):
+            parent_pks_by_comment_id[comment_id] = parent_pk
+
+    comments_to_update = [
+        comment
+        for comment in comments
+        if comment.comment_id in parent_pks_by_comment_id
+        and comment.parent_comment_id != parent_pks_by_comment_id[comment.comment_id]
+    ]
+    if not comments_to_update:
+        return
+
+    Comment.objects.filter(pk__in=[comment.pk for comment in comments_to_update]).update(
+        parent_comment=Case(
+            *[
+                When(pk=comment.pk, then=Value(parent_pks_by_comment_id[comment.comment_id]))
+                for comment in comments_to_update
+            ]
+        )
+    )
+    for comment in comments_to_update:
+        comment.parent_comment_id = parent_pks_by_comment_id[comment.comment_id]
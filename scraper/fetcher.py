@@ -0,0 +1,104 @@
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep
+from typing import Any, TypeVar
+
+import requests
+from django.conf import settings
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter
+
+    >>> rate_limiter = TokenBucket(rate=2, capacity=2)
+    >>> rate_limiter.acquire()  # blocks until a token is available
+    """
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait_time = (1 - self.tokens) / self.rate
+
+            sleep(wait_time)
+
+
+# one limiter per worker process, shared by all scraper tasks
+hn_rate_limiter = TokenBucket(rate=settings.HACKERNEWS_REQUESTS_PER_SECOND, capacity=settings.HACKERNEWS_REQUESTS_BURST)
+hn_api_rate_limiter = TokenBucket(
+    rate=settings.HACKERNEWS_API_REQUESTS_PER_SECOND, capacity=settings.HACKERNEWS_API_REQUESTS_BURST
+)
+
+
+class PageFetcher:
+    """
+    Fetch Hacker News pages, concurrently if more than one worker is set
+
+    Every request waits for a token of shared rate limiter.
+
+    >>> from scraper.fetcher import PageFetcher
+    >>> page_fetcher = PageFetcher(session=start_request_session(domen=settings.HACKERNEWS_URL))
+    >>> page_fetcher.fetch_many(urls=[f"{settings.HACKERNEWS_URL}news?p={p}" for p in range(1, 11)])
+    -> <list[str]>
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        rate_limiter: TokenBucket = hn_rate_limiter,
+        max_workers: int = settings.HACKERNEWS_FETCH_WORKERS,
+    ) -> None:
+        self.session = session
+        self.rate_limiter = rate_limiter
+        self.max_workers = max_workers
+
+    def fetch(self, url: str) -> str:
+        self.rate_limiter.acquire()
+
+        response = self.session.get(url, timeout=30)
+        return response.text
+
+    def fetch_json(self, url: str) -> Any:
+        """fetch json document, None if it doesn't exist"""
+
+        self.rate_limiter.acquire()
+
+        response = self.session.get(url, timeout=30)
+        if response.status_code == 404:
+            return None
+
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_many(self, urls: list[str]) -> list[str]:
+        """fetch pages and return their bodies in the order of urls"""
+
+        return self.map(fetch=self.fetch, urls=urls)
+
+    def fetch_json_many(self, urls: list[str]) -> list[Any]:
+        return self.map(fetch=self.fetch_json, urls=urls)
+
+    def map(self, fetch: Callable[[str], T], urls: list[str]) -> list[T]:
+        if self.max_workers <= 1 or len(urls) <= 1:
+            return [fetch(url) for url in urls]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+            return list(executor.map(fetch, urls))
@@ -0,0 +1,250 @@
+from datetime import datetime
+from typing import Any
+
+from bs4 import BeautifulSoup
+from dateutil import tz
+from django.conf import settings
+
+from scraper.comment_scraper import create_or_update_comments
+from scraper.fetcher import PageFetcher, hn_api_rate_limiter
+from scraper.models import Comment, ScraperWatermark, Thread
+from scraper.thread_scraper import ThreadScraper
+from scraper.types import ScrapedCommentData, ScrapedThreadData, UpsertStats
+from scraper.upsert import bulk_upsert
+from scraper.utils import get_reversed_host, start_request_session
+
+
+class ItemAPIScraper:
+    """
+    Scrape and (create or update) threads and comments from Hacker News API (hacker-news.firebaseio.com)
+
+    Scrape threads from /newest or /news listings
+    >>> from scraper.item_api_scraper import ItemAPIScraper
+    >>> item_api_scraper = ItemAPIScraper()
+    >>> item_api_scraper.scrape_threads(page_to_scrape=ThreadScraper.NEWS, thread_count=300)
+    -> <list[Thread]>
+
+    Scrape items created after the last scraped item (watermark) and recently changed items
+    >>> item_api_scraper.scrape_items()
+    -> <tuple[list[Thread], list[Comment]]>
+    """
+
+    WATERMARK_NAME = "item_api"
+    LISTINGS = {ThreadScraper.NEWS: "topstories", ThreadScraper.NEWEST: "newstories"}
+    STORY_TYPES = ("story", "job", "poll")
+
+    # comments are linked to their thread by walking up parent chain
+    MAX_PARENT_CHAIN_DEPTH = 10
+
+    def __init__(self, max_items_count: int = 500) -> None:
+        self.max_items_count = max_items_count
+        self.threads_upsert_stats = UpsertStats()
+        self.comments_upsert_stats = UpsertStats()
+        self.api_request_session = start_request_session(domen=settings.HACKERNEWS_API_URL)
+        self.page_fetcher = PageFetcher(
+            session=self.api_request_session,
+            rate_limiter=hn_api_rate_limiter,
+            max_workers=settings.HACKERNEWS_API_FETCH_WORKERS,
+        )
+
+    def scrape_threads(self, page_to_scrape: str = ThreadScraper.NEWEST, thread_count: int = 30) -> list[Thread]:
+        thread_ids = (
+            self.page_fetcher.fetch_json(f"{settings.HACKERNEWS_API_URL}{self.LISTINGS[page_to_scrape]}.json") or []
+        )
+        items = self.fetch_items(item_ids=thread_ids[:thread_count])
+
+        return self.create_or_update_threads(items=items)
+
+    def scrape_items(self) -> tuple[list[Thread], list[Comment]]:
+        max_item_id = self.page_fetcher.fetch_json(f"{settings.HACKERNEWS_API_URL}maxitem.json")
+        if max_item_id is None:
+            return [], []
+
+        watermark = ScraperWatermark.objects.filter(name=self.WATERMARK_NAME).first()
+        first_item_id = watermark.item_id + 1 if watermark else max_item_id - self.max_items_count + 1
+        last_item_id = min(max_item_id, first_item_id + self.max_items_count - 1)
+
+        item_ids = list(range(first_item_id, last_item_id + 1))
+
+        # recently changed items (edited comments, story scores)
+        updates = self.page_fetcher.fetch_json(f"{settings.HACKERNEWS_API_URL}updates.json") or {}
+        item_ids += [item_id for item_id in updates.get("items", []) if item_id < first_item_id]
+
+        fetched_items = self.fetch_json_items(item_ids=item_ids)
+        items = get_available_items(items=fetched_items)
+
+        threads = self.create_or_update_threads(items=items)
+        comments = self.create_or_update_comments(items=items)
+
+        # new items that are not yet available (null) or failed to fetch are scraped again with the next items,
+        # while they are among max_items_count newest items
+        retried_item_ids = [
+            item_id
+            for item_id, item in zip(item_ids, fetched_items)
+            if item is None and first_item_id <= item_id and item_id > max_item_id - self.max_items_count
+        ]
+        scraped_item_id = min(retried_item_ids) - 1 if retried_item_ids else last_item_id
+
+        # move watermark only after items are saved
+        if watermark is None:
+            ScraperWatermark.objects.create(name=self.WATERMARK_NAME, item_id=scraped_item_id)
+        elif scraped_item_id > watermark.item_id:
+            watermark.item_id = scraped_item_id
+            watermark.save(update_fields=["item_id", "modified"])
+
+        return threads, comments
+
+    def fetch_items(self, item_ids: list[int]) -> list[dict[str, Any]]:
+        """fetch items concurrently, skip deleted, dead and not yet available items"""
+
+        return get_available_items(items=self.fetch_json_items(item_ids=item_ids))
+
+    def fetch_json_items(self, item_ids: list[int]) -> list[dict[str, Any] | None]:
+        """fetch items concurrently in the order of item ids, None if item is not available or failed to fetch"""
+
+        return self.page_fetcher.fetch_json_many(
+            urls=[f"{settings.HACKERNEWS_API_URL}item/{item_id}.json" for item_id in item_ids]
+        )
+
+    def create_or_update_threads(self, items: list[dict[str, Any]]) -> list[Thread]:
+        scraped_threads = [parse_story_item(item) for item in items if item.get("type") in self.STORY_TYPES]
+        if not scraped_threads:
+            return []
+
+        threads, self.threads_upsert_stats = bulk_upsert(
+            Thread, rows=scraped_threads, unique_field="thread_id", update_fields=ThreadScraper.UPSERT_UPDATE_FIELDS
+        )
+        return threads
+
+    def create_or_update_comments(self, items: list[dict[str, Any]]) -> list[Comment]:
+        comment_items = [item for item in items if item.get("type") == "comment"]
+        if not comment_items:
+            return []
+
+        thread_ids_by_item_id = self.find_thread_ids(items=items)
+
+        scraped_comments = []
+        for comment_item in comment_items:
+            thread_id = thread_ids_by_item_id.get(comment_item["id"])
+            if thread_id is None:
+                continue
+
+            scraped_comments.append(parse_comment_item(item=comment_item, thread_id=thread_id))
+
+        if not scraped_comments:
+            return []
+
+        comments, self.comments_upsert_stats = create_or_update_comments(scraped_comments=scraped_comments)
+        return comments
+
+    def find_thread_ids(self, items: list[dict[str, Any]]) -> dict[int, int]:
+        """
+        Find thread id of every comment by walking up parent chain
+
+        Parents are looked up in fetched items, then in the database, then fetched from API
+        """
+
+        items_by_id = {item["id"]: item for item in items}
+        thread_ids_by_item_id: dict[int, int] = {
+            item["id"]: item["id"] for item in items if item.get("type") in self.STORY_TYPES
+        }
+
+        for _ in range(self.MAX_PARENT_CHAIN_DEPTH):
+            unresolved_item_ids = resolve_thread_ids_from_parents(
+                items_by_id=items_by_id, thread_ids_by_item_id=thread_ids_by_item_id
+            )
+
+            unknown_parent_ids: set[int] = {
+                parent_id
+                for item_id in unresolved_item_ids
+                if (parent_id := items_by_id[item_id].get("parent")) is not None
+            }
+            unknown_parent_ids -= items_by_id.keys()
+            if not unknown_parent_ids:
+                return thread_ids_by_item_id
+
+            thread_ids_by_item_id.update(
+                Comment.objects.filter(comment_id__in=unknown_parent_ids).values_list("comment_id", "thread_id_int")
+            )
+            thread_ids_by_item_id.update(
+                (thread_id, thread_id)
+                for thread_id in Thread.objects.filter(thread_id__in=unknown_parent_ids).values_list(
+                    "thread_id", flat=True
+                )
+            )
+
+            # fetch parents that are missing in the database, they are used only to walk up the chain
+            missing_parent_ids = [item_id for item_id in unknown_parent_ids if item_id not in thread_ids_by_item_id]
+            parent_items = self.fetch_json_items(item_ids=missing_parent_ids)
+            for parent_id, parent_item in zip(missing_parent_ids, parent_items):
+                # unavailable parents are kept as empty items, so they aren't fetched again
+                items_by_id[parent_id] = parent_item or {"id": parent_id}
+                if parent_item and parent_item.get("type") in self.STORY_TYPES:
+                    thread_ids_by_item_id[parent_id] = parent_id
+
+        resolve_thread_ids_from_parents(items_by_id=items_by_id, thread_ids_by_item_id=thread_ids_by_item_id)
+        return thread_ids_by_item_id
+
+
+def get_available_items(items: list[dict[str, Any] | None]) -> list[dict[str, Any]]:
+    """skip deleted, dead and not yet available items"""
+
+    return [item for item in items if item and not item.get("deleted") and not item.get("dead")]
+
+
+def resolve_thread_ids_from_parents(
+    items_by_id: dict[int, dict[str, Any]], thread_ids_by_item_id: dict[int, int]
+) -> set[int]:
+    """set thread ids of comments whose parents are resolved, return ids of unresolved comments"""
+
+    unresolved_item_ids = {
+        item_id
+        for item_id, item in items_by_id.items()
+        if item.get("type") == "comment" and item_id not in thread_ids_by_item_id
+    }
+
+    resolved = True
+    while resolved:
+        resolved = False
+        for item_id in list(unresolved_item_ids):
+            parent_id = items_by_id[item_id].get("parent")
+            if parent_id in thread_ids_by_item_id:
+                thread_ids_by_item_id[item_id] = thread_ids_by_item_id[parent_id]
+                unresolved_item_ids.discard(item_id)
+                resolved = True
+
+    return unresolved_item_ids
+
+
+def parse_story_item(item: dict[str, Any]) -> ScrapedThreadData:
+    item_link = f"{settings.HACKERNEWS_URL}item?id={item['id']}"
+    link = item.get("url") or item_link
+
+    return ScrapedThreadData(
+        thread_id=item["id"],
+        # add whitespaces before and after thread title for full word matching
+        title=f" {item.get('title', '')} ",
+        link=link,
+        reversed_host=get_reversed_host(link),
+        creator_username=item.get("by"),
+        score=item.get("score", 0),
+        thread_created_at=datetime.fromtimestamp(item["time"], tz=tz.UTC),
+        comments_count=item.get("descendants", 0),
+        # exclude YC hiring posts, same as html scraper
+        comments_link=None if item.get("type") == "job" else item_link,
+    )
+
+
+def parse_comment_item(item: dict[str, Any], thread_id: int) -> ScrapedCommentData:
+    body = BeautifulSoup(item.get("text", ""), "lxml").text
+    parent_id = item.get("parent")
+
+    return ScrapedCommentData(
+        comment_id=item["id"],
+        parent_comment_id_int=parent_id if parent_id != thread_id else None,
+        thread_id_int=thread_id,
+        # add whitespaces before and after for full word matching
+        body=f" {body} ",
+        username=item.get("by", ""),
+        comment_created_at=datetime.fromtimestamp(item["time"], tz=tz.UTC),
+    )
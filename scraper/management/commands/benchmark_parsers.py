@@ -0,0 +1,57 @@
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper.comment_scraper import CommentScraper
+from scraper.recorded_pages import RECORDED_PAGES_DIR, load_recorded_pages
+from scraper.thread_scraper import ThreadScraper
+
+
+class Command(BaseCommand):
+    help = "Compare speed and output of BeautifulSoup and lxml parser backends on recorded Hacker News pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages-dir", type=Path, default=RECORDED_PAGES_DIR)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        pages_dir = options["pages_dir"]
+        repeat = options["repeat"]
+
+        pages = [
+            (page_type, page_html)
+            for page_type, pages_html in load_recorded_pages(pages_dir=pages_dir).items()
+            for page_html in pages_html
+        ]
+        if not pages:
+            raise CommandError(f"No recorded pages found in {pages_dir}")
+
+        results = {}
+        for parser_backend in (ThreadScraper.BS4_PARSER, ThreadScraper.LXML_PARSER):
+            parse_functions = {
+                "news": ThreadScraper(page_to_scrape=ThreadScraper.NEWS, parser_backend=parser_backend).parse_page,
+                "newest": ThreadScraper(page_to_scrape=ThreadScraper.NEWEST, parser_backend=parser_backend).parse_page,
+                "newcomments": CommentScraper(parser_backend=parser_backend).parse_page,
+            }
+
+            started_at = perf_counter()
+            for _ in range(repeat):
+                parsed_pages = [parse_functions[page_type](page_html=page_html) for page_type, page_html in pages]
+            elapsed = perf_counter() - started_at
+
+            rows_count = sum(len(parsed_page) for parsed_page in parsed_pages) * repeat
+            results[parser_backend] = (parsed_pages, elapsed)
+
+            self.stdout.write(
+                f"{parser_backend}: {len(pages) * repeat / elapsed:.1f} pages/sec, "
+                f"{rows_count / elapsed:.1f} rows/sec ({elapsed:.3f}s)"
+            )
+
+        bs4_parsed_pages, bs4_elapsed = results[ThreadScraper.BS4_PARSER]
+        lxml_parsed_pages, lxml_elapsed = results[ThreadScraper.LXML_PARSER]
+
+        if bs4_parsed_pages != lxml_parsed_pages:
+            raise CommandError("Parser backends returned different output")
+
+        self.stdout.write(self.style.SUCCESS(f"Output is identical, lxml is {bs4_elapsed / lxml_elapsed:.1f}x faster"))
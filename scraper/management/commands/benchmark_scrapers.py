@@ -0,0 +1,110 @@
+from collections.abc import Callable
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from scraper.comment_scraper import CommentScraper
+from scraper.recorded_pages import RECORDED_PAGES_DIR, load_recorded_pages
+from scraper.thread_scraper import ThreadScraper
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark parsing (pages/sec) and database upsert (rows/sec) of scrapers on recorded Hacker News pages. "
+        "Rows are written to the configured database and rolled back, so it runs only against a test or benchmark "
+        "database (DBNAME starting with test or containing benchmark) unless --force is passed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages-dir", type=Path, default=RECORDED_PAGES_DIR)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--parser-backend",
+            choices=[ThreadScraper.BS4_PARSER, ThreadScraper.LXML_PARSER],
+            default=ThreadScraper.LXML_PARSER,
+        )
+        parser.add_argument("--force", action="store_true", help="run against any database")
+
+    def handle(self, *args, **options):
+        database_name = connection.settings_dict["NAME"]
+        if not options["force"] and not is_benchmark_database(database_name):
+            raise CommandError(
+                f"Refusing to write benchmark rows into {database_name} database, "
+                "set DBNAME to a test or benchmark database or pass --force"
+            )
+
+        pages = load_recorded_pages(pages_dir=options["pages_dir"])
+        if not any(pages.values()):
+            raise CommandError(f"No recorded pages found in {options['pages_dir']}")
+
+        repeat = options["repeat"]
+        parser_backend = options["parser_backend"]
+
+        with transaction.atomic():
+            for upsert_mode in (ThreadScraper.UPDATE_OR_CREATE, ThreadScraper.BULK_UPSERT):
+                for page_to_scrape, page_type in ((ThreadScraper.NEWS, "news"), (ThreadScraper.NEWEST, "newest")):
+                    thread_scraper = ThreadScraper(
+                        page_to_scrape=page_to_scrape, upsert_mode=upsert_mode, parser_backend=parser_backend
+                    )
+                    self.benchmark_scraper(
+                        name=f"ThreadScraper /{page_type} {upsert_mode}",
+                        parse_page=thread_scraper.parse_page,
+                        create_or_update=thread_scraper.create_or_update_threads,
+                        pages_html=pages[page_type],
+                        repeat=repeat,
+                    )
+
+            comment_scraper = CommentScraper(parser_backend=parser_backend)
+            self.benchmark_scraper(
+                name="CommentScraper /newcomments",
+                parse_page=comment_scraper.parse_page,
+                create_or_update=comment_scraper.create_or_update_comments,
+                pages_html=pages["newcomments"],
+                repeat=repeat,
+            )
+
+            transaction.set_rollback(True)
+
+    def benchmark_scraper(
+        self,
+        name: str,
+        parse_page: Callable[..., list[Any]],
+        create_or_update: Callable[[list[Any]], Any],
+        pages_html: list[str],
+        repeat: int,
+    ) -> None:
+        if not pages_html:
+            self.stdout.write(f"{name}: no recorded pages")
+            return
+
+        started_at = perf_counter()
+        for _ in range(repeat):
+            scraped_rows = [row for page_html in pages_html for row in parse_page(page_html=page_html)]
+        parse_elapsed = perf_counter() - started_at
+
+        # every scraper starts from the same database state
+        with transaction.atomic():
+            # first upsert inserts rows, next ones update rows or leave them unchanged
+            started_at = perf_counter()
+            create_or_update(scraped_rows)
+            insert_elapsed = perf_counter() - started_at
+
+            started_at = perf_counter()
+            for _ in range(repeat):
+                create_or_update(scraped_rows)
+            upsert_elapsed = perf_counter() - started_at
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{name}: parse {len(pages_html) * repeat / parse_elapsed:.1f} pages/sec, "
+            f"insert {len(scraped_rows) / insert_elapsed:.1f} rows/sec, "
+            f"upsert {len(scraped_rows) * repeat / upsert_elapsed:.1f} rows/sec"
+        )
+
+
+def is_benchmark_database(database_name: str) -> bool:
+    return database_name.startswith("test") or "benchmark" in database_name
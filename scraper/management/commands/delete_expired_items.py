@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from scraper.retention import delete_expired_items
+
+
+class Command(BaseCommand):
+    help = "Delete threads and comments created more than --days ago, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.ITEMS_RETENTION_DAYS)
+        parser.add_argument("--batch-size", type=int, default=settings.ITEMS_RETENTION_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        deleted_counts = delete_expired_items(retention_days=options["days"], batch_size=options["batch_size"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {deleted_counts['comments_deleted']} comments and {deleted_counts['threads_deleted']} threads"
+            )
+        )
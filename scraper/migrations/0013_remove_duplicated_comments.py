@@ -0,0 +1,74 @@
+from django.db import migrations
+
+# sent comments of user feeds, m2m fields referencing duplicated comments
+USER_FEED_COMMENTS_FIELDS = ["comments", "subscription_comments", "reply_comments", "followed_user_comments"]
+
+# duplicated comments with the first created comment of their comment_id
+DUPLICATED_COMMENTS_SQL = """
+    WITH duplicated_comment AS (
+        SELECT id, kept_comment_id FROM (
+            SELECT id, MIN(id) OVER (PARTITION BY comment_id) AS kept_comment_id FROM {comment_table}
+        ) AS comment_with_kept_comment
+        WHERE id <> kept_comment_id
+    )
+"""
+
+
+def remove_duplicated_comments(apps, schema_editor):
+    """
+    keep the first created comment of each comment_id, repoint replies and sent comments of user feeds to it
+
+    Sent comments are repointed, so alerts of kept comments are not sent again
+    """
+
+    Comment = apps.get_model("scraper", "Comment")
+    UserFeed = apps.get_model("telegram_feed", "UserFeed")
+
+    qn = schema_editor.connection.ops.quote_name
+    comment_table = qn(Comment._meta.db_table)
+    duplicated_comments_sql = DUPLICATED_COMMENTS_SQL.format(comment_table=comment_table)
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"{duplicated_comments_sql} "
+            f"UPDATE {comment_table} SET parent_comment_id = duplicated_comment.kept_comment_id "
+            f"FROM duplicated_comment WHERE {comment_table}.parent_comment_id = duplicated_comment.id"
+        )
+
+        for field_name in USER_FEED_COMMENTS_FIELDS:
+            field = UserFeed._meta.get_field(field_name)
+            through_table = qn(field.remote_field.through._meta.db_table)
+            user_feed_column = qn(field.m2m_column_name())
+            comment_column = qn(field.m2m_reverse_name())
+
+            # pairs already sent with kept comment are skipped
+            cursor.execute(
+                f"{duplicated_comments_sql} "
+                f"INSERT INTO {through_table} ({user_feed_column}, {comment_column}) "
+                f"SELECT DISTINCT sent.{user_feed_column}, duplicated_comment.kept_comment_id "
+                f"FROM {through_table} AS sent "
+                f"JOIN duplicated_comment ON sent.{comment_column} = duplicated_comment.id "
+                f"ON CONFLICT DO NOTHING"
+            )
+            cursor.execute(
+                f"{duplicated_comments_sql} "
+                f"DELETE FROM {through_table} USING duplicated_comment "
+                f"WHERE {through_table}.{comment_column} = duplicated_comment.id"
+            )
+
+        cursor.execute(
+            f"{duplicated_comments_sql} "
+            f"DELETE FROM {comment_table} USING duplicated_comment WHERE {comment_table}.id = duplicated_comment.id"
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("scraper", "0012_thread_creator_username_comment_username_upper_index_and_more"),
+        # sent comments m2m tables reference duplicated comments
+        ("telegram_feed", "0016_userfeed_followed_user_comments_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicated_comments, migrations.RunPython.noop),
+    ]
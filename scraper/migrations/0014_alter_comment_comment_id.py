@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-17 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0013_remove_duplicated_comments"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="comment",
+            name="comment_id",
+            field=models.PositiveIntegerField(unique=True, verbose_name="comment id"),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.1.7 on 2026-10-17 19:21
+
+from django.db import migrations, models
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0014_alter_comment_comment_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CommentIdGap",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "created",
+                    model_utils.fields.AutoCreatedField(
+                        default=django.utils.timezone.now, editable=False, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    model_utils.fields.AutoLastModifiedField(
+                        default=django.utils.timezone.now, editable=False, verbose_name="modified"
+                    ),
+                ),
+                ("start_comment_id", models.PositiveBigIntegerField(verbose_name="first missed comment id")),
+                ("end_comment_id", models.PositiveBigIntegerField(verbose_name="last missed comment id")),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="ScraperWatermark",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "created",
+                    model_utils.fields.AutoCreatedField(
+                        default=django.utils.timezone.now, editable=False, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    model_utils.fields.AutoLastModifiedField(
+                        default=django.utils.timezone.now, editable=False, verbose_name="modified"
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True, verbose_name="scraper name")),
+                ("item_id", models.PositiveBigIntegerField(verbose_name="highest processed item id")),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.1.7 on 2026-10-17 19:34
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # indexes are built without locking writes of scrapers
+    atomic = False
+
+    dependencies = [
+        ("scraper", "0015_commentidgap_scraperwatermark"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="comment",
+            index=models.Index(fields=["created"], name="comment_created_index"),
+        ),
+        AddIndexConcurrently(
+            model_name="thread",
+            index=models.Index(fields=["created"], name="thread_created_index"),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # indexes are built concurrently, without locking writes of scrapers.
+    # Adding the stored generated columns rewrites scraper_thread and scraper_comment under an ACCESS EXCLUSIVE
+    # lock, scrapers are blocked for the whole rewrite, so stop them while the migration runs
+    atomic = False
+
+    dependencies = [
+        ("scraper", "0016_created_indexes"),
+    ]
+
+    # columns are generated by postgres and aren't model fields, Django would try to write them on insert
+    operations = [
+        migrations.RunSQL(
+            sql=(
+                "ALTER TABLE scraper_thread ADD COLUMN title_search_vector tsvector "
+                "GENERATED ALWAYS AS (to_tsvector('simple', title)) STORED"
+            ),
+            reverse_sql="ALTER TABLE scraper_thread DROP COLUMN title_search_vector",
+        ),
+        migrations.RunSQL(
+            sql=(
+                "ALTER TABLE scraper_comment ADD COLUMN body_search_vector tsvector "
+                "GENERATED ALWAYS AS (to_tsvector('simple', body)) STORED"
+            ),
+            reverse_sql="ALTER TABLE scraper_comment DROP COLUMN body_search_vector",
+        ),
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX CONCURRENTLY title_search_vector_index "
+                "ON scraper_thread USING GIN (title_search_vector)"
+            ),
+            reverse_sql="DROP INDEX CONCURRENTLY title_search_vector_index",
+        ),
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX CONCURRENTLY body_search_vector_index "
+                "ON scraper_comment USING GIN (body_search_vector)"
+            ),
+            reverse_sql="DROP INDEX CONCURRENTLY body_search_vector_index",
+        ),
+    ]
@@ -0,0 +1,30 @@
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # indexes are built without locking writes of scrapers
+    atomic = False
+
+    dependencies = [
+        ("scraper", "0017_search_vectors"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="comment",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("body"), name="gin_trgm_ops"
+                ),
+                name="body_upper_gin_index",
+            ),
+        ),
+        # hash index can't serve LIKE, body isn't searched by equality
+        RemoveIndexConcurrently(
+            model_name="comment",
+            name="scraper_com_body_ecb520_hash",
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+from scraper.utils import get_reversed_host
+
+
+def set_reversed_hosts(apps, schema_editor):
+    """set reversed hosts of saved threads in batches, new threads get it from scrapers"""
+
+    Thread = apps.get_model("scraper", "Thread")
+
+    last_pk = 0
+    while True:
+        threads = list(Thread.objects.filter(pk__gt=last_pk).order_by("pk").only("pk", "link")[:1000])
+        if not threads:
+            break
+
+        for thread in threads:
+            thread.reversed_host = get_reversed_host(thread.link)
+
+        Thread.objects.bulk_update(threads, fields=["reversed_host"])
+        last_pk = threads[-1].pk
+
+
+class Migration(migrations.Migration):
+    # index is built without locking writes of scrapers, batches are committed one by one
+    atomic = False
+
+    dependencies = [
+        ("scraper", "0018_body_upper_gin_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="thread",
+            name="reversed_host",
+            field=models.CharField(default="", max_length=255, verbose_name="story link reversed host"),
+        ),
+        migrations.RunPython(set_reversed_hosts, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="thread",
+            index=models.Index(
+                fields=["reversed_host"], name="thread_reversed_host_index", opclasses=["varchar_pattern_ops"]
+            ),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.contrib.postgres.indexes import GinIndex, OpClass, HashIndex
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
 from django.db.models.functions import Upper
 from model_utils.models import TimeStampedModel
@@ -9,6 +9,8 @@ class Thread(TimeStampedModel, models.Model):
 
     thread_id = models.PositiveBigIntegerField(unique=True, help_text="thread id")
     link = models.URLField(max_length=2000, verbose_name="story link")
+    # host of story link with reversed labels ("com.example.blog."), searched by domain name alerts
+    reversed_host = models.CharField(max_length=255, default="", verbose_name="story link reversed host")
     title = models.CharField(max_length=100, verbose_name="thread title", db_index=True)
     creator_username = models.CharField(max_length=15, null=True, verbose_name="thread creator username")
     score = models.IntegerField(null=True, verbose_name="thread score")
@@ -16,6 +18,9 @@ class Thread(TimeStampedModel, models.Model):
     comments_count = models.IntegerField(null=True, verbose_name="thread comments count")
     comments_link = models.URLField(max_length=250, null=True, verbose_name="link to thread comments")
 
+    # generated tsvector columns with GIN indexes (migration 0017), searched by full text keyword matching
+    SEARCH_VECTOR_COLUMNS = {"title": "title_search_vector"}
+
     def __str__(self):
         return f"({self.pk}) {self.title} by {self.creator_username}"
 
@@ -27,6 +32,11 @@ class Thread(TimeStampedModel, models.Model):
             models.Index(Upper("creator_username"), name="creator_upper_index"),
             GinIndex(fields=["creator_username"], name="creator_gin_index", opclasses=["gin_trgm_ops"]),
             GinIndex(OpClass(Upper("creator_username"), name="gin_trgm_ops"), name="creator_upper_gin_index"),
+            models.Index(fields=["created"], name="thread_created_index"),
+            # domain and subdomains lookup, reversed_host LIKE 'com.example.%'
+            models.Index(
+                fields=["reversed_host"], name="thread_reversed_host_index", opclasses=["varchar_pattern_ops"]
+            ),
         ]
 
 
@@ -35,19 +45,44 @@ class Comment(TimeStampedModel, models.Model):
 
     thread = models.ForeignKey(Thread, on_delete=models.SET_NULL, null=True, related_name="comments")
     parent_comment = models.ForeignKey("self", on_delete=models.SET_NULL, null=True, related_name="child_comments")
-    comment_id = models.PositiveIntegerField(verbose_name="comment id", db_index=True)
+    comment_id = models.PositiveIntegerField(verbose_name="comment id", unique=True)
     thread_id_int = models.PositiveIntegerField(verbose_name="thread id")
     comment_created_at = models.DateTimeField(verbose_name="parsed comment date of creation")
     username = models.CharField(max_length=20, verbose_name="comment's creator username")
     body = models.CharField(max_length=20000, verbose_name="comment's text body")
 
+    # generated tsvector columns with GIN indexes (migration 0017), searched by full text keyword matching
+    SEARCH_VECTOR_COLUMNS = {"body": "body_search_vector"}
+
     def __str__(self):
         return f"({self.pk}) {self.body[:100]}"
 
     class Meta:
         indexes = [
-            HashIndex(fields=("body",)),
+            # substring search of keywords, UPPER(body) LIKE UPPER(pattern)
+            GinIndex(OpClass(Upper("body"), name="gin_trgm_ops"), name="body_upper_gin_index"),
             models.Index(Upper("username"), name="username_upper_index"),
             GinIndex(fields=["username"], name="username_gin_index", opclasses=["gin_trgm_ops"]),
             GinIndex(OpClass(Upper("username"), name="gin_trgm_ops"), name="username_upper_gin_index"),
+            models.Index(fields=["created"], name="comment_created_index"),
         ]
+
+
+class ScraperWatermark(TimeStampedModel, models.Model):
+    """Highest Hacker News item id processed by a scraper"""
+
+    name = models.CharField(max_length=50, unique=True, verbose_name="scraper name")
+    item_id = models.PositiveBigIntegerField(verbose_name="highest processed item id")
+
+    def __str__(self):
+        return f"({self.pk}) {self.name}: {self.item_id}"
+
+
+class CommentIdGap(TimeStampedModel, models.Model):
+    """Range of comment ids that scraper could not reach (inclusive)"""
+
+    start_comment_id = models.PositiveBigIntegerField(verbose_name="first missed comment id")
+    end_comment_id = models.PositiveBigIntegerField(verbose_name="last missed comment id")
+
+    def __str__(self):
+        return f"({self.pk}) {self.start_comment_id}-{self.end_comment_id}"
@@ -0,0 +1,53 @@
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+# relative ages ("2 hours ago") change on every fetch, absolute timestamps are kept in age span titles
+RELATIVE_AGE_RE = re.compile(r">\d+ (?:minute|hour|day|month|year)s? ago<")
+
+
+class PageHashCache:
+    """
+    Last seen hash of page body per url, kept in Django cache
+
+    New hashes are saved only on commit, after rows of the page are created or updated,
+    so a failed run doesn't hide page changes from the next one
+    >>> page_hash_cache = PageHashCache()
+    >>> page_hash_cache.is_unchanged(url=url, page_html=page_html)
+    -> False
+    >>> page_hash_cache.commit()
+    >>> page_hash_cache.is_unchanged(url=url, page_html=page_html)
+    -> True
+    """
+
+    KEY_PREFIX = "page_hash"
+
+    def __init__(self, timeout: int = settings.HACKERNEWS_PAGE_HASH_TIMEOUT) -> None:
+        self.timeout = timeout
+        self.pending_hashes: dict[str, str] = {}
+
+    def is_unchanged(self, url: str, page_html: str) -> bool:
+        page_hash = get_page_hash(page_html=page_html)
+        if cache.get(self.get_key(url=url)) == page_hash:
+            return True
+
+        self.pending_hashes[url] = page_hash
+        return False
+
+    def commit(self) -> None:
+        if not self.pending_hashes:
+            return
+
+        cache.set_many(
+            {self.get_key(url=url): page_hash for url, page_hash in self.pending_hashes.items()}, timeout=self.timeout
+        )
+        self.pending_hashes = {}
+
+    def get_key(self, url: str) -> str:
+        return f"{self.KEY_PREFIX}:{url}"
+
+
+def get_page_hash(page_html: str) -> str:
+    return hashlib.blake2b(RELATIVE_AGE_RE.sub("><", page_html).encode(), digest_size=16).hexdigest()
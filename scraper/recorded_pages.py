@@ -0,0 +1,59 @@
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+
+# pages recorded for scraper tests, also used by benchmark commands
+RECORDED_PAGES_DIR = Path(__file__).parent / "tests" / "fixtures" / "html"
+RECORDED_PAGE_TYPES = ("news", "newest", "newcomments")
+
+
+class RecordedPagesAdapter(BaseAdapter):
+    """
+    Transport adapter serving recorded Hacker News pages instead of news.ycombinator.com
+
+    Page file is selected by url path and query: news?p=2 is served from news_p2.html,
+    newcomments?next=35159969 from newcomments_next35159969.html, missing pages respond with 404
+    >>> session = start_request_session(domen=settings.HACKERNEWS_URL)
+    >>> session.mount(settings.HACKERNEWS_URL, RecordedPagesAdapter())
+    """
+
+    def __init__(self, pages_dir: Path = RECORDED_PAGES_DIR) -> None:
+        super().__init__()
+        self.pages_dir = pages_dir
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        url = urlsplit(request.url)
+        page_name = url.path.strip("/") + "".join(f"_{key}{value}" for key, value in parse_qsl(url.query))
+        page_path = self.pages_dir / f"{page_name}.html"
+
+        response = Response()
+        response.request = request
+        response.url = request.url
+        response.encoding = "utf-8"
+
+        if page_path.exists():
+            response.status_code = 200
+            response.headers["Content-Type"] = "text/html; charset=utf-8"
+            response._content = page_path.read_bytes()
+        else:
+            response.status_code = 404
+            response._content = b""
+
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def load_recorded_pages(pages_dir: Path = RECORDED_PAGES_DIR) -> dict[str, list[str]]:
+    """html of recorded pages by page type, taken from file name prefix: news*.html, newest*.html, newcomments*.html"""
+
+    pages: dict[str, list[str]] = {page_type: [] for page_type in RECORDED_PAGE_TYPES}
+    for page_path in sorted(pages_dir.glob("*.html")):
+        page_type = page_path.stem.split("_")[0]
+        if page_type in pages:
+            pages[page_type].append(page_path.read_text())
+
+    return pages
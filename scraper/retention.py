@@ -0,0 +1,46 @@
+import datetime
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from scraper.models import Comment, Thread
+
+
+def delete_in_batches(queryset: QuerySet, batch_size: int = 5000) -> int:
+    """
+    Delete rows of queryset in batches of primary keys, every batch is a separate short transaction
+
+    Returns count of deleted rows of queryset model (related rows are not counted)
+    """
+
+    deleted_count = 0
+    while True:
+        batch_pks = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if not batch_pks:
+            return deleted_count
+
+        _, deleted_by_model = queryset.model.objects.filter(pk__in=batch_pks).delete()
+        deleted_count += deleted_by_model.get(queryset.model._meta.label, 0)
+
+
+def delete_expired_items(
+    retention_days: int = settings.ITEMS_RETENTION_DAYS, batch_size: int = settings.ITEMS_RETENTION_BATCH_SIZE
+) -> dict[str, int]:
+    """
+    Delete threads and comments created more than retention_days ago
+
+    Subscribed threads and their comments are kept, alerts only look at items of the last day
+    """
+
+    date_to = timezone.now() - datetime.timedelta(days=retention_days)
+
+    subscribed_thread_ids = Thread.objects.filter(subscription_user_feeds__isnull=False).values("thread_id")
+
+    expired_comments = Comment.objects.filter(created__lt=date_to).exclude(thread_id_int__in=subscribed_thread_ids)
+    expired_threads = Thread.objects.filter(created__lt=date_to, subscription_user_feeds__isnull=True)
+
+    return {
+        "comments_deleted": delete_in_batches(expired_comments, batch_size=batch_size),
+        "threads_deleted": delete_in_batches(expired_threads, batch_size=batch_size),
+    }
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# sent by scraper tasks after threads and comments are saved, with pks of inserted and updated items
+# >>> items_upserted.send(sender=ThreadScraper, thread_ids=[1, 2], comment_ids=[])
+items_upserted = Signal()
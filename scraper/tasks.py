@@ -1,30 +1,120 @@
+from collections.abc import Sequence
+from dataclasses import asdict
+
 from config import celery_app
 from scraper.comment_scraper import CommentScraper
+from scraper.item_api_scraper import ItemAPIScraper
+from scraper.models import Comment, Thread
+from scraper.retention import delete_expired_items
+from scraper.signals import items_upserted
 from scraper.thread_scraper import ThreadScraper
 
+# ingestion backends, selected by "backend" task argument
+HTML_BACKEND = "HTML"
+ITEM_API_BACKEND = "ITEM_API"
+
 
 @celery_app.task
-def new_threads_scraper_cron_task() -> int:
+def new_threads_scraper_cron_task(backend: str = HTML_BACKEND) -> dict[str, int | float]:
     """scrape threads from /newest page"""
 
-    newest_page_thread_scraper = ThreadScraper()
+    if backend == ITEM_API_BACKEND:
+        item_api_scraper = ItemAPIScraper()
+        threads = item_api_scraper.scrape_threads(page_to_scrape=ThreadScraper.NEWEST, thread_count=30)
+        send_items_upserted(sender=ItemAPIScraper, threads=threads)
+        return asdict(item_api_scraper.threads_upsert_stats)
+
+    newest_page_thread_scraper = ThreadScraper(
+        upsert_mode=ThreadScraper.BULK_UPSERT,
+        parser_backend=ThreadScraper.LXML_PARSER,
+        skip_unchanged_pages=True,
+        skip_unchanged_threads=True,
+    )
     threads = newest_page_thread_scraper.scrape()
-    return len(threads)
+    send_items_upserted(sender=ThreadScraper, threads=threads)
+    return get_thread_scraper_result(thread_scraper=newest_page_thread_scraper)
 
 
 @celery_app.task
-def main_page_threads_scraper_cron_task() -> int:
+def main_page_threads_scraper_cron_task(backend: str = HTML_BACKEND) -> dict[str, int | float]:
     """scrape threads from /news page"""
 
-    main_page_thread_scraper = ThreadScraper(page_to_scrape=ThreadScraper.NEWS, news_page_count=10)
+    if backend == ITEM_API_BACKEND:
+        item_api_scraper = ItemAPIScraper()
+        threads = item_api_scraper.scrape_threads(page_to_scrape=ThreadScraper.NEWS, thread_count=300)
+        send_items_upserted(sender=ItemAPIScraper, threads=threads)
+        return asdict(item_api_scraper.threads_upsert_stats)
+
+    main_page_thread_scraper = ThreadScraper(
+        page_to_scrape=ThreadScraper.NEWS,
+        news_page_count=10,
+        upsert_mode=ThreadScraper.BULK_UPSERT,
+        parser_backend=ThreadScraper.LXML_PARSER,
+        skip_unchanged_pages=True,
+        skip_unchanged_threads=True,
+    )
     threads = main_page_thread_scraper.scrape()
-    return len(threads)
+    send_items_upserted(sender=ThreadScraper, threads=threads)
+    return get_thread_scraper_result(thread_scraper=main_page_thread_scraper)
 
 
 @celery_app.task
-def comments_scraper_cron_task() -> int:
-    """scrape comments from /newcomments page"""
+def comments_scraper_cron_task(backend: str = HTML_BACKEND) -> dict[str, int]:
+    """scrape comments from /newcomments page down to the last scraped comment"""
+
+    if backend == ITEM_API_BACKEND:
+        # new stories are walked together with comments
+        item_api_scraper = ItemAPIScraper()
+        threads, comments = item_api_scraper.scrape_items()
+        send_items_upserted(sender=ItemAPIScraper, threads=threads, comments=comments)
+        return {
+            **asdict(item_api_scraper.comments_upsert_stats),
+            "threads_inserted": item_api_scraper.threads_upsert_stats.inserted,
+            "threads_updated": item_api_scraper.threads_upsert_stats.updated,
+        }
 
-    comment_scraper = CommentScraper(page_count=5)
+    comment_scraper = CommentScraper(page_count=5, max_page_count=20, parser_backend=CommentScraper.LXML_PARSER)
     comments = comment_scraper.scrape()
-    return len(comments)
+    send_items_upserted(sender=CommentScraper, comments=comments)
+
+    comment_id_gap = comment_scraper.comment_id_gap
+    return {
+        **asdict(comment_scraper.upsert_stats),
+        "pages_fetched": comment_scraper.pages_fetched,
+        "missed_comment_ids": (
+            comment_id_gap.end_comment_id - comment_id_gap.start_comment_id + 1 if comment_id_gap else 0
+        ),
+    }
+
+
+@celery_app.task
+def delete_expired_items_task() -> dict[str, int]:
+    """delete threads and comments older than retention period"""
+
+    return delete_expired_items()
+
+
+def send_items_upserted(sender: type, threads: Sequence[Thread] = (), comments: Sequence[Comment] = ()) -> None:
+    """notify receivers (alerts matching) about inserted and updated threads and comments"""
+
+    if not threads and not comments:
+        return
+
+    items_upserted.send(
+        sender=sender,
+        thread_ids=[thread.pk for thread in threads],
+        comment_ids=[comment.pk for comment in comments],
+    )
+
+
+def get_thread_scraper_result(thread_scraper: ThreadScraper) -> dict[str, int | float]:
+    upsert_stats = thread_scraper.upsert_stats
+    scraped_count = upsert_stats.inserted + upsert_stats.updated + upsert_stats.unchanged + upsert_stats.skipped
+
+    return {
+        **asdict(upsert_stats),
+        "pages_skipped": thread_scraper.pages_skipped,
+        # share of scraped threads that did not reach the database, in this run and since worker start
+        "skip_ratio": upsert_stats.skipped / scraped_count if scraped_count else 0.0,
+        "total_skip_ratio": thread_scraper.thread_change_detector.skip_ratio,
+    }
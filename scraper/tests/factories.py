@@ -4,12 +4,14 @@ from factory import Faker
 from factory.django import DjangoModelFactory
 
 from scraper.models import Comment, Thread
+from scraper.utils import get_reversed_host
 
 
 class ThreadFactory(DjangoModelFactory):
     thread_id = factory.Sequence(lambda n: n)
     title = Faker("sentence")
     link = Faker("url")
+    reversed_host = factory.LazyAttribute(lambda thread: get_reversed_host(thread.link))
     comments_link = Faker("url")
     score = Faker("pyint")
     comments_count = Faker("pyint")
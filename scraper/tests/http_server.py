@@ -0,0 +1,37 @@
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+class QuietHTTPRequestHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalHTTPServer:
+    """
+    Stand-in for Hacker News servers, serves files of a directory on a random local port
+
+    >>> with LocalHTTPServer(directory=FIXTURES_DIR / "item_api") as server:
+    ...     requests.get(f"{server.url}v0/maxitem.json")
+    """
+
+    HOST = "127.0.0.1"
+
+    def __init__(self, directory: Path) -> None:
+        handler = partial(QuietHTTPRequestHandler, directory=str(directory))
+        self.server = ThreadingHTTPServer((self.HOST, 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.HOST}:{self.server.server_port}/"
+
+    def __enter__(self) -> "LocalHTTPServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.shutdown()
+        self.server.server_close()
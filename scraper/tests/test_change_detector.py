@@ -0,0 +1,42 @@
+from django.core.cache import cache
+
+from scraper.change_detector import CacheStore, LRUStore, ThreadChangeDetector
+from scraper.tests.test_upsert import get_scraped_thread
+
+
+class TestLRUStore:
+    def test_least_recently_used_keys_are_evicted(self):
+        lru_store = LRUStore(max_size=2)
+        lru_store.set_many({1: "a", 2: "b"})
+        lru_store.get_many([1])
+        lru_store.set_many({3: "c"})
+
+        assert lru_store.get_many([1, 2, 3]) == {1: "a", 3: "c"}
+
+
+class TestThreadChangeDetector:
+    def test_filter_changed(self):
+        thread_change_detector = ThreadChangeDetector(store=LRUStore(max_size=100))
+        thread_change_detector.remember([get_scraped_thread(thread_id=1), get_scraped_thread(thread_id=2)])
+
+        changed_threads = thread_change_detector.filter_changed(
+            [get_scraped_thread(thread_id=1), get_scraped_thread(thread_id=2, score=5), get_scraped_thread(thread_id=3)]
+        )
+
+        assert [changed_thread["thread_id"] for changed_thread in changed_threads] == [2, 3]
+        assert thread_change_detector.skip_ratio == 1 / 3
+
+    def test_filter_changed_with_cache_store(self):
+        cache.clear()
+        thread_change_detector = ThreadChangeDetector(store=CacheStore(key_prefix="thread_state_test", timeout=60))
+        thread_change_detector.remember([get_scraped_thread(thread_id=1)])
+
+        # store is shared by detectors of all workers
+        other_thread_change_detector = ThreadChangeDetector(
+            store=CacheStore(key_prefix="thread_state_test", timeout=60)
+        )
+        changed_threads = other_thread_change_detector.filter_changed(
+            [get_scraped_thread(thread_id=1), get_scraped_thread(thread_id=2)]
+        )
+
+        assert [changed_thread["thread_id"] for changed_thread in changed_threads] == [2]
@@ -0,0 +1,34 @@
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from scraper.models import Comment, Thread
+
+
+class TestBenchmarkParsersCommand:
+    def test_benchmark_parsers(self):
+        stdout = StringIO()
+        call_command("benchmark_parsers", repeat=1, stdout=stdout)
+
+        assert "Output is identical" in stdout.getvalue()
+
+
+class TestBenchmarkScrapersCommand:
+    @pytest.mark.django_db
+    def test_benchmark_scrapers(self):
+        stdout = StringIO()
+        call_command("benchmark_scrapers", repeat=1, stdout=stdout)
+
+        assert "ThreadScraper /news BULK_UPSERT: parse" in stdout.getvalue()
+        assert "CommentScraper /newcomments: parse" in stdout.getvalue()
+        assert Thread.objects.count() == 0
+        assert Comment.objects.count() == 0
+
+    @pytest.mark.django_db
+    def test_benchmark_scrapers_refuses_production_database(self):
+        with mock.patch.dict(connection.settings_dict, NAME="hackernews_alerts"):
+            with pytest.raises(CommandError, match="Refusing to write benchmark rows into hackernews_alerts"):
+                call_command("benchmark_scrapers", repeat=1, stdout=StringIO())
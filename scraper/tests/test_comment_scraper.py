@@ -1,18 +1,131 @@
+from unittest import mock
+
 import pytest
+from django.conf import settings
+from django.utils import timezone
 
 from scraper.comment_scraper import CommentScraper
+from scraper.models import Comment, CommentIdGap, ScraperWatermark
+from scraper.tests.factories import CommentFactory
+from scraper.recorded_pages import RECORDED_PAGES_DIR, RecordedPagesAdapter
+from scraper.types import ScrapedCommentData, UpsertStats
+
+
+def get_scraped_comment(comment_id: int, parent_comment_id_int: int | None) -> ScrapedCommentData:
+    return ScrapedCommentData(
+        comment_id=comment_id,
+        parent_comment_id_int=parent_comment_id_int,
+        thread_id_int=100,
+        body=f" comment {comment_id} ",
+        username="testuser123",
+        comment_created_at=timezone.now(),
+    )
+
+
+def get_scraped_pages(newest_comment_id: int, page_count: int) -> list[list[ScrapedCommentData]]:
+    """pages of 10 comments with descending ids"""
+
+    comment_ids = list(range(newest_comment_id, newest_comment_id - page_count * 10, -1))
+    return [
+        [
+            get_scraped_comment(comment_id=comment_id, parent_comment_id_int=None)
+            for comment_id in comment_ids[i : i + 10]
+        ]
+        for i in range(0, len(comment_ids), 10)
+    ]
 
 
 class TestCommentScraper:
     @pytest.mark.django_db
     def test_scraping_newcomments_page(self):
         """
-        Test scraping news.ycombinator.com/newcomments page
+        Test scraping recorded news.ycombinator.com/newcomments pages
 
         scraper should create/update 90 Comment objects
         """
 
         comment_scraper = CommentScraper(page_count=3)
+        comment_scraper.hn_request_session.mount(settings.HACKERNEWS_URL, RecordedPagesAdapter())
         comments = comment_scraper.scrape()
 
         assert len(comments) == 90
+
+    @pytest.mark.django_db
+    def test_create_or_update_comments_resolves_parent_comments(self):
+        """
+        Test parent comments resolution
+
+        parent comments are resolved from the database and from the same batch of scraped comments
+        """
+
+        parent_comment = CommentFactory.create(comment_id=1, thread_id_int=100)
+
+        scraped_comments = [
+            get_scraped_comment(comment_id=4, parent_comment_id_int=3),
+            get_scraped_comment(comment_id=3, parent_comment_id_int=None),
+            get_scraped_comment(comment_id=2, parent_comment_id_int=1),
+        ]
+
+        comment_scraper = CommentScraper(page_count=1)
+        comments = comment_scraper.create_or_update_comments(scraped_comments=scraped_comments)
+        comments_by_comment_id = {comment.comment_id: comment for comment in comments}
+
+        assert len(comments) == 3
+        assert comment_scraper.upsert_stats == UpsertStats(inserted=3, updated=0, unchanged=0)
+        assert Comment.objects.get(comment_id=2).parent_comment == parent_comment
+        assert Comment.objects.get(comment_id=4).parent_comment == comments_by_comment_id[3]
+        assert comments_by_comment_id[4].parent_comment_id == comments_by_comment_id[3].pk
+
+        comments = comment_scraper.create_or_update_comments(scraped_comments=scraped_comments)
+
+        assert comments == []
+        assert comment_scraper.upsert_stats == UpsertStats(inserted=0, updated=0, unchanged=3)
+
+    @pytest.mark.django_db
+    def test_scrape_stops_at_watermark(self):
+        ScraperWatermark.objects.create(name=CommentScraper.WATERMARK_NAME, item_id=25)
+
+        comment_scraper = CommentScraper(page_count=5, max_page_count=10)
+        pages = get_scraped_pages(newest_comment_id=40, page_count=10)
+
+        with (
+            mock.patch.object(comment_scraper.page_fetcher, "fetch", return_value=""),
+            mock.patch.object(comment_scraper, "parse_newcomments_page", side_effect=pages),
+        ):
+            comments = comment_scraper.scrape()
+
+        assert comment_scraper.pages_fetched == 2
+        assert len(comments) == 20
+        assert comment_scraper.comment_id_gap is None
+        assert ScraperWatermark.objects.get(name=CommentScraper.WATERMARK_NAME).item_id == 40
+
+    @pytest.mark.django_db
+    def test_scrape_saves_comment_id_gap(self):
+        ScraperWatermark.objects.create(name=CommentScraper.WATERMARK_NAME, item_id=5)
+
+        comment_scraper = CommentScraper(page_count=1, max_page_count=2)
+        pages = get_scraped_pages(newest_comment_id=100, page_count=2)
+
+        with (
+            mock.patch.object(comment_scraper.page_fetcher, "fetch", return_value=""),
+            mock.patch.object(comment_scraper, "parse_newcomments_page", side_effect=pages),
+        ):
+            comment_scraper.scrape()
+
+        comment_id_gap = CommentIdGap.objects.get()
+
+        assert comment_scraper.pages_fetched == 2
+        assert (comment_id_gap.start_comment_id, comment_id_gap.end_comment_id) == (6, 80)
+        assert ScraperWatermark.objects.get(name=CommentScraper.WATERMARK_NAME).item_id == 100
+
+
+class TestLxmlCommentParser:
+    @pytest.mark.parametrize("page_name", ["newcomments", "newcomments_next35159969", "newcomments_next35159891"])
+    def test_output_is_identical_to_bs4_parser(self, page_name):
+        page_html = (RECORDED_PAGES_DIR / f"{page_name}.html").read_text()
+
+        bs4_comments = CommentScraper().parse_page(page_html=page_html)
+        lxml_comments = CommentScraper(parser_backend=CommentScraper.LXML_PARSER).parse_page(page_html=page_html)
+
+        assert len(lxml_comments) == 30
+        assert lxml_comments == bs4_comments
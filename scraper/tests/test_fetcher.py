@@ -0,0 +1,28 @@
+from time import monotonic
+from unittest import mock
+
+from scraper.fetcher import PageFetcher, TokenBucket
+
+
+class TestTokenBucket:
+    def test_acquire_throttles_after_burst(self):
+        rate_limiter = TokenBucket(rate=20, capacity=2)
+
+        started_at = monotonic()
+        for _ in range(4):
+            rate_limiter.acquire()
+
+        # burst of 2 requests is free, 2 more requests wait 1/20 sec each
+        assert monotonic() - started_at >= 0.09
+
+
+class TestPageFetcher:
+    def test_fetch_many_keeps_urls_order(self):
+        session = mock.Mock()
+        session.get.side_effect = lambda url, timeout: mock.Mock(text=f"page {url}")
+
+        page_fetcher = PageFetcher(session=session, rate_limiter=TokenBucket(rate=1000, capacity=10), max_workers=4)
+        pages = page_fetcher.fetch_many(urls=[f"news?p={p}" for p in range(1, 11)])
+
+        assert pages == [f"page news?p={p}" for p in range(1, 11)]
+        assert session.get.call_count == 10
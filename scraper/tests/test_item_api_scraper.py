@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import pytest
+
+from scraper.item_api_scraper import ItemAPIScraper
+from scraper.models import Comment, ScraperWatermark, Thread
+from scraper.tests.factories import CommentFactory, ThreadFactory
+from scraper.tests.http_server import LocalHTTPServer
+from scraper.thread_scraper import ThreadScraper
+from scraper.types import UpsertStats
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+@pytest.fixture
+def item_api_server(settings):
+    with LocalHTTPServer(directory=FIXTURES_DIR / "item_api") as server:
+        settings.HACKERNEWS_API_URL = f"{server.url}v0/"
+        yield server
+
+
+class TestItemAPIScraper:
+    @pytest.mark.django_db
+    def test_scrape_threads(self, item_api_server):
+        item_api_scraper = ItemAPIScraper()
+        threads = item_api_scraper.scrape_threads(page_to_scrape=ThreadScraper.NEWEST, thread_count=30)
+
+        threads_by_thread_id = {thread.thread_id: thread for thread in threads}
+        ask_hn_thread = threads_by_thread_id[35160003]
+        job_thread = threads_by_thread_id[35160004]
+
+        assert item_api_scraper.threads_upsert_stats == UpsertStats(inserted=3, updated=0, unchanged=0)
+        assert ask_hn_thread.title == " Ask HN: How do you monitor keywords? "
+        assert ask_hn_thread.link == "https://news.ycombinator.com/item?id=35160003"
+        assert ask_hn_thread.reversed_host == "com.ycombinator.news."
+        assert ask_hn_thread.comments_link == "https://news.ycombinator.com/item?id=35160003"
+        assert job_thread.comments_link is None
+
+    @pytest.mark.django_db
+    def test_scrape_items(self, item_api_server):
+        ScraperWatermark.objects.create(name=ItemAPIScraper.WATERMARK_NAME, item_id=35160000)
+        ThreadFactory.create(thread_id=35157489, score=100)
+        CommentFactory.create(comment_id=35150000, thread_id_int=35140000)
+
+        item_api_scraper = ItemAPIScraper()
+        threads, comments = item_api_scraper.scrape_items()
+
+        comments_by_comment_id = {comment.comment_id: comment for comment in comments}
+
+        assert sorted(thread.thread_id for thread in threads) == [35157489, 35160003, 35160004]
+        assert Thread.objects.get(thread_id=35157489).score == 123
+        assert sorted(comments_by_comment_id) == [35160001, 35160002, 35160005, 35160009, 35160010]
+        assert (
+            comments_by_comment_id[35160001].body
+            == " Nice planner! Does it handle potato beds too?Asking for a friend. "
+        )
+        assert comments_by_comment_id[35160001].parent_comment is None
+        assert comments_by_comment_id[35160002].parent_comment == comments_by_comment_id[35160001]
+        assert comments_by_comment_id[35160002].thread_id_int == 35157489
+        assert comments_by_comment_id[35160005].thread_id_int == 35158000
+        assert comments_by_comment_id[35160009].thread_id_int == 35140000
+        assert not Comment.objects.filter(comment_id__in=[35159000, 35160006, 35160007]).exists()
+        # 35160008 is not yet available, it is scraped again with the next items
+        assert ScraperWatermark.objects.get(name=ItemAPIScraper.WATERMARK_NAME).item_id == 35160007
+
+    @pytest.mark.django_db
+    def test_scrape_items_skips_old_not_available_item(self, item_api_server):
+        ScraperWatermark.objects.create(name=ItemAPIScraper.WATERMARK_NAME, item_id=35160007)
+        CommentFactory.create(comment_id=35150000, thread_id_int=35140000)
+
+        item_api_scraper = ItemAPIScraper(max_items_count=2)
+        threads, comments = item_api_scraper.scrape_items()
+
+        assert [comment.comment_id for comment in comments] == [35160009]
+        # 35160008 is older than 2 newest items, it isn't retried
+        assert ScraperWatermark.objects.get(name=ItemAPIScraper.WATERMARK_NAME).item_id == 35160009
+
+    @pytest.mark.django_db
+    def test_scrape_items_without_max_item_id(self, item_api_server, settings):
+        settings.HACKERNEWS_API_URL = f"{item_api_server.url}missing/"
+
+        item_api_scraper = ItemAPIScraper()
+
+        assert item_api_scraper.scrape_items() == ([], [])
+        assert not ScraperWatermark.objects.exists()
@@ -0,0 +1,31 @@
+import pytest
+from django.core.cache import cache
+
+from scraper.page_cache import PageHashCache, get_page_hash
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+class TestPageHashCache:
+    def test_page_hash_is_saved_on_commit(self):
+        page_hash_cache = PageHashCache()
+
+        assert not page_hash_cache.is_unchanged(url="https://news.ycombinator.com/news?p=5", page_html="<html></html>")
+        assert not page_hash_cache.is_unchanged(url="https://news.ycombinator.com/news?p=5", page_html="<html></html>")
+
+        page_hash_cache.commit()
+
+        assert page_hash_cache.is_unchanged(url="https://news.ycombinator.com/news?p=5", page_html="<html></html>")
+        assert not page_hash_cache.is_unchanged(url="https://news.ycombinator.com/news?p=6", page_html="<html></html>")
+
+    def test_page_hash_ignores_relative_ages(self):
+        page_html = '<span class="age" title="2023-03-14T12:34:56"><a href="item?id=35157489">{}</a></span>'
+
+        assert get_page_hash(page_html.format("2 hours ago")) == get_page_hash(page_html.format("3 hours ago"))
+        assert get_page_hash(page_html.format("1 minute ago")) == get_page_hash(page_html.format("1 day ago"))
+        assert get_page_hash(page_html.format("2 hours ago")) != get_page_hash(
+            page_html.replace("12:34:56", "12:34:57").format("2 hours ago")
+        )
@@ -0,0 +1,52 @@
+import datetime
+
+import pytest
+from django.utils import timezone
+
+from scraper.models import Comment, Thread
+from scraper.retention import delete_expired_items, delete_in_batches
+from scraper.tests.factories import CommentFactory, ThreadFactory
+from telegram_feed.tests.factories import UserFeedFactory
+
+
+class TestRetention:
+    @pytest.mark.django_db
+    def test_delete_in_batches(self):
+        ThreadFactory.create_batch(5)
+
+        deleted_count = delete_in_batches(Thread.objects.all(), batch_size=2)
+
+        assert deleted_count == 5
+        assert not Thread.objects.exists()
+
+    @pytest.mark.django_db
+    def test_delete_expired_items(self):
+        expired_at = timezone.now() - datetime.timedelta(days=31)
+
+        expired_thread = ThreadFactory.create(created=expired_at)
+        subscribed_thread = ThreadFactory.create(created=expired_at)
+        recent_thread = ThreadFactory.create()
+
+        expired_comment = CommentFactory.create(thread=expired_thread, created=expired_at)
+        subscribed_thread_comment = CommentFactory.create(
+            thread=subscribed_thread, thread_id_int=subscribed_thread.thread_id, created=expired_at
+        )
+        recent_comment = CommentFactory.create(thread=expired_thread, parent_comment=expired_comment)
+
+        user_feed = UserFeedFactory.create(
+            threads=[expired_thread, recent_thread],
+            comments=[expired_comment],
+            subscription_threads=[subscribed_thread],
+        )
+
+        deleted_counts = delete_expired_items(retention_days=30, batch_size=1)
+
+        recent_comment.refresh_from_db()
+
+        assert deleted_counts == {"comments_deleted": 1, "threads_deleted": 1}
+        assert set(Thread.objects.all()) == {subscribed_thread, recent_thread}
+        assert set(Comment.objects.all()) == {subscribed_thread_comment, recent_comment}
+        assert recent_comment.thread is None
+        assert recent_comment.parent_comment is None
+        assert list(user_feed.threads.all()) == [recent_thread]
+        assert not user_feed.comments.exists()
@@ -1,18 +1,29 @@
+from datetime import datetime
+from unittest import mock
+
 import pytest
+from dateutil import parser, tz
+from django.conf import settings
+from django.core.cache import cache
 
+from scraper.change_detector import LRUStore, ThreadChangeDetector
+from scraper.models import Thread
+from scraper.recorded_pages import RECORDED_PAGES_DIR, RecordedPagesAdapter
 from scraper.thread_scraper import ThreadScraper
+from scraper.utils import get_reversed_host, parse_hn_timestamp
 
 
 class TestThreadScraper:
     @pytest.mark.django_db
     def test_scraping_main_page(self):
         """
-        Test scraping news.ycombinator.com/news page
+        Test scraping recorded news.ycombinator.com/news page
 
         scraper should create/update 30 Thread objects
         """
 
         main_page_thread_scraper = ThreadScraper(page_to_scrape=ThreadScraper.NEWS)
+        main_page_thread_scraper.hn_request_session.mount(settings.HACKERNEWS_URL, RecordedPagesAdapter())
         threads = main_page_thread_scraper.scrape()
 
         thread_with_score = next((thread for thread in threads if thread.score is not None), None)
@@ -26,10 +37,11 @@ class TestThreadScraper:
     @pytest.mark.django_db
     def test_scraping_newest_page(self):
         """
-        Test scraping news.ycombinator.com/newest page
+        Test scraping recorded news.ycombinator.com/newest page
         """
 
         newest_page_thread_scraper = ThreadScraper()
+        newest_page_thread_scraper.hn_request_session.mount(settings.HACKERNEWS_URL, RecordedPagesAdapter())
         threads = newest_page_thread_scraper.scrape()
 
         thread_with_score = next((thread for thread in threads if thread.score is not None), None)
@@ -39,3 +51,137 @@ class TestThreadScraper:
         assert thread_with_score is not None
         assert thread_with_comments_count is not None
         assert len(threads) == 30
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize("parser_backend", [ThreadScraper.BS4_PARSER, ThreadScraper.LXML_PARSER])
+    def test_scraping_job_and_no_url_threads(self, parser_backend):
+        main_page_thread_scraper = ThreadScraper(
+            page_to_scrape=ThreadScraper.NEWS,
+            news_page_count=2,
+            upsert_mode=ThreadScraper.BULK_UPSERT,
+            parser_backend=parser_backend,
+        )
+        main_page_thread_scraper.hn_request_session.mount(settings.HACKERNEWS_URL, RecordedPagesAdapter())
+        threads = main_page_thread_scraper.scrape()
+
+        job_threads = [thread for thread in threads if "Is Hiring" in thread.title]
+        ask_hn_thread = next(thread for thread in threads if thread.title.startswith(" Ask HN:"))
+
+        assert len(threads) == 60
+        assert len(job_threads) == 3
+        assert all(thread.comments_link is None for thread in job_threads)
+        assert all(thread.creator_username is None and thread.score == 0 for thread in job_threads)
+        assert (
+            ask_hn_thread.link
+            == ask_hn_thread.comments_link
+            == f"https://news.ycombinator.com/item?id={ask_hn_thread.thread_id}"
+        )
+        assert ask_hn_thread.reversed_host == "com.ycombinator.news."
+        assert all(thread.reversed_host == get_reversed_host(thread.link) for thread in threads)
+
+
+class TestSkipUnchangedPages:
+    def get_thread_scraper(self) -> ThreadScraper:
+        thread_scraper = ThreadScraper(
+            page_to_scrape=ThreadScraper.NEWS,
+            news_page_count=2,
+            upsert_mode=ThreadScraper.BULK_UPSERT,
+            skip_unchanged_pages=True,
+        )
+        thread_scraper.hn_request_session.mount(settings.HACKERNEWS_URL, RecordedPagesAdapter())
+        return thread_scraper
+
+    @pytest.mark.django_db
+    def test_unchanged_pages_are_skipped(self):
+        cache.clear()
+
+        first_thread_scraper = self.get_thread_scraper()
+        first_thread_scraper.scrape()
+
+        thread_scraper = self.get_thread_scraper()
+        with mock.patch.object(thread_scraper, "parse_page") as parse_page_mock:
+            threads = thread_scraper.scrape()
+
+        assert first_thread_scraper.pages_skipped == 0
+        assert first_thread_scraper.upsert_stats.inserted == 60
+        assert thread_scraper.pages_skipped == 2
+        assert threads == []
+        parse_page_mock.assert_not_called()
+
+    @pytest.mark.django_db
+    def test_pages_are_not_skipped_after_failed_upsert(self):
+        cache.clear()
+
+        failed_thread_scraper = self.get_thread_scraper()
+        with (
+            mock.patch.object(failed_thread_scraper, "create_or_update_threads", side_effect=RuntimeError),
+            pytest.raises(RuntimeError),
+        ):
+            failed_thread_scraper.scrape()
+
+        thread_scraper = self.get_thread_scraper()
+        threads = thread_scraper.scrape()
+
+        assert thread_scraper.pages_skipped == 0
+        assert len(threads) == 60
+
+
+class TestSkipUnchangedThreads:
+    @pytest.mark.django_db
+    def test_only_changed_threads_are_saved(self):
+        thread_change_detector = ThreadChangeDetector(store=LRUStore(max_size=100))
+
+        thread_scraper = ThreadScraper(upsert_mode=ThreadScraper.BULK_UPSERT, skip_unchanged_threads=True)
+        thread_scraper.thread_change_detector = thread_change_detector
+        thread_scraper.hn_request_session.mount(settings.HACKERNEWS_URL, RecordedPagesAdapter())
+        thread_scraper.scrape()
+
+        # thread changed in the database by other writer is not rewritten, its scraped state didn't change
+        Thread.objects.filter(thread_id=35160020).update(score=1000)
+
+        page_html = (RECORDED_PAGES_DIR / "newest.html").read_text()
+        changed_page_html = page_html.replace(">1 point<", ">2 points<", 1)
+
+        second_thread_scraper = ThreadScraper(upsert_mode=ThreadScraper.BULK_UPSERT, skip_unchanged_threads=True)
+        second_thread_scraper.thread_change_detector = thread_change_detector
+        with mock.patch.object(second_thread_scraper.page_fetcher, "fetch", return_value=changed_page_html):
+            threads = second_thread_scraper.scrape()
+
+        assert thread_scraper.upsert_stats.inserted == 30
+        assert second_thread_scraper.upsert_stats.updated == 1
+        assert second_thread_scraper.upsert_stats.skipped == 29
+        assert threads[0].score == 2
+        assert Thread.objects.get(thread_id=35160020).score == 1000
+        assert thread_change_detector.skip_ratio == 29 / 60
+
+
+class TestLxmlThreadParser:
+    @pytest.mark.parametrize(
+        "page_to_scrape, page_name",
+        [(ThreadScraper.NEWS, "news_p1"), (ThreadScraper.NEWS, "news_p2"), (ThreadScraper.NEWEST, "newest")],
+    )
+    def test_output_is_identical_to_bs4_parser(self, page_to_scrape, page_name):
+        page_html = (RECORDED_PAGES_DIR / f"{page_name}.html").read_text()
+
+        bs4_threads = ThreadScraper(page_to_scrape=page_to_scrape).parse_page(page_html=page_html)
+        lxml_threads = ThreadScraper(
+            page_to_scrape=page_to_scrape, parser_backend=ThreadScraper.LXML_PARSER
+        ).parse_page(page_html=page_html)
+
+        assert len(lxml_threads) == 30
+        assert lxml_threads == bs4_threads
+
+
+class TestParseHNTimestamp:
+    def test_parse_hn_timestamp(self):
+        assert parse_hn_timestamp("2023-03-14T12:34:56") == parser.parse("2023-03-14T12:34:56").astimezone(tz.UTC)
+        assert parse_hn_timestamp("2023-03-14T12:34:56+00:00") == datetime(2023, 3, 14, 12, 34, 56, tzinfo=tz.UTC)
+        assert parse_hn_timestamp("Tue, 14 Mar 2023 12:34:56 +0000") == datetime(2023, 3, 14, 12, 34, 56, tzinfo=tz.UTC)
+
+
+class TestGetReversedHost:
+    def test_get_reversed_host(self):
+        assert get_reversed_host("https://Blog.Example.com:8080/post?id=1") == "com.example.blog."
+        assert get_reversed_host("https://example.com./") == "com.example."
+        assert get_reversed_host("item?id=35160003") == ""
+        assert get_reversed_host("http://[::1/") == ""
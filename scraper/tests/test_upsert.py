@@ -0,0 +1,66 @@
+import pytest
+from django.utils import timezone
+
+from scraper.models import Thread
+from scraper.tests.factories import ThreadFactory
+from scraper.thread_scraper import ThreadScraper
+from scraper.types import ScrapedThreadData, UpsertStats
+from scraper.upsert import bulk_upsert
+
+
+def get_scraped_thread(thread_id: int, score: int = 1) -> ScrapedThreadData:
+    return ScrapedThreadData(
+        thread_id=thread_id,
+        title=f" thread {thread_id} ",
+        thread_created_at=timezone.now(),
+        creator_username="testuser123",
+        score=score,
+        link="https://example.com",
+        reversed_host="com.example.",
+        comments_count=0,
+        comments_link=f"https://news.ycombinator.com/item?id={thread_id}",
+    )
+
+
+class TestBulkUpsert:
+    @pytest.mark.django_db
+    def test_bulk_upsert_threads(self):
+        unchanged_thread_data = get_scraped_thread(thread_id=1)
+        ThreadFactory.create(**unchanged_thread_data)
+        updated_thread = ThreadFactory.create(**get_scraped_thread(thread_id=2))
+
+        scraped_threads = [
+            unchanged_thread_data,
+            get_scraped_thread(thread_id=2, score=100),
+            get_scraped_thread(thread_id=3),
+        ]
+
+        threads, upsert_stats = bulk_upsert(
+            Thread,
+            rows=scraped_threads,
+            unique_field="thread_id",
+            update_fields=ThreadScraper.UPSERT_UPDATE_FIELDS,
+        )
+
+        updated_thread.refresh_from_db()
+
+        assert upsert_stats == UpsertStats(inserted=1, updated=1, unchanged=1)
+        assert sorted(thread.thread_id for thread in threads) == [2, 3]
+        assert updated_thread.score == 100
+        assert Thread.objects.count() == 3
+
+    @pytest.mark.django_db
+    def test_bulk_upsert_duplicated_rows(self):
+        scraped_threads = [get_scraped_thread(thread_id=1), get_scraped_thread(thread_id=1, score=5)]
+
+        threads, upsert_stats = bulk_upsert(
+            Thread,
+            rows=scraped_threads,
+            unique_field="thread_id",
+            update_fields=ThreadScraper.UPSERT_UPDATE_FIELDS,
+            batch_size=1,
+        )
+
+        assert upsert_stats == UpsertStats(inserted=1, updated=0, unchanged=0)
+        assert threads[0].score == 5
+        assert threads[0].created is not None
@@ -1,13 +1,16 @@
-from time import sleep
-
 from bs4 import BeautifulSoup
 from dateutil import parser, tz
 from django.conf import settings
 from django.utils import timezone
+from lxml import html as lxml_html
 
+from scraper.change_detector import thread_change_detector
+from scraper.fetcher import PageFetcher
 from scraper.models import Thread
-from scraper.types import ScrapedThreadData, ThreadMetaData
-from scraper.utils import start_request_session
+from scraper.page_cache import PageHashCache
+from scraper.types import ScrapedThreadData, ThreadMetaData, UpsertStats
+from scraper.upsert import bulk_upsert
+from scraper.utils import get_reversed_host, parse_hn_timestamp, start_request_session
 
 
 class ThreadScraper:
@@ -27,16 +30,78 @@ class ThreadScraper:
         )
     >>> news_page_threads_scraper.scrape()
     -> <list[Thread]>
+
+    Create or update threads with one INSERT ... ON CONFLICT statement,
+    only inserted and updated threads are returned
+    >>> bulk_threads_scraper = ThreadScraper(upsert_mode=ThreadScraper.BULK_UPSERT)
+    >>> bulk_threads_scraper.scrape()
+    -> <list[Thread]>
+    >>> bulk_threads_scraper.upsert_stats
+    -> UpsertStats(inserted=3, updated=10, unchanged=17)
+
+    Parse pages with lxml XPath instead of BeautifulSoup
+    >>> lxml_threads_scraper = ThreadScraper(parser_backend=ThreadScraper.LXML_PARSER)
+
+    Skip parsing and saving of pages that did not change since the previous run
+    >>> news_page_threads_scraper = ThreadScraper(
+            page_to_scrape=ThreadScraper.NEWS, news_page_count=10, skip_unchanged_pages=True
+        )
+    >>> news_page_threads_scraper.scrape()
+    -> <list[Thread]>
+    >>> news_page_threads_scraper.pages_skipped
+    -> 6
+
+    Save only new threads and threads whose score, comments count or title changed
+    >>> changed_threads_scraper = ThreadScraper(skip_unchanged_threads=True)
+    >>> changed_threads_scraper.scrape()
+    -> <list[Thread]>
+    >>> changed_threads_scraper.upsert_stats
+    -> UpsertStats(inserted=1, updated=2, unchanged=0, skipped=27)
     """
 
     NEWS = "NEWS"
     NEWEST = "NEWEST"
 
-    def __init__(self, page_to_scrape: str = NEWEST, news_page_count: int = 0) -> None:
+    UPDATE_OR_CREATE = "UPDATE_OR_CREATE"
+    BULK_UPSERT = "BULK_UPSERT"
+
+    BS4_PARSER = "BS4"
+    LXML_PARSER = "LXML"
+
+    UPSERT_UPDATE_FIELDS = [
+        "title",
+        "link",
+        "reversed_host",
+        "creator_username",
+        "score",
+        "thread_created_at",
+        "comments_count",
+        "comments_link",
+    ]
+
+    def __init__(
+        self,
+        page_to_scrape: str = NEWEST,
+        news_page_count: int = 0,
+        upsert_mode: str = UPDATE_OR_CREATE,
+        parser_backend: str = BS4_PARSER,
+        skip_unchanged_pages: bool = False,
+        skip_unchanged_threads: bool = False,
+    ) -> None:
         self.page_to_scrape = page_to_scrape
+        self.upsert_mode = upsert_mode
+        self.parser_backend = parser_backend
+        self.skip_unchanged_pages = skip_unchanged_pages
+        self.skip_unchanged_threads = skip_unchanged_threads
+        self.thread_change_detector = thread_change_detector
+        self.pages_skipped = 0
+        self.upsert_stats = UpsertStats()
+        self.page_hash_cache = PageHashCache()
         self.hn_request_session = start_request_session(domen=settings.HACKERNEWS_URL)
+        self.page_fetcher = PageFetcher(session=self.hn_request_session)
         self.thread_parser = ThreadParser(page_to_parse=page_to_scrape)
-        self.news_page_count = 1 if page_to_scrape == self.NEWS else news_page_count
+        self.lxml_thread_parser = LxmlThreadParser(page_to_parse=page_to_scrape)
+        self.news_page_count = (news_page_count or 1) if page_to_scrape == self.NEWS else news_page_count
 
     def scrape(self) -> list[Thread]:
         if self.page_to_scrape == self.NEWS:
@@ -44,35 +109,78 @@ class ThreadScraper:
         elif self.page_to_scrape == self.NEWEST:
             scraped_threads = self.scrape_newest_page()
 
-        return self.create_or_update_threads(scraped_threads)
+        threads = self.create_or_update_threads(scraped_threads)
+
+        # hashes of changed pages are saved only after their threads are saved
+        self.page_hash_cache.commit()
+
+        return threads
 
     def scrape_newest_page(self) -> list[ScrapedThreadData]:
-        response = self.hn_request_session.get(f"{settings.HACKERNEWS_URL}newest", timeout=30)
-        page = BeautifulSoup(response.text, "lxml")
+        url = f"{settings.HACKERNEWS_URL}newest"
+        page_html = self.page_fetcher.fetch(url)
 
-        return self.thread_parser.parse(bs4_page_data=page)
+        return self.parse_changed_page(url=url, page_html=page_html)
 
     def scrape_news_pages(self) -> list[ScrapedThreadData]:
-        scraped_threads = []
-        for p_num in range(1, self.news_page_count + 1):
-            sleep(0.5)
-
-            response = self.hn_request_session.get(f"{settings.HACKERNEWS_URL}news?p={p_num}", timeout=30)
-            page = BeautifulSoup(response.text, "lxml")
+        # pages are independent, so they are downloaded concurrently
+        urls = [f"{settings.HACKERNEWS_URL}news?p={p_num}" for p_num in range(1, self.news_page_count + 1)]
+        pages_html = self.page_fetcher.fetch_many(urls=urls)
 
-            page_scraped_threads = self.thread_parser.parse(bs4_page_data=page)
+        scraped_threads = []
+        for url, page_html in zip(urls, pages_html):
+            page_scraped_threads = self.parse_changed_page(url=url, page_html=page_html)
             scraped_threads.extend(page_scraped_threads)
 
         return scraped_threads
 
+    def parse_changed_page(self, url: str, page_html: str) -> list[ScrapedThreadData]:
+        if self.skip_unchanged_pages and self.page_hash_cache.is_unchanged(url=url, page_html=page_html):
+            self.pages_skipped += 1
+            return []
+
+        return self.parse_page(page_html=page_html)
+
+    def parse_page(self, page_html: str) -> list[ScrapedThreadData]:
+        if self.parser_backend == self.LXML_PARSER:
+            return self.lxml_thread_parser.parse(page_html=page_html)
+
+        return self.thread_parser.parse(bs4_page_data=BeautifulSoup(page_html, "lxml"))
+
     def create_or_update_threads(self, scraped_threads: list[ScrapedThreadData]) -> list[Thread]:
+        if not self.skip_unchanged_threads:
+            return self.save_threads(scraped_threads)
+
+        changed_threads = self.thread_change_detector.filter_changed(scraped_threads)
+        threads = self.save_threads(changed_threads)
+        self.upsert_stats.skipped = len(scraped_threads) - len(changed_threads)
+
+        # thread states are remembered only after threads are saved
+        self.thread_change_detector.remember(changed_threads)
+
+        return threads
+
+    def save_threads(self, scraped_threads: list[ScrapedThreadData]) -> list[Thread]:
+        if self.upsert_mode == self.BULK_UPSERT:
+            threads, self.upsert_stats = bulk_upsert(
+                Thread, rows=scraped_threads, unique_field="thread_id", update_fields=self.UPSERT_UPDATE_FIELDS
+            )
+            return threads
+
         threads = []
+        upsert_stats = UpsertStats()
         for scraped_thread in scraped_threads:
-            thread, _ = Thread.objects.update_or_create(
+            thread, created = Thread.objects.update_or_create(
                 thread_id=scraped_thread["thread_id"], defaults=dict(scraped_thread)
             )
             threads.append(thread)
 
+            if created:
+                upsert_stats.inserted += 1
+            else:
+                upsert_stats.updated += 1
+
+        self.upsert_stats = upsert_stats
         return threads
 
 
@@ -118,6 +226,7 @@ class ThreadParser:
             thread_id=thread_id,
             title=thread_title_with_whitespaces,
             link=story_link,
+            reversed_host=get_reversed_host(story_link),
             creator_username=thread_meta_data.get("thread_creator_username"),
             score=thread_meta_data.get("thread_score", 0),
             thread_created_at=thread_meta_data.get("thread_created_at", timezone.now()),
@@ -165,3 +274,92 @@ class ThreadParser:
             comments_count=comments_count,
             comments_link=comments_link,
         )
+
+
+class LxmlThreadParser:
+    """
+    Parse threads from Hacker News /newest or /news page with lxml XPath, output is identical to ThreadParser
+
+    Only thread rows and their subtext rows are visited, timestamps are parsed with datetime.fromisoformat
+    >>> parser = LxmlThreadParser()
+    >>> parser.parse(page_html=page_html)
+    -> <list[ScrapedThreadData]>
+    """
+
+    THREAD_ROWS_XPATH = "//tr[@class='athing' or starts-with(@class, 'athing ')]"
+
+    def __init__(self, page_to_parse: str = ThreadScraper.NEWEST) -> None:
+        self.page_to_parse = page_to_parse
+
+    def parse(self, page_html: str) -> list[ScrapedThreadData]:
+        if not page_html.strip():
+            return []
+
+        page = lxml_html.fromstring(page_html)
+        return [self.parse_thread_data(data_row=row) for row in page.xpath(self.THREAD_ROWS_XPATH)]
+
+    def parse_thread_data(self, data_row) -> ScrapedThreadData:
+        story_hyperlink = data_row.find(".//span[@class='titleline']//a")
+
+        # add whitespaces before and after thread title for full word matching
+        thread_title_with_whitespaces = f" {story_hyperlink.text_content()} "
+
+        story_link = story_hyperlink.get("href")
+
+        # hacker news post without url
+        if "https://" not in story_link and "item?id=" in story_link:
+            story_link = f"https://news.ycombinator.com/{story_link}"
+
+        thread_meta_data = self.parse_thread_meta_data(meta_data_row=data_row.getnext())
+
+        return ScrapedThreadData(
+            thread_id=data_row.get("id"),
+            title=thread_title_with_whitespaces,
+            link=story_link,
+            reversed_host=get_reversed_host(story_link),
+            creator_username=thread_meta_data.get("thread_creator_username"),
+            score=thread_meta_data.get("thread_score", 0),
+            thread_created_at=thread_meta_data.get("thread_created_at", timezone.now()),
+            comments_count=thread_meta_data.get("comments_count", 0),
+            comments_link=thread_meta_data.get("comments_link"),
+        )
+
+    def parse_thread_meta_data(self, meta_data_row) -> ThreadMetaData:
+        subtext = meta_data_row.find(".//td[@class='subtext']")
+
+        thread_score = 0
+        if (thread_score_span := subtext.find(".//span[@class='score']")) is not None:
+            thread_score = int("".join(i for i in thread_score_span.text_content() if i.isdigit()))
+
+        thread_created_at = timezone.now()
+        if (thread_created_at_span := subtext.find(".//span[@class='age']")) is not None:
+            thread_created_at = parse_hn_timestamp(thread_created_at_span.get("title"))
+
+        thread_creator_username = None
+        if (username_hyperlink := subtext.find(".//a[@class='hnuser']")) is not None:
+            thread_creator_username = username_hyperlink.text_content()
+
+        # comments hyperlink follows "hide" hyperlink on /news page and "past" hyperlink on /newest page
+        if self.page_to_parse == ThreadScraper.NEWS:
+            preceding_hyperlinks = subtext.xpath(".//a[text()='hide']")
+        elif self.page_to_parse == ThreadScraper.NEWEST:
+            preceding_hyperlinks = meta_data_row.xpath(".//a[@class='hnpast']")
+
+        comments_data_hyperlink = preceding_hyperlinks[0].getnext() if preceding_hyperlinks else None
+
+        comments_count = 0
+        comments_link = None
+        if comments_data_hyperlink is not None:
+            comments_data_text = comments_data_hyperlink.text_content()
+            if "comment" in comments_data_text:
+                comments_count = [int(s) for s in comments_data_text.split() if s.isdigit()][0]
+
+            comments_link = f"https://news.ycombinator.com/{comments_data_hyperlink.get('href')}"
+
+        return ThreadMetaData(
+            thread_score=thread_score,
+            thread_created_at=thread_created_at,
+            thread_creator_username=thread_creator_username,
+            comments_count=comments_count,
+            comments_link=comments_link,
+        )
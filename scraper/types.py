@@ -1,12 +1,11 @@
+from dataclasses import dataclass
 from datetime import datetime
 from typing import TypedDict
 
-from scraper.models import Comment
-
 
 class ScrapedCommentData(TypedDict):
     comment_id: int
-    parent_comment: Comment | None
+    parent_comment_id_int: int | None
     thread_id_int: int
     body: str
     username: str
@@ -20,6 +19,7 @@ class ScrapedThreadData(TypedDict):
     creator_username: str | None
     score: int
     link: str
+    reversed_host: str
     comments_count: int
     comments_link: str | None
 
@@ -30,3 +30,14 @@ class ThreadMetaData(TypedDict):
     thread_creator_username: str | None
     comments_count: int
     comments_link: str | None
+
+
+@dataclass
+class UpsertStats:
+    """Write volume of create or update operation"""
+
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    # rows filtered out before reaching the database
+    skipped: int = 0
@@ -0,0 +1,104 @@
+from collections.abc import Mapping, Sequence
+from typing import Any, TypeVar
+
+from django.db import connection, models
+from django.utils import timezone
+
+from scraper.types import UpsertStats
+from scraper.utils import get_column, get_concrete_field, get_concrete_fields
+
+ModelT = TypeVar("ModelT", bound=models.Model)
+
+
+def bulk_upsert(
+    model: type[ModelT],
+    rows: Sequence[Mapping[str, Any]],
+    unique_field: str,
+    update_fields: Sequence[str],
+    batch_size: int = 500,
+) -> tuple[list[ModelT], UpsertStats]:
+    """
+    Create or update rows with one INSERT ... ON CONFLICT DO UPDATE statement per batch
+
+    Rows whose update fields did not change are left untouched (modified field included).
+    Returns inserted and updated objects and write volume stats.
+
+    >>> threads, upsert_stats = bulk_upsert(
+            Thread, rows=scraped_threads, unique_field="thread_id", update_fields=["title", "score"]
+        )
+    -> <tuple[list[Thread], UpsertStats]>
+    """
+
+    unique_model_field = get_concrete_field(model, unique_field)
+
+    # same item can be scraped twice (e.g. shifted between /news pages), keep the last occurrence
+    rows_by_unique_value = {unique_model_field.get_prep_value(row[unique_field]): row for row in rows}
+    unique_rows = list(rows_by_unique_value.values())
+
+    objs: list[ModelT] = []
+    upsert_stats = UpsertStats()
+    for batch_start in range(0, len(unique_rows), batch_size):
+        batch = unique_rows[batch_start : batch_start + batch_size]
+
+        batch_objs = list(model.objects.raw(*get_upsert_sql(model, batch, unique_field, update_fields)))
+        inserted_count = sum(1 for obj in batch_objs if obj.upsert_inserted)  # type: ignore[attr-defined]
+
+        upsert_stats.inserted += inserted_count
+        upsert_stats.updated += len(batch_objs) - inserted_count
+        upsert_stats.unchanged += len(batch) - len(batch_objs)
+        objs.extend(batch_objs)
+
+    return objs, upsert_stats
+
+
+def get_upsert_sql(
+    model: type[models.Model],
+    rows: Sequence[Mapping[str, Any]],
+    unique_field: str,
+    update_fields: Sequence[str],
+) -> tuple[str, list[Any]]:
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+
+    now = timezone.now()
+    field_names = list(dict.fromkeys([unique_field, *update_fields, *rows[0].keys()]))
+    fields = [get_concrete_field(model, field_name) for field_name in field_names]
+    concrete_fields = get_concrete_fields(model)
+
+    # TimeStampedModel fields aren't updated by raw sql
+    has_timestamps = {"created", "modified"} <= {field.name for field in concrete_fields}
+    insert_columns = [qn(get_column(field)) for field in fields]
+    if has_timestamps:
+        insert_columns += [qn("created"), qn("modified")]
+
+    params: list[Any] = []
+    values_sql = []
+    for row in rows:
+        for field in fields:
+            value = row.get(field.name)
+            if isinstance(value, models.Model):
+                value = value.pk
+            params.append(field.get_db_prep_save(value, connection))
+        if has_timestamps:
+            params += [now, now]
+        values_sql.append(f"({', '.join(['%s'] * len(insert_columns))})")
+
+    update_columns = [qn(get_column(get_concrete_field(model, field_name))) for field_name in update_fields]
+    set_sql = [f"{column} = EXCLUDED.{column}" for column in update_columns]
+    if has_timestamps:
+        set_sql.append(f"{qn('modified')} = EXCLUDED.{qn('modified')}")
+
+    current_values = ", ".join(f"{table}.{column}" for column in update_columns)
+    excluded_values = ", ".join(f"EXCLUDED.{column}" for column in update_columns)
+
+    # generated columns (search vectors) aren't returned
+    returning_columns = ", ".join(f"{table}.{qn(get_column(field))}" for field in concrete_fields)
+
+    sql = (
+        f"INSERT INTO {table} ({', '.join(insert_columns)}) VALUES {', '.join(values_sql)} "
+        f"ON CONFLICT ({qn(get_column(get_concrete_field(model, unique_field)))}) DO UPDATE SET {', '.join(set_sql)} "
+        f"WHERE ROW({current_values}) IS DISTINCT FROM ROW({excluded_values}) "
+        f"RETURNING {returning_columns}, ({table}.xmax = 0) AS upsert_inserted"
+    )
+
+    return sql, params
@@ -1,4 +1,10 @@
+from datetime import datetime
+from typing import cast
+from urllib.parse import urlsplit
+
 import requests
+from dateutil import parser, tz
+from django.db import models
 from requests.adapters import HTTPAdapter, Retry
 
 
@@ -8,3 +14,67 @@ def start_request_session(domen: str = "https://") -> requests.Session:
     session.mount(domen, HTTPAdapter(max_retries=retries))
 
     return session
+
+
+def parse_hn_timestamp(timestamp: str) -> datetime:
+    """
+    Parse "title" timestamp of Hacker News age span ("2023-03-14T12:34:56") to UTC datetime
+
+    ISO format is parsed with datetime.fromisoformat, other formats fall back to dateutil parser
+    """
+
+    try:
+        created_at = datetime.fromisoformat(timestamp)
+    except ValueError:
+        created_at = parser.parse(timestamp)
+
+    return created_at.astimezone(tz.UTC)
+
+
+def get_reversed_host(link: str) -> str:
+    """
+    Get lowercase host of a link with reversed labels and trailing dot,
+    "https://blog.example.com/post" -> "com.example.blog."
+
+    Reversed hosts of a domain and its subdomains start with the reversed domain ("com.example."),
+    so they are found with one index range scan. Empty string is returned for links without host
+    """
+
+    try:
+        host = urlsplit(link.strip()).hostname
+    except ValueError:
+        return ""
+
+    return reverse_host_labels(host or "")
+
+
+def reverse_host_labels(host: str) -> str:
+    """lowercase host with reversed labels and trailing dot, blog.example.com -> com.example.blog."""
+
+    labels = [label for label in host.lower().split(".") if label]
+    if not labels:
+        return ""
+
+    return ".".join(reversed(labels)) + "."
+
+
+def get_concrete_field(model: type[models.Model], field_name: str) -> models.Field:
+    """get field of model that has a table column (not a reverse relation or many-to-many field)"""
+
+    field = model._meta.get_field(field_name)
+    if not isinstance(field, models.Field) or not field.concrete:
+        raise ValueError(f"{model.__name__}.{field_name} is not a concrete field")
+
+    return field
+
+
+def get_concrete_fields(model: type[models.Model]) -> list[models.Field]:
+    """get fields of model that have table columns, in the order of columns"""
+
+    return [field for field in model._meta.get_fields() if isinstance(field, models.Field) and field.concrete]
+
+
+def get_column(field: models.Field) -> str:
+    """get table column of a concrete field"""
+
+    return cast(str, field.column)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TelegramFeedConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "telegram_feed"
+
+    def ready(self) -> None:
+        # alerts are matched as soon as scrapers save new threads and comments
+        from telegram_feed import signals  # noqa: F401
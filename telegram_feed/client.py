@@ -0,0 +1,90 @@
+import os
+import threading
+from collections.abc import Callable, Mapping
+from time import monotonic
+from typing import Any
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter, Retry
+
+from telegram_feed.exceptions import TelegramRequestError
+from telegram_feed.types import TelegramCallLatency
+
+LatencyHook = Callable[[TelegramCallLatency], None]
+
+
+class TelegramClient:
+    """
+    Call telegram bot API methods with JSON POST requests over a pooled keep-alive session
+
+    One session is shared by all methods, so sendMessage, getUpdates and other calls reuse the same
+    TLS connections. Pool keeps up to pool_maxsize connections, one per concurrent request.
+    Latency hooks are called after every call, including failed ones.
+
+    >>> from telegram_feed.client import get_telegram_client
+    >>> telegram_client = get_telegram_client()
+    >>> telegram_client.add_latency_hook(lambda latency: print(latency))
+    >>> telegram_client.call(method="sendMessage", payload={"chat_id": 1, "text": "text"})
+    TelegramCallLatency(method='sendMessage', elapsed=0.08, status_code=200)
+    -> {"ok": True, "result": {...}}
+    """
+
+    def __init__(
+        self,
+        token: str = settings.TELEGRAM_TOKEN,
+        api_url: str = settings.TELEGRAM_API_URL,
+        pool_maxsize: int = settings.TELEGRAM_CLIENT_POOL_SIZE,
+        latency_hooks: list[LatencyHook] | None = None,
+    ) -> None:
+        self.base_url = f"{api_url}bot{token}/"
+        self.latency_hooks = latency_hooks or []
+
+        self.session = requests.Session()
+        # requests are retried only if they were not sent (connection errors), so a message is never sent twice
+        retries = Retry(total=5, read=0, status=0, backoff_factor=0.1)
+        self.session.mount(api_url, HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retries))
+
+    def add_latency_hook(self, latency_hook: LatencyHook) -> None:
+        self.latency_hooks.append(latency_hook)
+
+    def call(self, method: str, payload: Mapping[str, Any], timeout: float = 30) -> dict[str, Any]:
+        """
+        Call telegram API method and return decoded JSON response
+
+        raises:
+            TelegramRequestError: request failed or response is not JSON (e.g. HTML of 502 response)
+        """
+
+        status_code = None
+        started_at = monotonic()
+        try:
+            response = self.session.post(f"{self.base_url}{method}", json=payload, timeout=timeout)
+            status_code = response.status_code
+            return response.json()
+        except (requests.RequestException, ValueError) as error:
+            raise TelegramRequestError(f"Telegram API {method} request error, status code {status_code}") from error
+        finally:
+            latency = TelegramCallLatency(method=method, elapsed=monotonic() - started_at, status_code=status_code)
+            for latency_hook in self.latency_hooks:
+                latency_hook(latency)
+
+
+# clients of a worker process by bot token, recreated in forked processes so they don't share sockets
+telegram_clients: dict[str, TelegramClient] = {}
+telegram_clients_pid = os.getpid()
+telegram_clients_lock = threading.Lock()
+
+
+def get_telegram_client(token: str = settings.TELEGRAM_TOKEN) -> TelegramClient:
+    global telegram_clients_pid
+
+    with telegram_clients_lock:
+        if telegram_clients_pid != os.getpid():
+            telegram_clients.clear()
+            telegram_clients_pid = os.getpid()
+
+        if token not in telegram_clients:
+            telegram_clients[token] = TelegramClient(token=token)
+
+        return telegram_clients[token]
@@ -0,0 +1,95 @@
+import datetime
+import math
+
+from telegram_feed.types import TelegramMessage
+from telegram_feed.utils import escape_markdown
+
+# telegram limit of message text length
+MESSAGE_MAX_LENGTH = 4096
+
+DIGEST_SEPARATOR = "\n\n• • •\n\n"
+
+
+def pack_digest_messages(messages: list[TelegramMessage]) -> list[tuple[TelegramMessage, list[int]]]:
+    """
+    Pack messages of one chat into as few digest messages (MarkdownV2) as fit telegram message length limit
+
+    Inline keyboard buttons of every message are kept as links under its text.
+    Message that doesn't fit into digest alone is sent as is.
+    Returns digest messages with indexes of packed messages, in the order of messages
+    """
+
+    digest_messages: list[tuple[TelegramMessage, list[int]]] = []
+
+    entries: list[str] = []
+    entry_indexes: list[int] = []
+    for index, message in enumerate(messages):
+        entry = get_digest_entry(message)
+        digest_length = sum(map(len, entries)) + len(DIGEST_SEPARATOR) * len(entries)
+
+        if entries and digest_length + len(entry) > MESSAGE_MAX_LENGTH:
+            digest_messages.append((get_digest_message(messages, entries, entry_indexes), entry_indexes))
+            entries, entry_indexes = [], []
+
+        if len(entry) > MESSAGE_MAX_LENGTH:
+            digest_messages.append((message, [index]))
+            continue
+
+        entries.append(entry)
+        entry_indexes.append(index)
+
+    if entries:
+        digest_messages.append((get_digest_message(messages, entries, entry_indexes), entry_indexes))
+
+    return digest_messages
+
+
+def get_digest_entry(message: TelegramMessage) -> str:
+    """Get MarkdownV2 text of a message followed by links of its inline keyboard buttons"""
+
+    text = message.text
+    if message.parse_mode != "MarkdownV2":
+        text = escape_markdown(text=text, version=2)
+
+    links = []
+    for buttons_row in (message.inline_keyboard_markup or {}).get("inline_keyboard", []):
+        for button in buttons_row:
+            if url := button.get("url"):
+                escaped_text = escape_markdown(text=button["text"], version=2)
+                escaped_url = escape_markdown(text=url, version=2, entity_type="text_link")
+                links.append(f"[{escaped_text}]({escaped_url})")
+
+    if not links:
+        return text
+
+    return f"{text}\n" + " \\| ".join(links)
+
+
+def get_digest_message(
+    messages: list[TelegramMessage], entries: list[str], entry_indexes: list[int]
+) -> TelegramMessage:
+    # single message is kept as is, with its inline keyboard
+    if len(entry_indexes) == 1:
+        return messages[entry_indexes[0]]
+
+    first_message = messages[entry_indexes[0]]
+    return TelegramMessage(
+        chat_id=first_message.chat_id,
+        text=DIGEST_SEPARATOR.join(entries),
+        parse_mode="MarkdownV2",
+        disable_web_page_preview=True,
+        alert_type=first_message.alert_type,
+        item_id=first_message.item_id,
+    )
+
+
+def get_digest_send_after(now: datetime.datetime, digest_interval: int) -> datetime.datetime | None:
+    """Get end of digest interval (minutes) of now, intervals are aligned to the epoch"""
+
+    if not digest_interval:
+        return None
+
+    interval_seconds = digest_interval * 60
+    return datetime.datetime.fromtimestamp(
+        math.ceil(now.timestamp() / interval_seconds) * interval_seconds, tz=datetime.timezone.utc
+    )
@@ -0,0 +1,95 @@
+import re
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.db.models.query import QuerySet
+
+from scraper.models import Thread
+from scraper.utils import reverse_host_labels
+from telegram_feed.keyword_query import match_patterns
+from telegram_feed.types import KeywordPattern
+
+# watched domain names that are host names (example.com, blog.example.com) are matched by story link host,
+# other names (github.com/lawxls, example) are searched in story link with icontains
+HOST_NAME_RE = re.compile(r"[a-z0-9-]+(?:\.[a-z0-9-]+)+\.?", re.IGNORECASE)
+
+
+def get_domain_name_host_prefix(domain_name: str) -> str | None:
+    """
+    Get reversed host prefix of stories of a domain name and its subdomains, "example.com" -> "com.example."
+
+    None is returned for domain names that are not host names
+    """
+
+    if not HOST_NAME_RE.fullmatch(domain_name):
+        return None
+
+    return reverse_host_labels(domain_name)
+
+
+def get_reversed_host_prefixes(reversed_host: str) -> Iterator[str]:
+    """reversed host prefixes of every parent domain, "com.example.blog." -> "com.", "com.example.", ..."""
+
+    label_end = reversed_host.find(".")
+    while label_end != -1:
+        yield reversed_host[: label_end + 1]
+        label_end = reversed_host.find(".", label_end + 1)
+
+
+def get_domain_names_filter(domain_names: Iterable[str]) -> Q:
+    """
+    Filter stories of any of domain names
+
+    Host names are matched by reversed host prefix (index range scan), so "x.com" doesn't match "netflix.com",
+    other names are searched in story link with icontains
+    """
+
+    domain_name_filters = []
+    for domain_name in domain_names:
+        host_prefix = get_domain_name_host_prefix(domain_name)
+        if host_prefix is None:
+            domain_name_filters.append(Q(link__icontains=domain_name))
+        else:
+            domain_name_filters.append(Q(reversed_host__startswith=host_prefix))
+
+    return reduce(or_, domain_name_filters, Q(pk__in=[]))
+
+
+def match_domain_names(threads: QuerySet[Thread], domain_names: Iterable[str]) -> list[tuple[int, str]]:
+    """
+    Match stories of queryset against domain names, same as get_domain_names_filter
+
+    Host names are matched with one query, stories are assigned to host names by prefixes of their reversed host.
+    Returns (thread pk, domain name) pairs.
+
+    >>> match_domain_names(Thread.objects.all(), domain_names=["example.com", "github.com/lawxls"])
+    -> [(1, "example.com"), (2, "example.com"), (2, "github.com/lawxls")]
+    """
+
+    domain_names_by_host_prefix: dict[str, list[str]] = defaultdict(list)
+    domain_names_by_pattern: dict[KeywordPattern, list[str]] = defaultdict(list)
+    for domain_name in set(domain_names):
+        host_prefix = get_domain_name_host_prefix(domain_name)
+        if host_prefix is None:
+            domain_names_by_pattern[KeywordPattern(text=domain_name.upper())].append(domain_name)
+        else:
+            domain_names_by_host_prefix[host_prefix].append(domain_name)
+
+    matches: list[tuple[int, str]] = []
+    if domain_names_by_host_prefix:
+        host_prefixes_filter = reduce(
+            or_, (Q(reversed_host__startswith=host_prefix) for host_prefix in domain_names_by_host_prefix)
+        )
+        for thread_pk, reversed_host in threads.filter(host_prefixes_filter).values_list("pk", "reversed_host"):
+            for host_prefix in get_reversed_host_prefixes(reversed_host):
+                matches.extend(
+                    (thread_pk, domain_name) for domain_name in domain_names_by_host_prefix.get(host_prefix, ())
+                )
+
+    for thread_pk, pattern in match_patterns(threads, field_name="link", patterns=domain_names_by_pattern):
+        matches.extend((thread_pk, domain_name) for domain_name in domain_names_by_pattern[pattern])
+
+    return matches
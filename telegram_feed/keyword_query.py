@@ -0,0 +1,134 @@
+import re
+from collections.abc import Iterable
+from typing import Any, TypeVar
+
+from django.conf import settings
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
+from django.db.models.query import QuerySet
+
+from scraper.utils import get_column, get_concrete_fields
+from telegram_feed.models import Keyword
+from telegram_feed.types import KeywordPattern
+
+ModelT = TypeVar("ModelT", bound=models.Model)
+
+# keyword matching modes, selected by KEYWORD_MATCH_MODE setting
+ICONTAINS_MATCH_MODE = "ICONTAINS"
+FULL_TEXT_MATCH_MODE = "FULLTEXT"
+
+# whole-word keywords searched in full text search vectors, other keywords (c++, node.js) are searched with LIKE
+FULL_TEXT_KEYWORD_RE = re.compile(r"[^\W_]+(?:\s+[^\W_]+)*")
+
+
+def match_keywords(
+    queryset: QuerySet[ModelT], field_name: str, keywords: Iterable[Keyword]
+) -> list[tuple[ModelT, str]]:
+    """
+    Match items of queryset against all keywords in one query, item field is searched case-insensitively
+    like with icontains lookup (whole-word keywords are surrounded by spaces)
+
+    Keywords are joined as VALUES list, so an item matched by several keywords is returned once per keyword.
+    Returns (item, keyword name) pairs ordered by item pk and keyword order.
+
+    With FULLTEXT match mode whole-word keywords (and phrases) are searched in generated tsvector column
+    of the field with its GIN index, so words next to punctuation are matched too.
+
+    >>> match_keywords(Comment.objects.all(), field_name="body", keywords=user_feed.keywords.all())
+    -> [(<Comment: (1) ...>, "python"), (<Comment: (1) ...>, "django"), (<Comment: (2) ...>, "python")]
+    """
+
+    keywords = list(keywords)
+    if not keywords:
+        return []
+
+    patterns = [get_keyword_pattern(keyword) for keyword in keywords]
+    model = queryset.model
+    qn = connection.ops.quote_name
+    select_sql = ", ".join(f"item.{qn(get_column(field))}" for field in get_concrete_fields(model))
+    items = model.objects.raw(*get_pattern_match_sql(queryset, field_name, patterns, select_sql=select_sql))
+
+    return [(item, keywords[item.matched_position].name) for item in items]  # type: ignore[attr-defined]
+
+
+def match_patterns(
+    queryset: QuerySet, field_name: str, patterns: Iterable[KeywordPattern]
+) -> list[tuple[int, KeywordPattern]]:
+    """
+    Match items of queryset against patterns in one query, same as match_keywords but only item pks are selected
+
+    >>> match_patterns(Thread.objects.all(), field_name="link", patterns=[KeywordPattern(text="GITHUB.COM")])
+    -> [(1, KeywordPattern(text="GITHUB.COM", full_text=False)), ...]
+    """
+
+    patterns = list(patterns)
+    if not patterns:
+        return []
+
+    pk_column = connection.ops.quote_name(queryset.model._meta.pk.column)
+    sql, params = get_pattern_match_sql(
+        queryset.only("pk", field_name), field_name, patterns, select_sql=f"item.{pk_column}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(item_pk, patterns[position]) for item_pk, position in cursor.fetchall()]
+
+
+def get_keyword_pattern(keyword: Keyword) -> KeywordPattern:
+    if keyword.is_full_match is not True:
+        return KeywordPattern(text=keyword.name.upper())
+
+    if settings.KEYWORD_MATCH_MODE == FULL_TEXT_MATCH_MODE and FULL_TEXT_KEYWORD_RE.fullmatch(keyword.name):
+        return KeywordPattern(text=keyword.name.upper(), full_text=True)
+
+    return KeywordPattern(text=f" {keyword.name} ".upper())
+
+
+def get_pattern_match_sql(
+    queryset: QuerySet, field_name: str, patterns: list[KeywordPattern], select_sql: str
+) -> tuple[str, list[Any]]:
+    """
+    LIKE patterns and full text patterns are joined with items separately (so each join can use its index),
+    results are combined with UNION ALL
+    """
+
+    qn = connection.ops.quote_name
+    column = qn(queryset.model._meta.get_field(field_name).column)
+    pk_column = qn(queryset.model._meta.pk.column)
+
+    like_values = [
+        (position, f"%{connection.ops.prep_for_like_query(pattern.text)}%")
+        for position, pattern in enumerate(patterns)
+        if not pattern.full_text
+    ]
+    full_text_values = [(position, pattern.text) for position, pattern in enumerate(patterns) if pattern.full_text]
+
+    joins_sql = []
+    params: list[Any] = []
+    if like_values:
+        items_sql, items_params = queryset.query.sql_with_params()
+        joins_sql.append(
+            f"SELECT {select_sql}, pattern.position AS matched_position FROM ({items_sql}) AS item "
+            f"JOIN (VALUES {', '.join(['(%s, %s)'] * len(like_values))}) AS pattern (position, like_pattern) "
+            # same pattern as icontains lookup, UPPER(column) is the expression of trigram GIN indexes
+            # (title_upper_gin_index, body_upper_gin_index), so the planner can use them
+            f"ON UPPER(item.{column}::text) LIKE UPPER(pattern.like_pattern)"
+        )
+        params += [*items_params, *(value for row in like_values for value in row)]
+
+    if full_text_values:
+        search_vector_column = queryset.model.SEARCH_VECTOR_COLUMNS[field_name]
+        table = qn(queryset.model._meta.db_table)
+        items_sql, items_params = queryset.annotate(
+            matched_search_vector=RawSQL(f"{table}.{qn(search_vector_column)}", [])
+        ).query.sql_with_params()
+        joins_sql.append(
+            f"SELECT {select_sql}, pattern.position AS matched_position FROM ({items_sql}) AS item "
+            f"JOIN (VALUES {', '.join(['(%s, %s)'] * len(full_text_values))}) AS pattern (position, phrase) "
+            f"ON item.matched_search_vector @@ phraseto_tsquery('simple', pattern.phrase)"
+        )
+        params += [*items_params, *(value for row in full_text_values for value in row)]
+
+    sql = f"{' UNION ALL '.join(joins_sql)} ORDER BY {pk_column}, matched_position"
+
+    return sql, params
@@ -0,0 +1,52 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from scraper.models import Comment
+from telegram_feed.keyword_query import match_patterns
+from telegram_feed.management.synthetic_comments import insert_synthetic_comments
+from telegram_feed.types import KeywordPattern
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark whole-word keyword matching of ICONTAINS (LIKE with spaces) and FULLTEXT (tsvector with GIN index) "
+        "match modes on synthetic comments, inserted comments are rolled back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--comments", type=int, default=2_000_000)
+        parser.add_argument("--words", type=int, default=40, help="words per comment")
+        parser.add_argument("--keywords", nargs="+", default=["rust", "python", "postgres", "llm", "machine learning"])
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        keywords = options["keywords"]
+
+        with transaction.atomic():
+            started_at = perf_counter()
+            insert_synthetic_comments(comment_count=options["comments"], word_count=options["words"])
+            self.stdout.write(f"Inserted {options['comments']} comments in {perf_counter() - started_at:.1f} sec")
+
+            patterns_by_match_mode = {
+                "ICONTAINS": [KeywordPattern(text=f" {keyword} ".upper()) for keyword in keywords],
+                "FULLTEXT": [KeywordPattern(text=keyword.upper(), full_text=True) for keyword in keywords],
+            }
+            for match_mode, patterns in patterns_by_match_mode.items():
+                self.benchmark_match_mode(match_mode=match_mode, patterns=patterns, repeat=options["repeat"])
+
+            transaction.set_rollback(True)
+
+    def benchmark_match_mode(self, match_mode: str, patterns: list[KeywordPattern], repeat: int) -> None:
+        started_at = perf_counter()
+        for _ in range(repeat):
+            matches = match_patterns(Comment.objects.all(), field_name="body", patterns=patterns)
+        elapsed = (perf_counter() - started_at) / repeat
+
+        matches_by_pattern = {pattern.text.strip(): 0 for pattern in patterns}
+        for _, pattern in matches:
+            matches_by_pattern[pattern.text.strip()] += 1
+
+        matches_str = ", ".join(f"{pattern}: {count}" for pattern, count in matches_by_pattern.items())
+        self.stdout.write(f"{match_mode}: {elapsed * 1000:.1f} ms per search, matches ({matches_str})")
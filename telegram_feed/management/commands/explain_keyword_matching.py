@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from scraper.models import Comment
+from telegram_feed.keyword_query import get_pattern_match_sql
+from telegram_feed.management.synthetic_comments import insert_synthetic_comments
+from telegram_feed.services import ALERTS_LOOKBACK
+from telegram_feed.types import KeywordPattern
+
+
+class Command(BaseCommand):
+    help = (
+        "Print EXPLAIN ANALYZE of partial-match keyword search of comments without and with trigram index "
+        "of UPPER(body) on seeded comments. Index is dropped and comments are inserted in a rolled back "
+        "transaction, comments table is locked until the command ends, don't run it on production database"
+    )
+
+    INDEX_NAME = "body_upper_gin_index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--comments", type=int, default=200_000)
+        parser.add_argument("--words", type=int, default=40, help="words per comment")
+        parser.add_argument("--keywords", nargs="+", default=["rust", "postgres", "llm"])
+
+    def handle(self, *args, **options):
+        patterns = [KeywordPattern(text=keyword.upper()) for keyword in options["keywords"]]
+        comments = Comment.objects.filter(created__gte=timezone.now() - ALERTS_LOOKBACK).only("pk", "body")
+        sql, params = get_pattern_match_sql(comments, "body", patterns, select_sql="item.id")
+
+        with transaction.atomic():
+            insert_synthetic_comments(comment_count=options["comments"], word_count=options["words"])
+
+            with connection.cursor() as cursor:
+                with transaction.atomic():
+                    cursor.execute(f"DROP INDEX IF EXISTS {self.INDEX_NAME}")
+                    self.print_explain(
+                        title=f"Before (without {self.INDEX_NAME})", cursor=cursor, sql=sql, params=params
+                    )
+                    transaction.set_rollback(True)
+
+                self.print_explain(title=f"After (with {self.INDEX_NAME})", cursor=cursor, sql=sql, params=params)
+
+            transaction.set_rollback(True)
+
+    def print_explain(self, title: str, cursor, sql: str, params: list) -> None:
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+
+        self.stdout.write(title)
+        for (line,) in cursor.fetchall():
+            self.stdout.write(line)
+        self.stdout.write("")
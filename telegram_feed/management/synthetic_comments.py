@@ -0,0 +1,45 @@
+from django.db import connection
+from django.db.models import Max
+
+from scraper.models import Comment
+
+# words of synthetic comments, keywords are rare and mixed with punctuation and longer words
+VOCABULARY = [
+    *("rust", "Rust,", "rustacean", "python", "Python.", "pythonic", "postgres", "(postgres)", "llm", "LLMs"),
+    *("machine", "learning", "Machine", "learning."),
+    *(f"word{n}" for n in range(5000)),
+]
+
+# GIN indexes of comment body, fast update entries are moved from their pending lists after insert
+COMMENT_BODY_GIN_INDEXES = ["body_search_vector_index", "body_upper_gin_index"]
+
+
+def insert_synthetic_comments(comment_count: int, word_count: int) -> None:
+    """insert comments of random words of VOCABULARY for benchmarks, expected to be rolled back"""
+
+    last_comment_id = Comment.objects.aggregate(Max("comment_id"))["comment_id__max"] or 0
+
+    with connection.cursor() as cursor:
+        # "WHERE g > 0" makes words subquery correlated, so it's evaluated for every comment
+        cursor.execute(
+            "INSERT INTO scraper_comment "
+            "(comment_id, thread_id_int, comment_created_at, username, body, created, modified) "
+            "SELECT %s + g, 1, now(), 'benchmark', ' ' || ("
+            "  SELECT string_agg((%s::text[])[1 + floor(random() * %s)::int], ' ') "
+            "  FROM generate_series(1, %s) WHERE g > 0"
+            ") || ' ', now(), now() "
+            "FROM generate_series(1, %s) AS g",
+            [last_comment_id, VOCABULARY, len(VOCABULARY), word_count, comment_count],
+        )
+
+        # like autovacuum would
+        cursor.execute(
+            "SELECT gin_clean_pending_list(indexrelid) FROM pg_index WHERE indexrelid = ANY(%s::regclass[])",
+            [get_existing_indexes(cursor=cursor, index_names=COMMENT_BODY_GIN_INDEXES)],
+        )
+        cursor.execute("ANALYZE scraper_comment")
+
+
+def get_existing_indexes(cursor, index_names: list[str]) -> list[str]:
+    cursor.execute("SELECT indexname FROM pg_indexes WHERE indexname = ANY(%s)", [index_names])
+    return [index_name for (index_name,) in cursor.fetchall()]
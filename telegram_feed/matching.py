@@ -0,0 +1,422 @@
+import datetime
+from collections import defaultdict, deque
+from collections.abc import Iterable, Iterator, Mapping
+from time import monotonic
+from typing import Generic, TypeVar
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, Max, OuterRef, Q, Subquery
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from scraper.models import Comment, Thread
+from telegram_feed.domain_query import get_domain_name_host_prefix, get_reversed_host_prefixes, match_domain_names
+from telegram_feed.keyword_query import get_keyword_pattern, match_patterns
+from telegram_feed.models import DeliveryCursor, FollowedUser, Keyword, UserFeed
+from telegram_feed.types import KeywordPattern
+
+T = TypeVar("T")
+PredicateT = TypeVar("PredicateT", KeywordPattern, str)
+
+
+class AhoCorasickAutomaton(Generic[T]):
+    """
+    Multi-pattern string matching automaton
+
+    Text is scanned once regardless of the number of patterns
+
+    >>> automaton = AhoCorasickAutomaton()
+    >>> automaton.add("tomato", value)
+    >>> automaton.build()
+    >>> list(automaton.search("text with tomato"))
+    -> [value]
+    """
+
+    def __init__(self) -> None:
+        self.transitions: list[dict[str, int]] = [{}]
+        self.fail_links: list[int] = [0]
+        self.outputs: list[list[T]] = [[]]
+
+    def add(self, pattern: str, value: T) -> None:
+        node = 0
+        for char in pattern:
+            next_node = self.transitions[node].get(char)
+            if next_node is None:
+                next_node = len(self.transitions)
+                self.transitions[node][char] = next_node
+                self.transitions.append({})
+                self.fail_links.append(0)
+                self.outputs.append([])
+            node = next_node
+
+        self.outputs[node].append(value)
+
+    def build(self) -> None:
+        """compute fail links and merge outputs of suffix patterns (breadth-first)"""
+
+        queue = deque(self.transitions[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.transitions[node].items():
+                queue.append(child)
+
+                fail_link = self.fail_links[node]
+                while fail_link and char not in self.transitions[fail_link]:
+                    fail_link = self.fail_links[fail_link]
+
+                self.fail_links[child] = self.transitions[fail_link].get(char, 0)
+                if suffix_outputs := self.outputs[self.fail_links[child]]:
+                    self.outputs[child] = self.outputs[child] + suffix_outputs
+
+    def search(self, text: str) -> Iterator[T]:
+        transitions = self.transitions
+        fail_links = self.fail_links
+        outputs = self.outputs
+
+        node = 0
+        for char in text:
+            while node and char not in transitions[node]:
+                node = fail_links[node]
+            node = transitions[node].get(char, 0)
+
+            if outputs[node]:
+                yield from outputs[node]
+
+
+class KeywordMatcher:
+    """
+    Match threads and comments against keywords of all user feeds in one pass
+
+    Replicates case-insensitive containment test (icontains) used by SendAlertsService.
+    Thread titles and comment bodies are stored with whitespaces around them,
+    so whole word keywords are searched as " keyword ".
+
+    >>> from telegram_feed.matching import KeywordMatcher
+    >>> keyword_matcher = KeywordMatcher.from_database()
+    >>> keyword_matcher.match_thread(thread)
+    -> <list[tuple[UserFeed, Keyword]]>
+    """
+
+    def __init__(self, keywords: Iterable[Keyword]) -> None:
+        self.thread_automaton: AhoCorasickAutomaton[Keyword] = AhoCorasickAutomaton()
+        self.comment_automaton: AhoCorasickAutomaton[Keyword] = AhoCorasickAutomaton()
+
+        for keyword in keywords:
+            # full text keywords are prefiltered by containment, whole words are checked by SendAlertsService
+            pattern = get_keyword_pattern(keyword).text
+            if keyword.search_threads is True:
+                self.thread_automaton.add(pattern, keyword)
+            if keyword.search_comments is True:
+                self.comment_automaton.add(pattern, keyword)
+
+        self.thread_automaton.build()
+        self.comment_automaton.build()
+
+    @classmethod
+    def from_database(cls) -> "KeywordMatcher":
+        return cls(keywords=Keyword.objects.select_related("user_feed"))
+
+    def match_thread(self, thread: Thread) -> list[tuple[UserFeed, Keyword]]:
+        return self.match_text(automaton=self.thread_automaton, text=thread.title)
+
+    def match_comment(self, comment: Comment) -> list[tuple[UserFeed, Keyword]]:
+        return self.match_text(automaton=self.comment_automaton, text=comment.body)
+
+    def match_text(self, automaton: AhoCorasickAutomaton[Keyword], text: str) -> list[tuple[UserFeed, Keyword]]:
+        matched_keywords: dict[int, Keyword] = {}
+        for keyword in automaton.search(text.upper()):
+            matched_keywords.setdefault(keyword.pk, keyword)
+
+        return [(keyword.user_feed, keyword) for keyword in matched_keywords.values()]
+
+
+class AlertMatcher:
+    """
+    Find user feeds affected by new or changed threads and comments
+
+    Keywords, watched domain names, followed users, reply notifications (hn username) and subscriptions
+    of all user feeds are matched in memory, so alerts are searched only for affected feeds.
+    Matching is a prefilter: score threshold and already sent items are checked by SendAlertsService.
+
+    >>> from telegram_feed.matching import AlertMatcher
+    >>> alert_matcher = AlertMatcher.from_database()
+    >>> alert_matcher.match(threads=threads, comments=comments)
+    -> <set[int]> (user feed ids)
+    """
+
+    def __init__(self, user_feeds: Iterable[UserFeed]) -> None:
+        # host names are matched by prefixes of story reversed host, other domain names are searched with icontains
+        self.user_feed_ids_by_domain_host_prefix: dict[str, set[int]] = defaultdict(set)
+        self.domain_name_automaton: AhoCorasickAutomaton[int] = AhoCorasickAutomaton()
+        self.user_feed_ids_by_followed_username: dict[str, set[int]] = defaultdict(set)
+        self.user_feed_ids_by_hn_username: dict[str, set[int]] = defaultdict(set)
+        self.user_feed_ids_by_subscription_thread_id: dict[int, set[int]] = defaultdict(set)
+
+        keywords: list[Keyword] = []
+        for user_feed in user_feeds:
+            keywords.extend(user_feed.keywords.all())
+
+            for domain_name in user_feed.domain_names:
+                host_prefix = get_domain_name_host_prefix(domain_name)
+                if host_prefix is None:
+                    self.domain_name_automaton.add(domain_name.upper(), user_feed.pk)
+                else:
+                    self.user_feed_ids_by_domain_host_prefix[host_prefix].add(user_feed.pk)
+
+            for followed_user in user_feed.follow_list.all():
+                self.user_feed_ids_by_followed_username[followed_user.username].add(user_feed.pk)
+
+            if user_feed.hn_username:
+                self.user_feed_ids_by_hn_username[user_feed.hn_username].add(user_feed.pk)
+
+            for subscription_thread in user_feed.subscription_threads.all():
+                self.user_feed_ids_by_subscription_thread_id[subscription_thread.thread_id].add(user_feed.pk)
+
+        self.domain_name_automaton.build()
+        self.keyword_matcher = KeywordMatcher(keywords=keywords)
+
+    @classmethod
+    def from_database(cls) -> "AlertMatcher":
+        # feeds without keywords, domain names, followed users, hn username and subscriptions can't be matched
+        user_feeds = UserFeed.objects.filter(
+            Q(Exists(Keyword.objects.filter(user_feed=OuterRef("pk"))))
+            | ~Q(domain_names=[])
+            | Q(Exists(FollowedUser.objects.filter(user_feed=OuterRef("pk"))))
+            | Q(hn_username__gt="")
+            | Q(Exists(UserFeed.subscription_threads.through.objects.filter(userfeed=OuterRef("pk"))))
+        )
+        return cls(user_feeds=user_feeds.prefetch_related("keywords", "follow_list", "subscription_threads"))
+
+    def match(self, threads: Iterable[Thread], comments: Iterable[Comment]) -> set[int]:
+        """
+        Get ids of user feeds with possible alerts
+
+        Comments are expected with selected parent_comment (reply notifications)
+        """
+
+        user_feed_ids: set[int] = set()
+
+        for thread in threads:
+            user_feed_ids.update(user_feed.pk for user_feed, _ in self.keyword_matcher.match_thread(thread))
+            user_feed_ids.update(self.domain_name_automaton.search(thread.link.upper()))
+            for host_prefix in get_reversed_host_prefixes(thread.reversed_host):
+                user_feed_ids.update(self.user_feed_ids_by_domain_host_prefix.get(host_prefix, ()))
+            if thread.creator_username is not None:
+                user_feed_ids.update(self.user_feed_ids_by_followed_username.get(thread.creator_username, ()))
+
+        for comment in comments:
+            user_feed_ids.update(user_feed.pk for user_feed, _ in self.keyword_matcher.match_comment(comment))
+            user_feed_ids.update(self.user_feed_ids_by_followed_username.get(comment.username, ()))
+            user_feed_ids.update(self.user_feed_ids_by_subscription_thread_id.get(comment.thread_id_int, ()))
+            if comment.parent_comment is not None:
+                user_feed_ids.update(self.user_feed_ids_by_hn_username.get(comment.parent_comment.username, ()))
+
+        return user_feed_ids
+
+
+class AlertMatcherCache:
+    """
+    AlertMatcher built once per worker process
+
+    Matcher is built again when predicates of user feeds change (signals set new version in Django cache, shared
+    by workers with Redis) or when it is older than max age (changes made by workers that don't share the cache)
+
+    >>> from telegram_feed.matching import alert_matcher_cache
+    >>> alert_matcher_cache.get().match(threads=threads, comments=comments)
+    -> <set[int]> (user feed ids)
+    >>> alert_matcher_cache.invalidate()  # keyword added
+    """
+
+    VERSION_KEY = "alert_matcher:version"
+
+    def __init__(self, max_age: float) -> None:
+        self.max_age = max_age
+        self.alert_matcher: AlertMatcher | None = None
+        self.version: str | None = None
+        self.built_at = 0.0
+
+    def get(self) -> AlertMatcher:
+        version = cache.get(self.VERSION_KEY)
+        if self.alert_matcher is None or version != self.version or monotonic() - self.built_at > self.max_age:
+            # version is read before the build, so changes made during the build trigger another one
+            self.alert_matcher = AlertMatcher.from_database()
+            self.version = version
+            self.built_at = monotonic()
+
+        return self.alert_matcher
+
+    def clear(self) -> None:
+        self.alert_matcher = None
+
+    def invalidate(self) -> None:
+        cache.set(self.VERSION_KEY, uuid4().hex, timeout=None)
+
+
+alert_matcher_cache = AlertMatcherCache(max_age=settings.ALERT_MATCHER_MAX_AGE)
+
+
+class AlertPredicateIndex:
+    """
+    Items matched by distinct keywords, domain names and followed usernames of user feeds searched in one cycle
+
+    Many feeds track the same terms, so each distinct predicate is evaluated once (one query per predicate type)
+    against items that any of the feeds can search, instead of once per subscription. SendAlertsService looks up
+    ids of items matched by its feed predicates and applies the rest of its filters (delivery cursor, score
+    threshold, already sent items) with one query per alert type.
+
+    Searched items are items of lookback window past the oldest delivery cursor of the feeds,
+    feeds searched with the index share its search time and last comment id.
+
+    >>> from telegram_feed.matching import AlertPredicateIndex
+    >>> predicate_index = AlertPredicateIndex(
+            user_feeds=user_feeds, lookback=ALERTS_LOOKBACK, cursor_overlap=..., comment_cursor_overlap=...
+        )
+    >>> predicate_index.get_thread_ids_by_keywords(keywords=user_feed.keywords.all())
+    -> <set[int]>
+    """
+
+    THREAD_ALERT_TYPES = {
+        DeliveryCursor.THREADS_BY_KEYWORDS,
+        DeliveryCursor.THREADS_BY_DOMAIN_NAMES,
+        DeliveryCursor.FOLLOWED_USERS_THREADS,
+    }
+    COMMENT_ALERT_TYPES = {DeliveryCursor.COMMENTS_BY_KEYWORDS, DeliveryCursor.FOLLOWED_USERS_COMMENTS}
+
+    def __init__(
+        self,
+        user_feeds: Iterable[UserFeed],
+        lookback: datetime.timedelta,
+        cursor_overlap: datetime.timedelta,
+        comment_cursor_overlap: datetime.timedelta,
+    ) -> None:
+        user_feeds = list(user_feeds)
+        self.searched_at = timezone.now()
+        self.last_comment_id: int = Comment.objects.aggregate(Max("pk"))["pk__max"] or 0
+
+        thread_patterns: set[KeywordPattern] = set()
+        comment_patterns: set[KeywordPattern] = set()
+        domain_names: set[str] = set()
+        usernames: set[str] = set()
+        for user_feed in user_feeds:
+            for keyword in user_feed.keywords.all():
+                if keyword.search_threads is True:
+                    thread_patterns.add(get_keyword_pattern(keyword))
+                if keyword.search_comments is True:
+                    comment_patterns.add(get_keyword_pattern(keyword))
+
+            # domain names are matched case-insensitively
+            domain_names.update(domain_name.lower() for domain_name in user_feed.domain_names)
+            usernames.update(followed_user.username for followed_user in user_feed.follow_list.all())
+
+        threads = self.get_threads_to_search(user_feeds=user_feeds, lookback=lookback, cursor_overlap=cursor_overlap)
+        comments = self.get_comments_to_search(
+            user_feeds=user_feeds, lookback=lookback, cursor_overlap=comment_cursor_overlap
+        )
+
+        self.thread_ids_by_keyword_pattern = group_item_ids(
+            match_patterns(threads, field_name="title", patterns=thread_patterns)
+        )
+        self.comment_ids_by_keyword_pattern = group_item_ids(
+            match_patterns(comments, field_name="body", patterns=comment_patterns)
+        )
+        self.thread_ids_by_domain_name = group_item_ids(match_domain_names(threads, domain_names=domain_names))
+        # creator username is nullable, only threads of followed users are selected
+        thread_creator_usernames = threads.filter(creator_username__in=usernames).values_list("pk", "creator_username")
+        self.thread_ids_by_username = group_item_ids(
+            (thread_pk, creator_username)
+            for thread_pk, creator_username in thread_creator_usernames
+            if creator_username is not None
+        )
+        self.comment_ids_by_username = group_item_ids(
+            comments.filter(username__in=usernames).values_list("pk", "username")
+        )
+
+    def get_threads_to_search(
+        self, user_feeds: list[UserFeed], lookback: datetime.timedelta, cursor_overlap: datetime.timedelta
+    ) -> QuerySet[Thread]:
+        threads = Thread.objects.filter(created__gte=self.searched_at - lookback)
+
+        last_threads_modified = [
+            get_delivery_cursor_value(user_feed, alert_type, "last_thread_modified")
+            for user_feed in user_feeds
+            for alert_type in self.THREAD_ALERT_TYPES
+        ]
+        if last_threads_modified and None not in last_threads_modified:
+            threads = threads.filter(modified__gt=min(last_threads_modified) - cursor_overlap)  # type: ignore
+
+        return threads
+
+    def get_comments_to_search(
+        self, user_feeds: list[UserFeed], lookback: datetime.timedelta, cursor_overlap: datetime.timedelta
+    ) -> QuerySet[Comment]:
+        comments = Comment.objects.filter(created__gte=self.searched_at - lookback, pk__lte=self.last_comment_id)
+
+        last_comment_ids = [
+            get_delivery_cursor_value(user_feed, alert_type, "last_comment_id")
+            for user_feed in user_feeds
+            for alert_type in self.COMMENT_ALERT_TYPES
+        ]
+        if last_comment_ids and None not in last_comment_ids:
+            comments = get_comments_after_cursor(
+                comments, last_comment_id=min(last_comment_ids), cursor_overlap=cursor_overlap  # type: ignore
+            )
+
+        return comments
+
+    def get_thread_ids_by_keywords(self, keywords: Iterable[Keyword]) -> set[int]:
+        return set().union(
+            *(self.thread_ids_by_keyword_pattern.get(get_keyword_pattern(keyword), ()) for keyword in keywords)
+        )
+
+    def get_comment_ids_by_keywords(self, keywords: Iterable[Keyword]) -> dict[str, set[int]]:
+        return {
+            keyword.name: self.comment_ids_by_keyword_pattern.get(get_keyword_pattern(keyword), set())
+            for keyword in keywords
+        }
+
+    def get_thread_ids_by_domain_names(self, domain_names: Iterable[str]) -> set[int]:
+        return set().union(
+            *(self.thread_ids_by_domain_name.get(domain_name.lower(), ()) for domain_name in domain_names)
+        )
+
+    def get_thread_ids_by_usernames(self, usernames: Iterable[str]) -> set[int]:
+        return set().union(*(self.thread_ids_by_username.get(username, ()) for username in usernames))
+
+    def get_comment_ids_by_usernames(self, usernames: Iterable[str]) -> set[int]:
+        return set().union(*(self.comment_ids_by_username.get(username, ()) for username in usernames))
+
+
+def group_item_ids(matches: Iterable[tuple[int, PredicateT]]) -> Mapping[PredicateT, set[int]]:
+    """group (item id, predicate) pairs by predicate"""
+
+    item_ids_by_predicate: dict[PredicateT, set[int]] = defaultdict(set)
+    for item_id, predicate in matches:
+        item_ids_by_predicate[predicate].add(item_id)
+
+    return item_ids_by_predicate
+
+
+def get_comments_after_cursor(
+    comments: QuerySet[Comment], last_comment_id: int, cursor_overlap: datetime.timedelta
+) -> QuerySet[Comment]:
+    """
+    Comments after delivery cursor comment
+
+    Comment with lower pk can be committed after cursor moved past it (comments are saved by several scrapers),
+    so comments created within cursor overlap before cursor comment are searched again
+    """
+
+    cursor_comment_created = Subquery(Comment.objects.filter(pk=last_comment_id).values("created"))
+    return comments.filter(Q(pk__gt=last_comment_id) | Q(created__gt=cursor_comment_created - cursor_overlap))
+
+
+def get_delivery_cursor_value(user_feed: UserFeed, alert_type: str, field_name: str):
+    """value of prefetched delivery cursor of user feed, None if feed has no cursor of alert type"""
+
+    for delivery_cursor in user_feed.delivery_cursors.all():
+        if delivery_cursor.alert_type == alert_type:
+            return getattr(delivery_cursor, field_name)
+
+    return None
@@ -0,0 +1,67 @@
+# Generated by Django 4.1.7 on 2026-10-17 19:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("telegram_feed", "0016_userfeed_followed_user_comments_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeliveryCursor",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "created",
+                    model_utils.fields.AutoCreatedField(
+                        default=django.utils.timezone.now, editable=False, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    model_utils.fields.AutoLastModifiedField(
+                        default=django.utils.timezone.now, editable=False, verbose_name="modified"
+                    ),
+                ),
+                (
+                    "alert_type",
+                    models.CharField(
+                        choices=[
+                            ("THREADS_BY_KEYWORDS", "Threads by keywords"),
+                            ("COMMENTS_BY_KEYWORDS", "Comments by keywords"),
+                            ("THREADS_BY_DOMAIN_NAMES", "Threads by domain names"),
+                            ("REPLY_COMMENTS", "Reply comments"),
+                            ("SUBSCRIPTION_COMMENTS", "Subscription comments"),
+                            ("FOLLOWED_USERS_THREADS", "Followed users threads"),
+                            ("FOLLOWED_USERS_COMMENTS", "Followed users comments"),
+                        ],
+                        max_length=30,
+                        verbose_name="alert type",
+                    ),
+                ),
+                ("last_comment_id", models.PositiveBigIntegerField(null=True, verbose_name="last searched comment pk")),
+                (
+                    "last_thread_modified",
+                    models.DateTimeField(null=True, verbose_name="threads modified before it were searched"),
+                ),
+                (
+                    "user_feed",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="delivery_cursors",
+                        to="telegram_feed.userfeed",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="deliverycursor",
+            constraint=models.UniqueConstraint(fields=("user_feed", "alert_type"), name="unique_delivery_cursor"),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.1.7 on 2026-10-17 19:47
+
+from django.db import migrations, models
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("telegram_feed", "0017_deliverycursor"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboxMessage",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "created",
+                    model_utils.fields.AutoCreatedField(
+                        default=django.utils.timezone.now, editable=False, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    model_utils.fields.AutoLastModifiedField(
+                        default=django.utils.timezone.now, editable=False, verbose_name="modified"
+                    ),
+                ),
+                ("chat_id", models.BigIntegerField(verbose_name="telegram chat id")),
+                (
+                    "alert_type",
+                    models.CharField(
+                        choices=[
+                            ("THREADS_BY_KEYWORDS", "Threads by keywords"),
+                            ("COMMENTS_BY_KEYWORDS", "Comments by keywords"),
+                            ("THREADS_BY_DOMAIN_NAMES", "Threads by domain names"),
+                            ("REPLY_COMMENTS", "Reply comments"),
+                            ("SUBSCRIPTION_COMMENTS", "Subscription comments"),
+                            ("FOLLOWED_USERS_THREADS", "Followed users threads"),
+                            ("FOLLOWED_USERS_COMMENTS", "Followed users comments"),
+                        ],
+                        max_length=30,
+                        verbose_name="alert type",
+                    ),
+                ),
+                ("item_id", models.PositiveBigIntegerField(verbose_name="thread or comment pk")),
+                ("text", models.TextField(verbose_name="message text")),
+                ("inline_keyboard_markup", models.JSONField(null=True, verbose_name="message inline keyboard")),
+                ("parse_mode", models.CharField(max_length=20, null=True, verbose_name="message parse mode")),
+                ("disable_web_page_preview", models.BooleanField(default=False)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("PENDING", "Pending"), ("SENT", "Sent"), ("FAILED", "Failed")],
+                        default="PENDING",
+                        max_length=10,
+                        verbose_name="delivery status",
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0, verbose_name="delivery attempts")),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(default=django.utils.timezone.now, verbose_name="next delivery attempt at"),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="outboxmessage",
+            index=models.Index(
+                condition=models.Q(("status", "PENDING")), fields=["next_attempt_at"], name="outbox_pending_index"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="outboxmessage",
+            constraint=models.UniqueConstraint(
+                fields=("chat_id", "alert_type", "item_id"), name="unique_outbox_message"
+            ),
+        ),
+    ]
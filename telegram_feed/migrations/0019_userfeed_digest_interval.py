@@ -0,0 +1,23 @@
+# Generated by Django 4.1.7 on 2026-10-17 19:50
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("telegram_feed", "0018_outboxmessage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userfeed",
+            name="digest_interval",
+            field=models.PositiveSmallIntegerField(
+                null=True,
+                validators=[django.core.validators.MaxValueValidator(1440)],
+                verbose_name="Minutes between digest messages (0 - after every alerts search), alerts aren't packed if null",
+            ),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.contrib.postgres.fields import ArrayField
 from django.core.validators import MaxValueValidator, MinLengthValidator
 from django.db import models
+from django.utils import timezone
 from model_utils.models import TimeStampedModel
 
 from scraper.models import Comment, Thread
@@ -18,6 +19,11 @@ class UserFeed(TimeStampedModel, models.Model):
         default=1,
         validators=[MaxValueValidator(10000)],
     )
+    digest_interval = models.PositiveSmallIntegerField(
+        null=True,
+        verbose_name="Minutes between digest messages (0 - after every alerts search), alerts aren't packed if null",
+        validators=[MaxValueValidator(1440)],
+    )
     threads = models.ManyToManyField(Thread, related_name="user_feeds")
     comments = models.ManyToManyField(Comment, related_name="user_feeds")
     subscription_threads = models.ManyToManyField(Thread, related_name="subscription_user_feeds")
@@ -62,3 +68,78 @@ class FollowedUser(TimeStampedModel, models.Model):
     username = models.CharField(max_length=15, verbose_name="hacker news username")
     follow_threads = models.BooleanField(default=True, verbose_name="follow user's threads")
     follow_comments = models.BooleanField(default=True, verbose_name="follow user's comments")
+
+
+class DeliveryCursor(TimeStampedModel, models.Model):
+    """Position up to which items were searched for alerts of one type, next search starts after it"""
+
+    THREADS_BY_KEYWORDS = "THREADS_BY_KEYWORDS"
+    COMMENTS_BY_KEYWORDS = "COMMENTS_BY_KEYWORDS"
+    THREADS_BY_DOMAIN_NAMES = "THREADS_BY_DOMAIN_NAMES"
+    REPLY_COMMENTS = "REPLY_COMMENTS"
+    SUBSCRIPTION_COMMENTS = "SUBSCRIPTION_COMMENTS"
+    FOLLOWED_USERS_THREADS = "FOLLOWED_USERS_THREADS"
+    FOLLOWED_USERS_COMMENTS = "FOLLOWED_USERS_COMMENTS"
+
+    ALERT_TYPE_CHOICES = [
+        (THREADS_BY_KEYWORDS, "Threads by keywords"),
+        (COMMENTS_BY_KEYWORDS, "Comments by keywords"),
+        (THREADS_BY_DOMAIN_NAMES, "Threads by domain names"),
+        (REPLY_COMMENTS, "Reply comments"),
+        (SUBSCRIPTION_COMMENTS, "Subscription comments"),
+        (FOLLOWED_USERS_THREADS, "Followed users threads"),
+        (FOLLOWED_USERS_COMMENTS, "Followed users comments"),
+    ]
+
+    user_feed = models.ForeignKey(UserFeed, on_delete=models.CASCADE, related_name="delivery_cursors")
+    alert_type = models.CharField(max_length=30, choices=ALERT_TYPE_CHOICES, verbose_name="alert type")
+    last_comment_id = models.PositiveBigIntegerField(null=True, verbose_name="last searched comment pk")
+    last_thread_modified = models.DateTimeField(null=True, verbose_name="threads modified before it were searched")
+
+    def __str__(self):
+        return f"({self.pk}) {self.user_feed_id} {self.alert_type}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user_feed", "alert_type"], name="unique_delivery_cursor"),
+        ]
+
+
+class OutboxMessage(TimeStampedModel, models.Model):
+    """Rendered alert message waiting to be sent, one per chat, alert type and item (idempotency key)"""
+
+    PENDING = "PENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    ]
+
+    chat_id = models.BigIntegerField(verbose_name="telegram chat id")
+    alert_type = models.CharField(max_length=30, choices=DeliveryCursor.ALERT_TYPE_CHOICES, verbose_name="alert type")
+    item_id = models.PositiveBigIntegerField(verbose_name="thread or comment pk")
+    text = models.TextField(verbose_name="message text")
+    inline_keyboard_markup = models.JSONField(null=True, verbose_name="message inline keyboard")
+    parse_mode = models.CharField(max_length=20, null=True, verbose_name="message parse mode")
+    disable_web_page_preview = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="delivery status")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="delivery attempts")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="next delivery attempt at")
+
+    def __str__(self):
+        return f"({self.pk}) {self.chat_id} {self.alert_type} {self.item_id} {self.status}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["chat_id", "alert_type", "item_id"], name="unique_outbox_message"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                name="outbox_pending_index",
+                condition=models.Q(status="PENDING"),
+            ),
+        ]
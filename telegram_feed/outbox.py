@@ -0,0 +1,179 @@
+import datetime
+from collections import defaultdict
+from time import monotonic
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from telegram_feed.digest import pack_digest_messages
+from telegram_feed.models import OutboxMessage, UserFeed
+from telegram_feed.sender import AsyncMessageSender, SyncMessageSender, get_message_sender
+from telegram_feed.types import SenderStats, TelegramMessage
+
+
+class OutboxWriter:
+    """
+    Save alert messages to outbox instead of sending them, they are sent by OutboxSender
+
+    Message already saved for the same chat, alert type and item is not saved again
+    >>> outbox_writer = OutboxWriter()
+    >>> SendAlertsService(user_feed=user_feed, message_sender=outbox_writer).send_alerts()
+    >>> outbox_writer.messages_queued
+    -> 3
+    """
+
+    def __init__(self) -> None:
+        self.messages_queued = 0
+
+    def send_messages(self, messages: list[TelegramMessage]) -> list[bool]:
+        outbox_messages = []
+        for message in messages:
+            # alert type and item id are idempotency key of outbox, so only alert messages are saved
+            if message.alert_type is None or message.item_id is None:
+                raise ValueError("Outbox message must have alert type and item id!")
+
+            outbox_messages.append(
+                OutboxMessage(
+                    chat_id=message.chat_id,
+                    alert_type=message.alert_type,
+                    item_id=message.item_id,
+                    text=message.text,
+                    inline_keyboard_markup=message.inline_keyboard_markup,
+                    parse_mode=message.parse_mode,
+                    disable_web_page_preview=message.disable_web_page_preview,
+                    next_attempt_at=message.send_after or timezone.now(),
+                )
+            )
+
+        OutboxMessage.objects.bulk_create(outbox_messages, ignore_conflicts=True)
+        self.messages_queued += len(messages)
+
+        # saved messages will be sent or retried
+        return [True] * len(messages)
+
+
+class OutboxSender:
+    """
+    Send pending outbox messages in batches
+
+    Due messages are claimed with SELECT ... FOR UPDATE SKIP LOCKED: attempt is counted and next attempt is moved
+    by lease time, so parallel senders don't send a message twice and messages of a killed sender are sent again
+    after the lease. Messages that failed to send are retried with exponential backoff up to max attempts.
+    Messages of user feeds with digest mode are packed into digest messages.
+
+    >>> from telegram_feed.outbox import OutboxSender
+    >>> outbox_sender = OutboxSender()
+    >>> outbox_sender.send_pending_messages()
+    -> SenderStats(sent=10, failed=0, retried=0, elapsed=1.2)
+    """
+
+    LEASE = datetime.timedelta(minutes=5)
+    RETRY_BACKOFF = datetime.timedelta(seconds=30)
+
+    def __init__(
+        self,
+        message_sender: AsyncMessageSender | SyncMessageSender | None = None,
+        batch_size: int = settings.TELEGRAM_OUTBOX_BATCH_SIZE,
+        max_attempts: int = settings.TELEGRAM_OUTBOX_MAX_ATTEMPTS,
+    ) -> None:
+        self.message_sender = message_sender or get_message_sender()
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.messages_failed = 0
+
+    def send_pending_messages(self, max_duration: float = 200.0) -> SenderStats:
+        """send batches of due messages until there are none or max duration (seconds) is exceeded"""
+
+        started_at = monotonic()
+        while monotonic() - started_at < max_duration:
+            outbox_messages = self.claim_messages()
+            if not outbox_messages:
+                break
+
+            packed_messages = self.pack_messages(outbox_messages=outbox_messages)
+            messages_sent = self.message_sender.send_messages(messages=[message for message, _ in packed_messages])
+
+            self.save_results(packed_messages=packed_messages, messages_sent=messages_sent)
+
+        return self.message_sender.stats
+
+    def claim_messages(self) -> list[OutboxMessage]:
+        now = timezone.now()
+
+        with transaction.atomic():
+            outbox_messages = list(
+                OutboxMessage.objects.select_for_update(skip_locked=True)
+                .filter(status=OutboxMessage.PENDING, next_attempt_at__lte=now)
+                .order_by("next_attempt_at", "pk")[: self.batch_size]
+            )
+            for outbox_message in outbox_messages:
+                outbox_message.attempts += 1
+                outbox_message.next_attempt_at = now + self.LEASE
+                outbox_message.modified = now
+
+            OutboxMessage.objects.bulk_update(outbox_messages, fields=["attempts", "next_attempt_at", "modified"])
+
+        return outbox_messages
+
+    def pack_messages(self, outbox_messages: list[OutboxMessage]) -> list[tuple[TelegramMessage, list[OutboxMessage]]]:
+        """pack messages of chats with digest mode into digest messages, other messages are sent one by one"""
+
+        digest_chat_ids = set(
+            UserFeed.objects.filter(
+                chat_id__in={outbox_message.chat_id for outbox_message in outbox_messages},
+                digest_interval__isnull=False,
+            ).values_list("chat_id", flat=True)
+        )
+
+        packed_messages = []
+        outbox_messages_by_digest_chat_id: dict[int, list[OutboxMessage]] = defaultdict(list)
+        for outbox_message in outbox_messages:
+            if outbox_message.chat_id in digest_chat_ids:
+                outbox_messages_by_digest_chat_id[outbox_message.chat_id].append(outbox_message)
+            else:
+                packed_messages.append((get_telegram_message(outbox_message), [outbox_message]))
+
+        for chat_outbox_messages in outbox_messages_by_digest_chat_id.values():
+            digest_messages = pack_digest_messages(
+                messages=[get_telegram_message(outbox_message) for outbox_message in chat_outbox_messages]
+            )
+            for digest_message, indexes in digest_messages:
+                packed_messages.append((digest_message, [chat_outbox_messages[index] for index in indexes]))
+
+        return packed_messages
+
+    def save_results(
+        self, packed_messages: list[tuple[TelegramMessage, list[OutboxMessage]]], messages_sent: list[bool]
+    ) -> None:
+        """save delivery results, outbox messages packed into one digest share its result"""
+
+        now = timezone.now()
+
+        outbox_messages = []
+        for (_, packed_outbox_messages), sent in zip(packed_messages, messages_sent):
+            for outbox_message in packed_outbox_messages:
+                outbox_message.modified = now
+                if sent:
+                    outbox_message.status = OutboxMessage.SENT
+                elif outbox_message.attempts >= self.max_attempts:
+                    outbox_message.status = OutboxMessage.FAILED
+                    self.messages_failed += 1
+                else:
+                    outbox_message.next_attempt_at = now + self.RETRY_BACKOFF * 2 ** (outbox_message.attempts - 1)
+
+                outbox_messages.append(outbox_message)
+
+        OutboxMessage.objects.bulk_update(outbox_messages, fields=["status", "next_attempt_at", "modified"])
+
+
+def get_telegram_message(outbox_message: OutboxMessage) -> TelegramMessage:
+    return TelegramMessage(
+        chat_id=outbox_message.chat_id,
+        text=outbox_message.text,
+        inline_keyboard_markup=outbox_message.inline_keyboard_markup,
+        parse_mode=outbox_message.parse_mode,
+        disable_web_page_preview=outbox_message.disable_web_page_preview,
+        alert_type=outbox_message.alert_type,
+        item_id=outbox_message.item_id,
+    )
@@ -0,0 +1,153 @@
+import datetime
+from collections.abc import Callable, Hashable
+
+from django.conf import settings
+
+from scraper.change_detector import LRUStore
+from scraper.models import Comment, Thread
+from telegram_feed.types import InlineKeyboardButton, RenderedMessage
+from telegram_feed.utils import escape_markdown
+
+# message templates
+THREAD_TEMPLATE = "thread"
+FOLLOWED_USER_THREAD_TEMPLATE = "followed_user_thread"
+KEYWORD_COMMENT_TEMPLATE = "keyword_comment"
+FOLLOWED_USER_COMMENT_TEMPLATE = "followed_user_comment"
+REPLY_COMMENT_TEMPLATE = "reply_comment"
+SUBSCRIPTION_COMMENT_TEMPLATE = "subscription_comment"
+
+
+class MessageRenderer:
+    """
+    Render alert messages of threads and comments, every (item, template) is rendered once
+
+    Rendered messages are kept in a bounded LRU store, so an item sent to many feeds in one search cycle
+    reuses the same text and inline keyboard. Item modification time is a part of the key,
+    so messages of updated items (score, comments count) are rendered again.
+
+    >>> from telegram_feed.rendering import MessageRenderer
+    >>> message_renderer = MessageRenderer()
+    >>> message_renderer.render_thread(thread=thread)
+    -> RenderedMessage(text="[*Title*](https://example\\.com) ...", parse_mode="MarkdownV2", ...)
+    >>> message_renderer.render_thread(thread=thread)  # from cache
+    >>> message_renderer.cache_hits
+    -> 1
+    """
+
+    def __init__(self, max_size: int = settings.TELEGRAM_RENDER_CACHE_SIZE) -> None:
+        self.rendered_messages = LRUStore(max_size=max_size)
+        self.cache_hits = 0
+
+    def render(self, key: Hashable, render_message: Callable[[], RenderedMessage]) -> RenderedMessage:
+        if rendered_message := self.rendered_messages.get_many([key]).get(key):
+            self.cache_hits += 1
+            return rendered_message
+
+        rendered_message = render_message()
+        self.rendered_messages.set_many({key: rendered_message})
+
+        return rendered_message
+
+    def render_thread(self, thread: Thread) -> RenderedMessage:
+        return self.render(
+            key=(THREAD_TEMPLATE, thread.pk, thread.modified),
+            render_message=lambda: render_thread_message(thread=thread),
+        )
+
+    def render_followed_user_thread(self, thread: Thread) -> RenderedMessage:
+        return self.render(
+            key=(FOLLOWED_USER_THREAD_TEMPLATE, thread.pk, thread.modified),
+            render_message=lambda: render_thread_message(
+                thread=thread,
+                header=f"New story by followed user: {escape_markdown(text=thread.creator_username, version=2)}\n\n",
+            ),
+        )
+
+    def render_keyword_comment(self, comment: Comment, keyword: str) -> RenderedMessage:
+        return self.render(
+            key=(KEYWORD_COMMENT_TEMPLATE, comment.pk, comment.modified, keyword),
+            render_message=lambda: render_comment_message(
+                comment=comment,
+                text=(
+                    f"Keyword match: {keyword}\n"
+                    f"By {comment.username} on {get_created_at_str(comment.comment_created_at)}\n\n"
+                    f"{comment.body}"
+                ),
+            ),
+        )
+
+    def render_followed_user_comment(self, comment: Comment) -> RenderedMessage:
+        return self.render(
+            key=(FOLLOWED_USER_COMMENT_TEMPLATE, comment.pk, comment.modified),
+            render_message=lambda: render_comment_message(
+                comment=comment,
+                text=(
+                    f"New comment by followed user: {comment.username}\n\n"
+                    f"{comment.body}\n\n"
+                    f"on {get_created_at_str(comment.comment_created_at)}"
+                ),
+            ),
+        )
+
+    def render_reply_comment(self, comment: Comment) -> RenderedMessage:
+        return self.render(
+            key=(REPLY_COMMENT_TEMPLATE, comment.pk, comment.modified),
+            render_message=lambda: render_comment_message(
+                comment=comment,
+                text=(
+                    f"Comment reply notification\n"
+                    f"By {comment.username} on {get_created_at_str(comment.comment_created_at)}\n\n"
+                    f"{comment.body}"
+                ),
+            ),
+        )
+
+    def render_subscription_comment(self, comment: Comment, thread_title: str) -> RenderedMessage:
+        return self.render(
+            key=(SUBSCRIPTION_COMMENT_TEMPLATE, comment.pk, comment.modified, thread_title),
+            render_message=lambda: render_comment_message(
+                comment=comment,
+                text=(
+                    f"Subscribed thread: {thread_title}\n"
+                    f"By {comment.username} on {get_created_at_str(comment.comment_created_at)}\n\n"
+                    f"{comment.body}"
+                ),
+            ),
+        )
+
+
+def render_thread_message(thread: Thread, header: str = "") -> RenderedMessage:
+    escaped_title = escape_markdown(text=thread.title, version=2)
+    escaped_story_link = escape_markdown(text=thread.link, version=2, entity_type="text_link")
+    escaped_comments_link = escape_markdown(
+        text=thread.comments_link, version=2, entity_type="text_link"  # type: ignore
+    )
+    text = (
+        f"{header}"
+        f"[*{escaped_title}*]({escaped_story_link}) \n\n"
+        f"{thread.score}\\+ points \\| [{thread.comments_count}\\+ "
+        f"comments]({escaped_comments_link}) \\| {get_created_at_str(thread.thread_created_at)}"
+    )
+
+    read_button = InlineKeyboardButton(text="read", url=thread.link)
+    comments_button = InlineKeyboardButton(text=f"{thread.comments_count}+ comments", url=thread.comments_link)
+
+    return RenderedMessage(
+        text=text,
+        inline_keyboard_markup={"inline_keyboard": [[read_button, comments_button]]},
+        parse_mode="MarkdownV2",
+    )
+
+
+def render_comment_message(comment: Comment, text: str) -> RenderedMessage:
+    reply_button = InlineKeyboardButton(text="reply", url=f"{settings.HACKERNEWS_URL}reply?id={comment.comment_id}")
+    context_button = InlineKeyboardButton(
+        text="context",
+        url=(f"{settings.HACKERNEWS_URL}item?id=" f"{comment.thread_id_int}#{comment.comment_id}"),
+    )
+
+    return RenderedMessage(text=text, inline_keyboard_markup={"inline_keyboard": [[reply_button, context_button]]})
+
+
+def get_created_at_str(created_at: datetime.datetime) -> str:
+    return created_at.strftime("%B %d, %H:%M")
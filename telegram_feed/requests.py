@@ -1,22 +1,21 @@
-import json
-from collections.abc import Mapping, MutableMapping
+from collections.abc import Mapping
 from datetime import datetime
+from typing import Any
 
-import requests
 from django.conf import settings
 from django.utils.timezone import make_aware
 
-from scraper.utils import start_request_session
+from telegram_feed.client import TelegramClient, get_telegram_client
 from telegram_feed.exceptions import TelegramRequestError
 from telegram_feed.models import TelegramUpdate
-from telegram_feed.types import InlineKeyboardButton, UpdateData
+from telegram_feed.types import InlineKeyboardButton, SendMessageResult, TelegramMessage, UpdateData
 
 
 class GetUpdatesRequest:
     """getUpdates telegram method"""
 
-    def __init__(self, token: str = settings.TELEGRAM_TOKEN) -> None:
-        self.token = token
+    def __init__(self, token: str = settings.TELEGRAM_TOKEN, telegram_client: TelegramClient | None = None) -> None:
+        self.telegram_client = telegram_client or get_telegram_client(token=token)
 
     def get_updates(self) -> list[TelegramUpdate]:
         updates = self.request_updates()
@@ -30,12 +29,11 @@ class GetUpdatesRequest:
             TelegramRequestError: Telegram API request error
         """
 
-        payload = {"timeout": 2}
+        payload: dict[str, Any] = {"timeout": 2}
         if last_telegram_update := TelegramUpdate.objects.order_by("-created").first():
             payload["offset"] = last_telegram_update.update_id + 1
 
-        response = requests.get(f"https://api.telegram.org/bot{self.token}/getUpdates", params=payload, timeout=30)
-        json_response = response.json()
+        json_response = self.telegram_client.call(method="getUpdates", payload=payload)
 
         if json_response["ok"] is False:
             if json_response["error_code"] == 409:
@@ -44,10 +42,8 @@ class GetUpdatesRequest:
                 # add error_code note in python 3.11
                 raise TelegramRequestError("Telegram API request error")
 
-        result = json_response.get("result")
-
         updates: list[UpdateData] = []
-        for update_data_dict in result:
+        for update_data_dict in json_response.get("result") or []:
             message = update_data_dict.get("message")
             if not message:
                 message = update_data_dict.get("edited_message")
@@ -90,10 +86,8 @@ class GetUpdatesRequest:
 class SendMessageRequest:
     """sendMessage telegram method"""
 
-    def __init__(self) -> None:
-        self.hn_request_session = start_request_session(
-            domen=f"https://api.telegram.org/bot{settings.TELEGRAM_TOKEN}/sendMessage"
-        )
+    def __init__(self, telegram_client: TelegramClient | None = None) -> None:
+        self.telegram_client = telegram_client or get_telegram_client()
 
     def send_message(
         self,
@@ -103,16 +97,32 @@ class SendMessageRequest:
         parse_mode: str | None = None,
         disable_web_page_preview: bool = False,
     ) -> bool:
-        payload: MutableMapping[str, int | str] = {"chat_id": chat_id, "text": text}
-        if inline_keyboard_markup:
-            payload["reply_markup"] = json.dumps(inline_keyboard_markup)
-        if parse_mode:
-            payload["parse_mode"] = parse_mode
-        if disable_web_page_preview:
-            payload["disable_web_page_preview"] = disable_web_page_preview
-
-        response = self.hn_request_session.get(
-            f"https://api.telegram.org/bot{settings.TELEGRAM_TOKEN}/sendMessage", params=payload, timeout=30
+        message = TelegramMessage(
+            chat_id=chat_id,
+            text=text,
+            inline_keyboard_markup=inline_keyboard_markup,
+            parse_mode=parse_mode,
+            disable_web_page_preview=disable_web_page_preview,
         )
-
-        return response.json().get("ok") is True
+        return self.send(message=message).ok
+
+    def send(self, message: TelegramMessage) -> SendMessageResult:
+        payload: dict[str, Any] = {"chat_id": message.chat_id, "text": message.text}
+        if message.inline_keyboard_markup:
+            payload["reply_markup"] = message.inline_keyboard_markup
+        if message.parse_mode:
+            payload["parse_mode"] = message.parse_mode
+        if message.disable_web_page_preview:
+            payload["disable_web_page_preview"] = message.disable_web_page_preview
+
+        try:
+            json_response = self.telegram_client.call(method="sendMessage", payload=payload)
+        except TelegramRequestError:
+            # message is saved as not sent and retried by its sender, other messages of the batch are still sent
+            return SendMessageResult(ok=False)
+
+        retry_after = None
+        if json_response.get("error_code") == 429:
+            retry_after = json_response.get("parameters", {}).get("retry_after", 1)
+
+        return SendMessageResult(ok=json_response.get("ok") is True, retry_after=retry_after)
@@ -0,0 +1,50 @@
+import datetime
+from typing import Any
+
+from django.conf import settings
+from django.utils import timezone
+
+from scraper.retention import delete_in_batches
+from telegram_feed.models import OutboxMessage, UserFeed
+from telegram_feed.services import ALERTS_LOOKBACK
+
+# "already sent" relations, subscription_threads are subscriptions themselves and are not pruned
+SENT_ALERTS_FIELDS = [
+    "threads",
+    "comments",
+    "subscription_comments",
+    "reply_comments",
+    "followed_user_threads",
+    "followed_user_comments",
+]
+
+# rows are kept a bit longer than the lookback window, so running send alerts task doesn't resend them
+SENT_ALERTS_RETENTION_MARGIN = datetime.timedelta(hours=1)
+
+
+def delete_sent_alerts(batch_size: int = settings.ITEMS_RETENTION_BATCH_SIZE) -> dict[str, int]:
+    """
+    Delete "already sent" rows of UserFeed M2M tables whose thread or comment is out of alerts lookback window,
+    and sent or failed outbox messages
+
+    Returns count of deleted rows by table
+    """
+
+    date_to = timezone.now() - ALERTS_LOOKBACK - SENT_ALERTS_RETENTION_MARGIN
+
+    deleted_counts = {}
+    for field_name in SENT_ALERTS_FIELDS:
+        # m2m field name methods are set by contribute_to_class and missing from type stubs
+        m2m_field: Any = UserFeed._meta.get_field(field_name)
+        through_model = m2m_field.remote_field.through
+
+        expired_rows = through_model.objects.filter(**{f"{m2m_field.m2m_reverse_field_name()}__created__lt": date_to})
+        deleted_counts[through_model._meta.db_table] = delete_in_batches(expired_rows, batch_size=batch_size)
+
+    # sent and failed outbox messages keep idempotency keys while their items can be found again
+    expired_outbox_messages = OutboxMessage.objects.filter(
+        status__in=[OutboxMessage.SENT, OutboxMessage.FAILED], modified__lt=date_to
+    )
+    deleted_counts[OutboxMessage._meta.db_table] = delete_in_batches(expired_outbox_messages, batch_size=batch_size)
+
+    return deleted_counts
@@ -0,0 +1,175 @@
+import asyncio
+from collections import defaultdict
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep
+from typing import Protocol
+
+from django.conf import settings
+
+from telegram_feed.requests import SendMessageRequest
+from telegram_feed.types import SendMessageResult, SenderStats, TelegramMessage
+
+ASYNC_SENDER = "ASYNC"
+SYNC_SENDER = "SYNC"
+
+
+class MessageSender(Protocol):
+    def send_messages(self, messages: list[TelegramMessage]) -> list[bool]: ...
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket rate limiter for coroutines of one event loop
+
+    >>> rate_limiter = AsyncTokenBucket(rate=30, capacity=30)
+    >>> await rate_limiter.acquire()  # waits until a token is available
+    """
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            # no awaits between check and take, so coroutines don't need a lock
+            now = monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncMessageSender:
+    """
+    Send telegram messages concurrently with asyncio, within telegram flood control limits
+
+    Messages to one chat are sent in order, one per TELEGRAM_CHAT_MESSAGE_INTERVAL seconds
+    (TELEGRAM_GROUP_CHAT_MESSAGE_INTERVAL for groups), messages to different chats are sent concurrently,
+    up to TELEGRAM_MESSAGES_PER_SECOND in total. Flood control errors (429) are retried after retry_after seconds.
+    Requests are sent by threads of a pool, so one slow chat doesn't block others.
+
+    >>> from telegram_feed.sender import AsyncMessageSender
+    >>> message_sender = AsyncMessageSender()
+    >>> message_sender.send_messages(messages=[TelegramMessage(chat_id=1, text="text")])
+    -> [True]
+    >>> message_sender.stats
+    -> SenderStats(sent=1, failed=0, retried=0, elapsed=0.2)
+    """
+
+    MAX_RETRIES = 3
+
+    def __init__(self, send_message_request: SendMessageRequest | None = None) -> None:
+        self.send_message_request = send_message_request or SendMessageRequest()
+        self.chat_message_interval = settings.TELEGRAM_CHAT_MESSAGE_INTERVAL
+        self.group_chat_message_interval = settings.TELEGRAM_GROUP_CHAT_MESSAGE_INTERVAL
+        self.max_in_flight = settings.TELEGRAM_SENDER_MAX_IN_FLIGHT
+        self.rate_limiter = AsyncTokenBucket(
+            rate=settings.TELEGRAM_MESSAGES_PER_SECOND, capacity=int(settings.TELEGRAM_MESSAGES_PER_SECOND)
+        )
+        # monotonic time of the next allowed message to a chat, kept between send_messages calls
+        self.next_send_at_by_chat_id: dict[int, float] = {}
+        self.stats = SenderStats()
+
+    def send_messages(self, messages: list[TelegramMessage]) -> list[bool]:
+        """send messages and return if each of them was sent, in the order of messages"""
+
+        if not messages:
+            return []
+
+        started_at = monotonic()
+        messages_sent = asyncio.run(self.send_messages_async(messages=messages))
+        self.stats.elapsed += monotonic() - started_at
+
+        return messages_sent
+
+    async def send_messages_async(self, messages: list[TelegramMessage]) -> list[bool]:
+        messages_sent = [False] * len(messages)
+
+        indexed_messages_by_chat_id: dict[int, list[tuple[int, TelegramMessage]]] = defaultdict(list)
+        for index, message in enumerate(messages):
+            indexed_messages_by_chat_id[message.chat_id].append((index, message))
+
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(indexed_messages_by_chat_id))) as executor:
+            await asyncio.gather(
+                *(
+                    self.send_chat_messages(
+                        chat_id=chat_id,
+                        indexed_messages=indexed_messages,
+                        messages_sent=messages_sent,
+                        executor=executor,
+                    )
+                    for chat_id, indexed_messages in indexed_messages_by_chat_id.items()
+                )
+            )
+
+        return messages_sent
+
+    async def send_chat_messages(
+        self,
+        chat_id: int,
+        indexed_messages: Iterable[tuple[int, TelegramMessage]],
+        messages_sent: list[bool],
+        executor: ThreadPoolExecutor,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        # group and channel chat ids are negative
+        message_interval = self.group_chat_message_interval if chat_id < 0 else self.chat_message_interval
+
+        for index, message in indexed_messages:
+            result = SendMessageResult(ok=False)
+            for _ in range(self.MAX_RETRIES + 1):
+                await asyncio.sleep(max(0.0, self.next_send_at_by_chat_id.get(chat_id, 0.0) - monotonic()))
+                await self.rate_limiter.acquire()
+
+                result = await loop.run_in_executor(executor, self.send_message_request.send, message)
+                if result.retry_after is None:
+                    self.next_send_at_by_chat_id[chat_id] = monotonic() + message_interval
+                    break
+
+                self.stats.retried += 1
+                self.next_send_at_by_chat_id[chat_id] = monotonic() + result.retry_after
+
+            messages_sent[index] = result.ok
+            if result.ok:
+                self.stats.sent += 1
+            else:
+                self.stats.failed += 1
+
+
+class SyncMessageSender:
+    """Send telegram messages one at a time"""
+
+    def __init__(self, send_message_request: SendMessageRequest | None = None) -> None:
+        self.send_message_request = send_message_request or SendMessageRequest()
+        self.stats = SenderStats()
+
+    def send_messages(self, messages: list[TelegramMessage]) -> list[bool]:
+        started_at = monotonic()
+
+        messages_sent = []
+        for message in messages:
+            sleep(0.02)
+
+            sent = self.send_message_request.send(message=message).ok
+            messages_sent.append(sent)
+            if sent:
+                self.stats.sent += 1
+            else:
+                self.stats.failed += 1
+
+        self.stats.elapsed += monotonic() - started_at
+        return messages_sent
+
+
+def get_message_sender() -> AsyncMessageSender | SyncMessageSender:
+    if settings.TELEGRAM_MESSAGE_SENDER == SYNC_SENDER:
+        return SyncMessageSender()
+
+    return AsyncMessageSender()
@@ -1,18 +1,36 @@
+import dataclasses
 import datetime
-from collections.abc import Iterable, Mapping
+from collections import defaultdict
+from collections.abc import Iterable, Iterator, Mapping
+from contextlib import contextmanager
 from dataclasses import asdict
-from time import sleep
+from typing import Any
 
-from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, Max, OuterRef
 from django.db.models.query import QuerySet
 from django.utils import timezone
 
 from scraper.models import Comment, Thread
+from telegram_feed.digest import get_digest_send_after
+from telegram_feed.domain_query import get_domain_names_filter
 from telegram_feed.exceptions import BadOptionCombinationError, InvalidOptionError
-from telegram_feed.models import FollowedUser, Keyword, TelegramUpdate, UserFeed
-from telegram_feed.requests import SendMessageRequest
-from telegram_feed.types import FollowedUserData, InlineKeyboardButton, KeywordData
-from telegram_feed.utils import escape_markdown
+from telegram_feed.keyword_query import match_keywords
+from telegram_feed.matching import AlertPredicateIndex, get_comments_after_cursor
+from telegram_feed.models import DeliveryCursor, FollowedUser, Keyword, TelegramUpdate, UserFeed
+from telegram_feed.rendering import MessageRenderer
+from telegram_feed.sender import MessageSender, get_message_sender
+from telegram_feed.types import FollowedUserData, KeywordData, TelegramMessage
+
+# alerts are searched among items scraped during this period
+ALERTS_LOOKBACK = datetime.timedelta(days=1)
+
+# threads saved by transactions that were still running when cursor moved are searched again by the next search
+THREAD_CURSOR_OVERLAP = datetime.timedelta(minutes=5)
+
+# comments are saved by several scrapers (html and item api), a comment with lower pk can be committed after
+# the cursor moved past it, comments created this long before cursor comment are searched again
+COMMENT_CURSOR_OVERLAP = datetime.timedelta(minutes=5)
 
 
 class RespondToMessageService:
@@ -38,8 +56,12 @@ class RespondToMessageService:
     DOMAINS_COMMAND = "DOMAINS_COMMAND"
     NOTIFY_COMMAND = "NOTIFY_COMMAND"
     DISABLE_COMMAND = "DISABLE_COMMAND"
+    DIGEST_COMMAND = "DIGEST_COMMAND"
     UNDEFINED_COMMAND = "UNDEFINED_COMMAND"
 
+    # watched domain names are matched by indexed story link host, so the limit is not bound by query cost
+    MAX_DOMAIN_NAMES = 20
+
     def __init__(self, telegram_update: TelegramUpdate) -> None:
         self.telegram_update = telegram_update
 
@@ -97,6 +119,8 @@ class RespondToMessageService:
                 return self.respond_to_notify_command()
             case self.DISABLE_COMMAND:
                 return self.respond_to_disable_command()
+            case self.DIGEST_COMMAND:
+                return self.respond_to_digest_command()
             case _:
                 return self.respond_to_undefined_command()
 
@@ -142,6 +166,10 @@ class RespondToMessageService:
                 return self.NOTIFY_COMMAND
             case ["/disable"]:
                 return self.DISABLE_COMMAND
+            case ["/digest"] | ["/digest", "off"]:
+                return self.DIGEST_COMMAND
+            case ["/digest", minutes] if minutes.isnumeric():  # type: ignore
+                return self.DIGEST_COMMAND
             case _:
                 return self.UNDEFINED_COMMAND
 
@@ -193,6 +221,7 @@ class RespondToMessageService:
             return f"Fail! Invalid option: {e}"
 
         Keyword.objects.create(**asdict(keyword_data))
+        self.reset_delivery_cursors()
 
         if self.user_feed.keywords.count() == 1:
             return "Keyword added. You will be notified when this keyword is mentioned on Hacker News"
@@ -224,6 +253,7 @@ class RespondToMessageService:
 
         self.user_feed.score_threshold = score
         self.user_feed.save(update_fields=["score_threshold"])
+        self.reset_delivery_cursors()
 
         return f"Score threshold set to {score}"
 
@@ -246,6 +276,7 @@ class RespondToMessageService:
 
         comment_ids_by_thread = Comment.objects.filter(thread_id_int=thread_id).values_list("id", flat=True)
         self.user_feed.subscription_comments.add(*comment_ids_by_thread)
+        self.reset_delivery_cursors()
 
         return f"You are now subscribed to a thread: {thread.title}"
 
@@ -308,6 +339,7 @@ class RespondToMessageService:
             return f"Fail! Invalid option: {e}"
 
         FollowedUser.objects.create(**asdict(user_data))
+        self.reset_delivery_cursors()
 
         return f"You are now following {username}"
 
@@ -335,14 +367,15 @@ class RespondToMessageService:
         if len(domain_name) < 3:
             return "Fail! Minimum length of a domain name is 3 characters"
 
-        if len(self.user_feed.domain_names) >= 5:
-            return "Fail! You are following maximum amount of domain names (5)"
+        if len(self.user_feed.domain_names) >= self.MAX_DOMAIN_NAMES:
+            return f"Fail! You are following maximum amount of domain names ({self.MAX_DOMAIN_NAMES})"
 
         if domain_name in self.user_feed.domain_names:
             return f"Fail! You are already following {domain_name}"
 
         self.user_feed.domain_names.append(domain_name)
         self.user_feed.save()
+        self.reset_delivery_cursors()
 
         return f"You are now following {domain_name}"
 
@@ -374,6 +407,7 @@ class RespondToMessageService:
 
         self.user_feed.hn_username = username
         self.user_feed.save()
+        self.reset_delivery_cursors()
 
         return "You will be notified when somebody replies to one of your comments"
 
@@ -386,334 +420,418 @@ class RespondToMessageService:
 
         return "Reply notifications disabled"
 
+    def respond_to_digest_command(self) -> str:
+        command_data = [w.strip() for w in self.telegram_update.text.split()]
+
+        if command_data[1:] == ["off"]:
+            if self.user_feed.digest_interval is None:
+                return "Fail! Digest mode is not enabled"
+
+            self.user_feed.digest_interval = None
+            self.user_feed.save(update_fields=["digest_interval"])
+            return "Digest mode disabled"
+
+        digest_interval = int(command_data[1]) if len(command_data) > 1 else 0
+        if digest_interval > 1440:
+            return "Fail! Digest interval can't be longer than 1440 minutes"
+
+        self.user_feed.digest_interval = digest_interval
+        self.user_feed.save(update_fields=["digest_interval"])
+
+        if digest_interval == 0:
+            return "Digest mode enabled, alerts will be packed into digest messages"
+        return f"Digest mode enabled, alerts will be packed into digest messages every {digest_interval} minutes"
+
     def respond_to_undefined_command(self) -> str:
         return "Huh? Use /help to see the list of implemented commands"
 
+    def reset_delivery_cursors(self) -> None:
+        """next alerts search looks at the whole lookback window, so new feed settings apply to recent items too"""
+
+        self.user_feed.delivery_cursors.all().delete()
+
 
 class SendAlertsService:
-    def __init__(self, user_feed: UserFeed):
+    """
+    Find and send alerts of a feed
+
+    Every alert type searches only items past its delivery cursor (comments by pk, threads by modified date)
+    and excludes items already sent to the feed with anti-join. Without a cursor the whole lookback window
+    is searched. Cursors are saved by save_delivery_cursors after alerts are sent.
+
+    Search only given threads and comments (pushed by scrapers), delivery cursors are not moved
+    >>> SendAlertsService(user_feed=user_feed, thread_ids=[1, 2], comment_ids=[3]).send_alerts()
+    -> <bool>
+
+    Messages are sent by message sender (TELEGRAM_MESSAGE_SENDER setting), save them to outbox instead
+    to send them by send_outbox_messages_task
+    >>> SendAlertsService(user_feed=user_feed, message_sender=OutboxWriter()).send_alerts()
+
+    Share rendered messages between feeds searched in one cycle
+    >>> message_renderer = MessageRenderer()
+    >>> for user_feed in user_feeds:
+    ...     SendAlertsService(user_feed=user_feed, message_renderer=message_renderer).send_alerts()
+
+    Evaluate distinct keywords, domain names and followed usernames of feeds searched in one cycle once
+    >>> predicate_index = AlertPredicateIndex(user_feeds=user_feeds, lookback=ALERTS_LOOKBACK, ...)
+    >>> for user_feed in user_feeds:
+    ...     SendAlertsService(user_feed=user_feed, predicate_index=predicate_index).send_alerts()
+    """
+
+    def __init__(
+        self,
+        user_feed: UserFeed,
+        thread_ids: list[int] | None = None,
+        comment_ids: list[int] | None = None,
+        message_sender: MessageSender | None = None,
+        message_renderer: MessageRenderer | None = None,
+        predicate_index: AlertPredicateIndex | None = None,
+    ) -> None:
         self.user_feed = user_feed
+        self.message_sender = message_sender or get_message_sender()
+        self.message_renderer = message_renderer or MessageRenderer()
+        self.predicate_index = predicate_index
+        self.thread_ids = thread_ids
+        self.comment_ids = comment_ids
+        self.searched_at = predicate_index.searched_at if predicate_index else timezone.now()
+        self.delivery_cursors = {
+            delivery_cursor.alert_type: delivery_cursor for delivery_cursor in user_feed.delivery_cursors.all()
+        }
+        self.last_comment_id: int | None = predicate_index.last_comment_id if predicate_index else None
 
-    def find_new_followed_users_threads(self) -> QuerySet[Thread]:
-        followed_users = self.user_feed.follow_list.values_list("username", flat=True)
+    def get_delivery_cursor(self, alert_type: str) -> DeliveryCursor:
+        if alert_type not in self.delivery_cursors:
+            self.delivery_cursors[alert_type] = DeliveryCursor(user_feed=self.user_feed, alert_type=alert_type)
 
-        date_from = timezone.now() - datetime.timedelta(days=1)
-        threads_from_24_hours = Thread.objects.filter(created__gte=date_from)
+        return self.delivery_cursors[alert_type]
 
-        threads_by_followed_users = Thread.objects.none()
+    def get_threads_to_search(self, alert_type: str) -> QuerySet[Thread]:
+        """threads of lookback window modified after delivery cursor, cursor is moved to search time"""
 
-        for username in followed_users:
-            threads_by_user = threads_from_24_hours.filter(creator_username=username)
-            threads_by_followed_users = threads_by_followed_users | threads_by_user
+        threads = Thread.objects.filter(created__gte=self.searched_at - ALERTS_LOOKBACK)
+        if self.thread_ids is not None:
+            return threads.filter(pk__in=self.thread_ids)
 
-        return threads_by_followed_users.difference(self.user_feed.followed_user_threads.all())
+        delivery_cursor = self.get_delivery_cursor(alert_type=alert_type)
+        if delivery_cursor.last_thread_modified is not None:
+            threads = threads.filter(modified__gt=delivery_cursor.last_thread_modified - THREAD_CURSOR_OVERLAP)
 
-    def find_new_followed_users_comments(self) -> QuerySet[Comment]:
-        followed_users = self.user_feed.follow_list.values_list("username", flat=True)
+        delivery_cursor.last_thread_modified = self.searched_at
+        return threads
 
-        date_from = timezone.now() - datetime.timedelta(days=1)
-        comments_from_24_hours = Comment.objects.filter(created__gte=date_from)
+    def get_comments_to_search(self, alert_type: str) -> QuerySet[Comment]:
+        """
+        comments of lookback window created after delivery cursor, cursor is moved to the last comment
 
-        comments_by_followed_users = Comment.objects.none()
+        Comments created within cursor overlap before cursor comment are searched again, already sent ones are
+        excluded by alert queries
+        """
 
-        for username in followed_users:
-            comments_by_user = comments_from_24_hours.filter(username=username)
-            comments_by_followed_users = comments_by_followed_users | comments_by_user
+        if self.comment_ids is not None:
+            return Comment.objects.filter(created__gte=self.searched_at - ALERTS_LOOKBACK, pk__in=self.comment_ids)
 
-        return comments_by_followed_users.difference(self.user_feed.followed_user_comments.all())
+        if self.last_comment_id is None:
+            self.last_comment_id = Comment.objects.aggregate(Max("pk"))["pk__max"] or 0
 
-    def send_new_followed_users_threads_to_telegram_feed(self, threads: Iterable[Thread]) -> bool:
-        send_message_request = SendMessageRequest()
+        comments = Comment.objects.filter(created__gte=self.searched_at - ALERTS_LOOKBACK, pk__lte=self.last_comment_id)
 
-        messages_sent: list[bool] = []
-        for thread in threads:
-            sleep(0.02)
-
-            thread_created_at_str = thread.thread_created_at.strftime("%B %d, %H:%M")
-            escaped_title = escape_markdown(text=thread.title, version=2)
-            escaped_creator_username = escape_markdown(text=thread.creator_username, version=2)
-            escaped_story_link = escape_markdown(text=thread.link, version=2, entity_type="text_link")
-            escaped_comments_link = escape_markdown(
-                text=thread.comments_link, version=2, entity_type="text_link"  # type: ignore
-            )
-            text = (
-                f"New story by followed user: {escaped_creator_username}\n\n"
-                f"[*{escaped_title}*]({escaped_story_link}) \n\n"
-                f"{thread.score}\\+ points \\| [{thread.comments_count}\\+ "
-                f"comments]({escaped_comments_link}) \\| {thread_created_at_str}"
+        delivery_cursor = self.get_delivery_cursor(alert_type=alert_type)
+        if delivery_cursor.last_comment_id is not None:
+            comments = get_comments_after_cursor(
+                comments, last_comment_id=delivery_cursor.last_comment_id, cursor_overlap=COMMENT_CURSOR_OVERLAP
             )
 
-            read_button = InlineKeyboardButton(text="read", url=thread.link)
-            comments_button = InlineKeyboardButton(text=f"{thread.comments_count}+ comments", url=thread.comments_link)
+        delivery_cursor.last_comment_id = self.last_comment_id
+        return comments
 
-            inline_keyboard_markup = {"inline_keyboard": [[read_button, comments_button]]}
+    def exclude_sent(self, queryset: QuerySet, sent_field_name: str) -> QuerySet:
+        """exclude items already sent to the feed, anti-join uses (feed, item) unique index of "already sent" table"""
 
-            sent = send_message_request.send_message(
-                chat_id=self.user_feed.chat_id,
-                text=text,
-                inline_keyboard_markup=inline_keyboard_markup,
-                parse_mode="MarkdownV2",
-            )
-            messages_sent.append(sent)
+        # m2m field name methods are set by contribute_to_class and missing from type stubs
+        sent_field: Any = UserFeed._meta.get_field(sent_field_name)
+        sent_items = sent_field.remote_field.through.objects.filter(
+            **{sent_field.m2m_field_name(): self.user_feed, sent_field.m2m_reverse_field_name(): OuterRef("pk")}
+        )
 
-        return all(messages_sent)
+        return queryset.exclude(Exists(sent_items))
 
-    def send_new_followed_users_comments_to_telegram_feed(self, comments: Iterable[Comment]) -> bool:
-        send_message_request = SendMessageRequest()
+    def send_messages(self, messages: list[TelegramMessage]) -> bool:
+        """send messages with message sender, messages of digest mode feed are held until digest interval ends"""
+
+        if self.user_feed.digest_interval is not None:
+            send_after = get_digest_send_after(now=self.searched_at, digest_interval=self.user_feed.digest_interval)
+            messages = [dataclasses.replace(message, send_after=send_after) for message in messages]
+
+        return all(self.message_sender.send_messages(messages=messages))
+
+    def send_alerts(self) -> bool:
+        """
+        Find and send alerts of all types, sent items are saved as "already sent" relations of user feed
 
+        Alerts of a feed are sent by one task at a time (send_alerts_chunk_task and match_alerts_task),
+        so an item isn't found and sent twice by concurrent tasks
+        """
+
+        with lock_user_feed(user_feed=self.user_feed):
+            return self.find_and_send_alerts()
+
+    def find_and_send_alerts(self) -> bool:
+        user_feed = self.user_feed
         messages_sent: list[bool] = []
-        for comment in comments:
-            sleep(0.02)
-
-            comment_created_at_str = comment.comment_created_at.strftime("%B %d, %H:%M")
-            text = (
-                f"New comment by followed user: {comment.username}\n\n"
-                f"{comment.body}\n\n"
-                f"on {comment_created_at_str}"
-            )
 
-            reply_button = InlineKeyboardButton(
-                text="reply", url=f"{settings.HACKERNEWS_URL}reply?id={comment.comment_id}"
-            )
-            context_button = InlineKeyboardButton(
-                text="context",
-                url=(f"{settings.HACKERNEWS_URL}item?id=" f"{comment.thread_id_int}#{comment.comment_id}"),
-            )
+        # send stories by keywords
+        new_threads = self.find_new_threads_by_keywords()
+        messages_sent.append(self.send_threads_to_telegram_feed(threads=new_threads))
+        user_feed.threads.add(*new_threads)
 
-            inline_keyboard_markup = {"inline_keyboard": [[reply_button, context_button]]}
+        # send comments by keywords
+        new_comments, new_comments_by_keywords_dict = self.find_new_comments_by_keywords()
+        messages_sent.append(self.send_comments_to_telegram_feed(comments_by_keywords=new_comments_by_keywords_dict))
+        user_feed.comments.add(*new_comments)
 
-            sent = send_message_request.send_message(
-                chat_id=self.user_feed.chat_id,
-                text=text,
-                inline_keyboard_markup=inline_keyboard_markup,
-                parse_mode=None,
-            )
-            messages_sent.append(sent)
+        # send comments by subscribed threads
+        if user_feed.subscription_threads.exists():
+            self.send_subscription_comments_to_telegram_feed()
 
-        return all(messages_sent)
+        # send stories by domain names
+        new_stories = self.find_new_stories_by_domain_names()
+        messages_sent.append(
+            self.send_threads_to_telegram_feed(threads=new_stories, alert_type=DeliveryCursor.THREADS_BY_DOMAIN_NAMES)
+        )
+        user_feed.threads.add(*new_stories)
 
-    def find_new_reply_comments(self) -> QuerySet[Comment]:
-        date_from = timezone.now() - datetime.timedelta(days=1)
-        comments_from_24_hours = Comment.objects.filter(created__gte=date_from)
+        # send comments (reply notifications)
+        if user_feed.hn_username:
+            new_reply_comments = self.find_new_reply_comments()
+            self.send_reply_comments_to_telegram_feed(comments=new_reply_comments)
+            user_feed.reply_comments.add(*new_reply_comments)
 
-        reply_comments = comments_from_24_hours.filter(parent_comment__username=self.user_feed.hn_username)
+        # send stories by followed users
+        new_followed_users_threads = self.find_new_followed_users_threads()
+        self.send_new_followed_users_threads_to_telegram_feed(threads=new_followed_users_threads)
+        user_feed.followed_user_threads.add(*new_followed_users_threads)
 
-        return reply_comments.difference(self.user_feed.reply_comments.all())
+        # send comments by followed users
+        new_followed_users_comments = self.find_new_followed_users_comments()
+        self.send_new_followed_users_comments_to_telegram_feed(comments=new_followed_users_comments)
+        user_feed.followed_user_comments.add(*new_followed_users_comments)
 
-    def find_new_stories_by_domain_names(self) -> QuerySet[Thread]:
-        domain_names = self.user_feed.domain_names
+        return all(messages_sent)
+
+    def save_delivery_cursors(self) -> None:
+        if not self.delivery_cursors or self.thread_ids is not None or self.comment_ids is not None:
+            return
+
+        DeliveryCursor.objects.bulk_create(
+            list(self.delivery_cursors.values()),
+            update_conflicts=True,
+            unique_fields=["user_feed", "alert_type"],
+            update_fields=["last_comment_id", "last_thread_modified", "modified"],
+        )
 
-        date_from = timezone.now() - datetime.timedelta(days=1)
-        threads_from_24_hours = Thread.objects.filter(created__gte=date_from)
+    def find_new_followed_users_threads(self) -> QuerySet[Thread]:
+        followed_users = self.user_feed.follow_list.values_list("username", flat=True)
 
-        threads_by_domain_names = Thread.objects.none()
+        threads_from_24_hours = self.get_threads_to_search(alert_type=DeliveryCursor.FOLLOWED_USERS_THREADS)
 
-        for domain_name in domain_names:
-            threads_by_domain_name = threads_from_24_hours.filter(
-                link__icontains=domain_name,
-                score__gte=self.user_feed.score_threshold,
+        if self.predicate_index is not None:
+            thread_ids = self.predicate_index.get_thread_ids_by_usernames(usernames=self.get_followed_usernames())
+            return self.exclude_sent(
+                threads_from_24_hours.filter(pk__in=thread_ids), sent_field_name="followed_user_threads"
             )
-            threads_by_domain_names = threads_by_domain_names | threads_by_domain_name
 
-        return threads_by_domain_names.difference(self.user_feed.threads.all())
+        threads_by_followed_users = Thread.objects.none()
 
-    def send_reply_comments_to_telegram_feed(self, comments: Iterable[Comment]) -> bool:
-        send_message_request = SendMessageRequest()
+        for username in followed_users:
+            threads_by_user = threads_from_24_hours.filter(creator_username=username)
+            threads_by_followed_users = threads_by_followed_users | threads_by_user
 
-        messages_sent: list[bool] = []
-        for comment in comments:
-            sleep(0.02)
-
-            comment_created_at_str = comment.comment_created_at.strftime("%B %d, %H:%M")
-            text = (
-                f"Comment reply notification\n"
-                f"By {comment.username} on {comment_created_at_str}\n\n"
-                f"{comment.body}"
-            )
+        return self.exclude_sent(threads_by_followed_users, sent_field_name="followed_user_threads")
+
+    def find_new_followed_users_comments(self) -> QuerySet[Comment]:
+        followed_users = self.user_feed.follow_list.values_list("username", flat=True)
+
+        comments_from_24_hours = self.get_comments_to_search(alert_type=DeliveryCursor.FOLLOWED_USERS_COMMENTS)
 
-            reply_button = InlineKeyboardButton(
-                text="reply", url=f"{settings.HACKERNEWS_URL}reply?id={comment.comment_id}"
+        if self.predicate_index is not None:
+            comment_ids = self.predicate_index.get_comment_ids_by_usernames(usernames=self.get_followed_usernames())
+            return self.exclude_sent(
+                comments_from_24_hours.filter(pk__in=comment_ids), sent_field_name="followed_user_comments"
             )
-            context_button = InlineKeyboardButton(
-                text="context",
-                url=(f"{settings.HACKERNEWS_URL}item?id=" f"{comment.thread_id_int}#{comment.comment_id}"),
+
+        comments_by_followed_users = Comment.objects.none()
+
+        for username in followed_users:
+            comments_by_user = comments_from_24_hours.filter(username=username)
+            comments_by_followed_users = comments_by_followed_users | comments_by_user
+
+        return self.exclude_sent(comments_by_followed_users, sent_field_name="followed_user_comments")
+
+    def get_followed_usernames(self) -> list[str]:
+        return [followed_user.username for followed_user in self.user_feed.follow_list.all()]
+
+    def send_new_followed_users_threads_to_telegram_feed(self, threads: Iterable[Thread]) -> bool:
+        messages = [
+            self.message_renderer.render_followed_user_thread(thread=thread).to_telegram_message(
+                chat_id=self.user_feed.chat_id, alert_type=DeliveryCursor.FOLLOWED_USERS_THREADS, item_id=thread.pk
             )
+            for thread in threads
+        ]
 
-            inline_keyboard_markup = {"inline_keyboard": [[reply_button, context_button]]}
+        return self.send_messages(messages=messages)
 
-            sent = send_message_request.send_message(
-                chat_id=self.user_feed.chat_id,
-                text=text,
-                inline_keyboard_markup=inline_keyboard_markup,
-                parse_mode=None,
+    def send_new_followed_users_comments_to_telegram_feed(self, comments: Iterable[Comment]) -> bool:
+        messages = [
+            self.message_renderer.render_followed_user_comment(comment=comment).to_telegram_message(
+                chat_id=self.user_feed.chat_id, alert_type=DeliveryCursor.FOLLOWED_USERS_COMMENTS, item_id=comment.pk
             )
-            messages_sent.append(sent)
+            for comment in comments
+        ]
 
-        return all(messages_sent)
+        return self.send_messages(messages=messages)
 
-    def send_subscription_comments_to_telegram_feed(self) -> bool:
-        # refactor if users will be allowed to subscribe to multiple threads
-        send_message_request = SendMessageRequest()
+    def find_new_reply_comments(self) -> QuerySet[Comment]:
+        comments_from_24_hours = self.get_comments_to_search(alert_type=DeliveryCursor.REPLY_COMMENTS)
 
-        subscribed_thread = self.user_feed.subscription_threads.all()[0]
-        subscribed_thread_comments = Comment.objects.filter(thread_id_int=subscribed_thread.thread_id)
+        reply_comments = comments_from_24_hours.filter(parent_comment__username=self.user_feed.hn_username)
 
-        new_comments = subscribed_thread_comments.difference(self.user_feed.subscription_comments.all())
+        return self.exclude_sent(reply_comments, sent_field_name="reply_comments")
 
-        messages_sent: list[bool] = []
-        for comment in new_comments:
-            sleep(0.02)
+    def find_new_stories_by_domain_names(self) -> QuerySet[Thread]:
+        domain_names = self.user_feed.domain_names
 
-            comment_created_at_str = comment.comment_created_at.strftime("%B %d, %H:%M")
+        threads_from_24_hours = self.get_threads_to_search(alert_type=DeliveryCursor.THREADS_BY_DOMAIN_NAMES)
 
-            text = (
-                f"Subscribed thread: {subscribed_thread.title}\n"
-                f"By {comment.username} on {comment_created_at_str}\n\n"
-                f"{comment.body}"
+        if self.predicate_index is not None:
+            thread_ids = self.predicate_index.get_thread_ids_by_domain_names(domain_names=domain_names)
+            return self.exclude_sent(
+                threads_from_24_hours.filter(pk__in=thread_ids, score__gte=self.user_feed.score_threshold),
+                sent_field_name="threads",
             )
 
-            reply_button = InlineKeyboardButton(
-                text="reply", url=f"{settings.HACKERNEWS_URL}reply?id={comment.comment_id}"
-            )
-            context_button = InlineKeyboardButton(
-                text="context",
-                url=(f"{settings.HACKERNEWS_URL}item?id=" f"{comment.thread_id_int}#{comment.comment_id}"),
-            )
+        threads_by_domain_names = threads_from_24_hours.filter(
+            get_domain_names_filter(domain_names), score__gte=self.user_feed.score_threshold
+        )
 
-            inline_keyboard_markup = {"inline_keyboard": [[reply_button, context_button]]}
+        return self.exclude_sent(threads_by_domain_names, sent_field_name="threads")
 
-            sent = send_message_request.send_message(
-                chat_id=self.user_feed.chat_id,
-                text=text,
-                inline_keyboard_markup=inline_keyboard_markup,
-                parse_mode=None,
+    def send_reply_comments_to_telegram_feed(self, comments: Iterable[Comment]) -> bool:
+        messages = [
+            self.message_renderer.render_reply_comment(comment=comment).to_telegram_message(
+                chat_id=self.user_feed.chat_id, alert_type=DeliveryCursor.REPLY_COMMENTS, item_id=comment.pk
             )
-            messages_sent.append(sent)
+            for comment in comments
+        ]
 
-            self.user_feed.subscription_comments.add(comment)
+        return self.send_messages(messages=messages)
 
-        return all(messages_sent)
+    def send_subscription_comments_to_telegram_feed(self) -> bool:
+        # refactor if users will be allowed to subscribe to multiple threads
+        subscribed_thread = self.user_feed.subscription_threads.all()[0]
+        subscribed_thread_comments = self.get_comments_to_search(
+            alert_type=DeliveryCursor.SUBSCRIPTION_COMMENTS
+        ).filter(thread_id_int=subscribed_thread.thread_id)
 
-    def send_threads_to_telegram_feed(self, threads: Iterable[Thread]) -> bool:
-        send_message_request = SendMessageRequest()
+        new_comments = self.exclude_sent(subscribed_thread_comments, sent_field_name="subscription_comments")
 
-        messages_sent: list[bool] = []
-        for thread in threads:
-            sleep(0.02)
-
-            thread_created_at_str = thread.thread_created_at.strftime("%B %d, %H:%M")
-            escaped_title = escape_markdown(text=thread.title, version=2)
-            escaped_story_link = escape_markdown(text=thread.link, version=2, entity_type="text_link")
-            escaped_comments_link = escape_markdown(
-                text=thread.comments_link, version=2, entity_type="text_link"  # type: ignore
+        messages: list[TelegramMessage] = []
+        for comment in new_comments:
+            rendered_message = self.message_renderer.render_subscription_comment(
+                comment=comment, thread_title=subscribed_thread.title
             )
-            text = (
-                f"[*{escaped_title}*]({escaped_story_link}) \n\n"
-                f"{thread.score}\\+ points \\| [{thread.comments_count}\\+ "
-                f"comments]({escaped_comments_link}) \\| {thread_created_at_str}"
+            messages.append(
+                rendered_message.to_telegram_message(
+                    chat_id=self.user_feed.chat_id, alert_type=DeliveryCursor.SUBSCRIPTION_COMMENTS, item_id=comment.pk
+                )
             )
 
-            read_button = InlineKeyboardButton(text="read", url=thread.link)
-            comments_button = InlineKeyboardButton(text=f"{thread.comments_count}+ comments", url=thread.comments_link)
+            self.user_feed.subscription_comments.add(comment)
 
-            inline_keyboard_markup = {"inline_keyboard": [[read_button, comments_button]]}
+        return self.send_messages(messages=messages)
 
-            sent = send_message_request.send_message(
-                chat_id=self.user_feed.chat_id,
-                text=text,
-                inline_keyboard_markup=inline_keyboard_markup,
-                parse_mode="MarkdownV2",
+    def send_threads_to_telegram_feed(
+        self, threads: Iterable[Thread], alert_type: str = DeliveryCursor.THREADS_BY_KEYWORDS
+    ) -> bool:
+        messages = [
+            self.message_renderer.render_thread(thread=thread).to_telegram_message(
+                chat_id=self.user_feed.chat_id, alert_type=alert_type, item_id=thread.pk
             )
-            messages_sent.append(sent)
+            for thread in threads
+        ]
 
-        return all(messages_sent)
+        return self.send_messages(messages=messages)
 
     def send_comments_to_telegram_feed(self, comments_by_keywords: Mapping[str, Iterable[Comment]]) -> bool:
-        send_message_request = SendMessageRequest()
-
-        messages_sent: list[bool] = []
+        messages: list[TelegramMessage] = []
         for keyword in comments_by_keywords:
             for comment in comments_by_keywords[keyword]:
-                sleep(0.02)
-
-                comment_created_at_str = comment.comment_created_at.strftime("%B %d, %H:%M")
-
-                text = (
-                    f"Keyword match: {keyword}\n"
-                    f"By {comment.username} on {comment_created_at_str}\n\n"
-                    f"{comment.body}"
-                )
-
-                reply_button = InlineKeyboardButton(
-                    text="reply", url=f"{settings.HACKERNEWS_URL}reply?id={comment.comment_id}"
-                )
-                context_button = InlineKeyboardButton(
-                    text="context",
-                    url=(f"{settings.HACKERNEWS_URL}item?id=" f"{comment.thread_id_int}#{comment.comment_id}"),
+                rendered_message = self.message_renderer.render_keyword_comment(comment=comment, keyword=keyword)
+                messages.append(
+                    rendered_message.to_telegram_message(
+                        chat_id=self.user_feed.chat_id,
+                        alert_type=DeliveryCursor.COMMENTS_BY_KEYWORDS,
+                        item_id=comment.pk,
+                    )
                 )
 
-                inline_keyboard_markup = {"inline_keyboard": [[reply_button, context_button]]}
+        return self.send_messages(messages=messages)
 
-                sent = send_message_request.send_message(
-                    chat_id=self.user_feed.chat_id,
-                    text=text,
-                    inline_keyboard_markup=inline_keyboard_markup,
-                    parse_mode=None,
-                )
-                messages_sent.append(sent)
+    def find_new_threads_by_keywords(self) -> list[Thread]:
+        keywords = self.user_feed.keywords.filter(search_threads=True)
 
-        return all(messages_sent)
+        threads_from_24_hours = self.get_threads_to_search(alert_type=DeliveryCursor.THREADS_BY_KEYWORDS)
+        threads = threads_from_24_hours.filter(
+            score__gte=self.user_feed.score_threshold,
+            comments_link__isnull=False,  # exclude YC hiring posts
+        )
 
-    def find_new_threads_by_keywords(self) -> QuerySet[Thread]:
-        keywords = self.user_feed.keywords.filter(search_threads=True)
+        if self.predicate_index is not None:
+            thread_ids = self.predicate_index.get_thread_ids_by_keywords(keywords=keywords)
+            return list(self.exclude_sent(threads.filter(pk__in=thread_ids), sent_field_name="threads").order_by("pk"))
 
-        date_from = timezone.now() - datetime.timedelta(days=1)
-        threads_from_24_hours = Thread.objects.filter(created__gte=date_from)
+        threads_by_keywords = match_keywords(
+            self.exclude_sent(threads, sent_field_name="threads"), field_name="title", keywords=keywords
+        )
 
-        threads_by_keywords = Thread.objects.none()
+        # thread matched by several keywords is sent once
+        return list({thread.pk: thread for thread, _ in threads_by_keywords}.values())
 
-        for keyword in keywords:
-            keyword_name = keyword.name
-            if keyword.is_full_match is True:
-                keyword_name = f" {keyword_name} "
+    def find_new_comments_by_keywords(self) -> tuple[list[Comment], Mapping[str, list[Comment]]]:
+        keywords = self.user_feed.keywords.filter(search_comments=True)
 
-            threads_by_keyword = threads_from_24_hours.filter(
-                title__icontains=keyword_name,
-                score__gte=self.user_feed.score_threshold,
-                comments_link__isnull=False,  # exclude YC hiring posts
-            )
-            threads_by_keywords = threads_by_keywords | threads_by_keyword
+        comments_from_24_hours = self.get_comments_to_search(alert_type=DeliveryCursor.COMMENTS_BY_KEYWORDS)
 
-        return threads_by_keywords.difference(self.user_feed.threads.all())
+        if self.predicate_index is not None:
+            return self.find_new_comments_by_indexed_keywords(comments=comments_from_24_hours, keywords=keywords)
 
-    def find_new_comments_by_keywords(
-        self,
-    ) -> tuple[QuerySet[Comment], Mapping[str, QuerySet[Comment]]]:
-        keywords = self.user_feed.keywords.filter(search_comments=True)
+        comments_by_keywords = match_keywords(
+            self.exclude_sent(comments_from_24_hours, sent_field_name="comments"), field_name="body", keywords=keywords
+        )
 
-        date_from = timezone.now() - datetime.timedelta(days=1)
-        comments_from_24_hours = Comment.objects.filter(created__gte=date_from)
+        new_comments_by_pk: dict[int, Comment] = {}
+        comments_by_keywords_dict: dict[str, list[Comment]] = defaultdict(list)
+        for comment, keyword_name in comments_by_keywords:
+            new_comments_by_pk.setdefault(comment.pk, comment)
+            comments_by_keywords_dict[keyword_name].append(comment)
 
-        comments_by_keywords = Comment.objects.none()
-        comments_by_keywords_dict: dict[str, QuerySet[Comment]] = {}
+        return list(new_comments_by_pk.values()), comments_by_keywords_dict
 
-        for keyword in keywords:
-            if keyword.is_full_match is False:
-                comments_by_keyword = comments_from_24_hours.filter(
-                    body__icontains=keyword.name,
-                )
-            else:
-                comments_by_keyword = comments_from_24_hours.filter(
-                    body__icontains=f" {keyword.name} ",
-                )
+    def find_new_comments_by_indexed_keywords(
+        self, comments: QuerySet[Comment], keywords: Iterable[Keyword]
+    ) -> tuple[list[Comment], Mapping[str, list[Comment]]]:
+        """find comments matched by keywords in predicate index, fetched with one query"""
 
-            comments_by_keywords_dict[keyword.name] = comments_by_keyword
-            comments_by_keywords = comments_by_keywords | comments_by_keyword
+        comment_ids_by_keywords = self.predicate_index.get_comment_ids_by_keywords(keywords=keywords)  # type: ignore
 
-        all_comments = self.user_feed.comments.all()
-        new_comments = comments_by_keywords.difference(all_comments)
-        for k, v in comments_by_keywords_dict.items():
-            comments_by_keywords_dict[k] = v.difference(all_comments)
+        new_comments = list(
+            self.exclude_sent(
+                comments.filter(pk__in=set().union(*comment_ids_by_keywords.values())), sent_field_name="comments"
+            ).order_by("pk")
+        )
+        comments_by_keywords_dict = {
+            keyword_name: [comment for comment in new_comments if comment.pk in comment_ids]
+            for keyword_name, comment_ids in comment_ids_by_keywords.items()
+        }
 
         return new_comments, comments_by_keywords_dict
 
@@ -770,3 +888,20 @@ def get_keywords_str(user_feed: UserFeed) -> str:
         keyword_lines.append(keyword_line)
 
     return "\n".join(keyword_lines)
+
+
+@contextmanager
+def lock_user_feed(user_feed: UserFeed) -> Iterator[None]:
+    """
+    Hold advisory lock of user feed
+
+    Unlike SELECT ... FOR UPDATE it doesn't need a transaction, so "already sent" relations are saved
+    right after their alerts are sent, and it doesn't block updates of feed settings by bot commands
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", [user_feed.pk])
+        try:
+            yield
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [user_feed.pk])
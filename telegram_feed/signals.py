@@ -0,0 +1,22 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from scraper.signals import items_upserted
+from telegram_feed.matching import alert_matcher_cache
+from telegram_feed.models import FollowedUser, Keyword, UserFeed
+from telegram_feed.tasks import match_alerts_task
+
+
+@receiver(items_upserted)
+def match_alerts_of_upserted_items(sender: type, thread_ids: list[int], comment_ids: list[int], **kwargs) -> None:
+    match_alerts_task.delay(thread_ids=thread_ids, comment_ids=comment_ids)
+
+
+@receiver([post_save, post_delete], sender=UserFeed)
+@receiver([post_save, post_delete], sender=Keyword)
+@receiver([post_save, post_delete], sender=FollowedUser)
+@receiver(m2m_changed, sender=UserFeed.subscription_threads.through)
+def invalidate_alert_matcher(sender: type, **kwargs) -> None:
+    """predicates of user feeds changed, workers build alerts matcher again"""
+
+    alert_matcher_cache.invalidate()
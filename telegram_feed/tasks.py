@@ -1,63 +1,142 @@
+from dataclasses import asdict
+
+from celery import group
+from django.conf import settings
+
 from config import celery_app
+from scraper.models import Comment, Thread
+from telegram_feed.matching import AlertPredicateIndex, alert_matcher_cache
 from telegram_feed.models import UserFeed
+from telegram_feed.outbox import OutboxSender, OutboxWriter
+from telegram_feed.rendering import MessageRenderer
 from telegram_feed.requests import GetUpdatesRequest, SendMessageRequest
-from telegram_feed.services import RespondToMessageService, SendAlertsService
+from telegram_feed.retention import delete_sent_alerts
+from telegram_feed.services import (
+    ALERTS_LOOKBACK,
+    COMMENT_CURSOR_OVERLAP,
+    THREAD_CURSOR_OVERLAP,
+    RespondToMessageService,
+    SendAlertsService,
+)
+
+
+# relations used by SendAlertsService.send_alerts
+SEND_ALERTS_PREFETCH = (
+    "comments",
+    "threads",
+    "keywords",
+    "follow_list",
+    "subscription_threads",
+    "subscription_comments",
+    "reply_comments",
+    "delivery_cursors",
+)
+
+
+@celery_app.task
+def send_alerts_task() -> int:
+    """search all user feeds for alerts missed by match_alerts_task, in chunks searched by workers in parallel"""
+
+    chunk_size = settings.SEND_ALERTS_CHUNK_SIZE
+
+    user_feed_ids_chunks = []
+    last_user_feed_id = 0
+    while user_feed_ids := list(
+        UserFeed.objects.filter(pk__gt=last_user_feed_id).order_by("pk").values_list("pk", flat=True)[:chunk_size]
+    ):
+        user_feed_ids_chunks.append(user_feed_ids)
+        last_user_feed_id = user_feed_ids[-1]
+
+    # chunks complete on their own, so no result backend is needed to run them
+    if user_feed_ids_chunks:
+        group(
+            send_alerts_chunk_task.s(user_feed_ids=user_feed_ids) for user_feed_ids in user_feed_ids_chunks
+        ).apply_async()
+
+    return len(user_feed_ids_chunks)
 
 
 @celery_app.task(time_limit=250)
-def send_alerts_task() -> bool:
-    user_feeds = UserFeed.objects.prefetch_related(
-        "comments",
-        "threads",
-        "keywords",
-        "follow_list",
-        "subscription_threads",
-        "subscription_comments",
-        "reply_comments",
+def send_alerts_chunk_task(user_feed_ids: list[int]) -> bool:
+    """search chunk of user feeds for alerts"""
+
+    # messages are sent by send_outbox_messages_task
+    outbox_writer = OutboxWriter()
+    # messages of an item are rendered once for all feeds of the chunk
+    message_renderer = MessageRenderer()
+
+    user_feeds = list(UserFeed.objects.filter(pk__in=user_feed_ids).prefetch_related(*SEND_ALERTS_PREFETCH))
+    # distinct keywords, domain names and followed usernames of the chunk are evaluated once
+    predicate_index = AlertPredicateIndex(
+        user_feeds=user_feeds,
+        lookback=ALERTS_LOOKBACK,
+        cursor_overlap=THREAD_CURSOR_OVERLAP,
+        comment_cursor_overlap=COMMENT_CURSOR_OVERLAP,
     )
-    messages_sent_to_feeds = []
+
+    messages_queued_to_feeds = []
     for user_feed in user_feeds:
-        send_alerts = SendAlertsService(user_feed=user_feed)
+        send_alerts = SendAlertsService(
+            user_feed=user_feed,
+            message_sender=outbox_writer,
+            message_renderer=message_renderer,
+            predicate_index=predicate_index,
+        )
+        messages_queued_to_feeds.append(send_alerts.send_alerts())
+
+        # next search starts after items searched by this one
+        send_alerts.save_delivery_cursors()
+
+    return all(messages_queued_to_feeds)
+
 
-        # send stories by keywords
-        new_threads = send_alerts.find_new_threads_by_keywords()
-        stories_sent = send_alerts.send_threads_to_telegram_feed(threads=new_threads)
-        messages_sent_to_feeds.append(stories_sent)
-        user_feed.threads.add(*new_threads)
+@celery_app.task(time_limit=250)
+def match_alerts_task(thread_ids: list[int], comment_ids: list[int]) -> dict[str, int]:
+    """send alerts of threads and comments saved by scrapers to affected user feeds only"""
+
+    threads = Thread.objects.filter(pk__in=thread_ids)
+    comments = Comment.objects.filter(pk__in=comment_ids).select_related("parent_comment")
 
-        # send comments by keywords
-        new_comments, new_comments_by_keywords_dict = send_alerts.find_new_comments_by_keywords()
-        comments_sent = send_alerts.send_comments_to_telegram_feed(comments_by_keywords=new_comments_by_keywords_dict)
-        messages_sent_to_feeds.append(comments_sent)
-        user_feed.comments.add(*new_comments)
+    # matcher of user feed predicates is kept by the worker, it isn't built for every scrape
+    user_feed_ids = alert_matcher_cache.get().match(threads=threads, comments=comments)
 
-        # send comments by subscribed threads
-        if user_feed.subscription_threads.exists():
-            send_alerts.send_subscription_comments_to_telegram_feed()
+    # messages are sent by send_outbox_messages_task
+    outbox_writer = OutboxWriter()
+    # messages of an item are rendered once for all matched feeds
+    message_renderer = MessageRenderer()
 
-        # send stories by domain names
-        new_stories = send_alerts.find_new_stories_by_domain_names()
-        stories_sent = send_alerts.send_threads_to_telegram_feed(threads=new_stories)
-        messages_sent_to_feeds.append(stories_sent)
-        user_feed.threads.add(*new_stories)
+    user_feeds = UserFeed.objects.filter(pk__in=user_feed_ids).prefetch_related(*SEND_ALERTS_PREFETCH)
+    for user_feed in user_feeds:
+        SendAlertsService(
+            user_feed=user_feed,
+            thread_ids=thread_ids,
+            comment_ids=comment_ids,
+            message_sender=outbox_writer,
+            message_renderer=message_renderer,
+        ).send_alerts()
+
+    return {
+        "threads": len(thread_ids),
+        "comments": len(comment_ids),
+        "user_feeds_matched": len(user_feed_ids),
+        "messages_queued": outbox_writer.messages_queued,
+        "messages_rendered_from_cache": message_renderer.cache_hits,
+    }
 
-        # send comments (reply notifications)
-        if user_feed.hn_username:
-            new_reply_comments = send_alerts.find_new_reply_comments()
-            send_alerts.send_reply_comments_to_telegram_feed(comments=new_reply_comments)
-            user_feed.reply_comments.add(*new_reply_comments)
 
-        # send stories by followed users
-        new_followed_users_threads = send_alerts.find_new_followed_users_threads()
-        send_alerts.send_new_followed_users_threads_to_telegram_feed(threads=new_followed_users_threads)
-        user_feed.followed_user_threads.add(*new_followed_users_threads)
+@celery_app.task(time_limit=250)
+def send_outbox_messages_task() -> dict[str, int | float]:
+    """send pending outbox messages"""
 
-        # send comments by followed users
-        new_followed_users_comments = send_alerts.find_new_followed_users_comments()
-        send_alerts.send_new_followed_users_comments_to_telegram_feed(comments=new_followed_users_comments)
-        user_feed.followed_user_comments.add(*new_followed_users_comments)
+    outbox_sender = OutboxSender()
+    sender_stats = outbox_sender.send_pending_messages()
 
-    return all(messages_sent_to_feeds)
+    return {
+        **asdict(sender_stats),
+        "messages_per_second": sender_stats.messages_per_second,
+        # failed after the last attempt
+        "messages_dropped": outbox_sender.messages_failed,
+    }
 
 
 @celery_app.task(time_limit=60)
@@ -81,3 +160,10 @@ def respond_to_messages_task() -> bool:
         )
 
     return True
+
+
+@celery_app.task
+def delete_sent_alerts_task() -> dict[str, int]:
+    """delete "already sent" rows of threads and comments that are out of alerts lookback window"""
+
+    return delete_sent_alerts()
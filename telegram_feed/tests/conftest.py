@@ -0,0 +1,18 @@
+import pytest
+
+from telegram_feed.matching import alert_matcher_cache
+
+
+@pytest.fixture(autouse=True)
+def no_chat_message_interval(settings):
+    """messages to one chat are sent without waiting for flood control interval"""
+
+    settings.TELEGRAM_CHAT_MESSAGE_INTERVAL = 0
+
+
+@pytest.fixture(autouse=True)
+def no_kept_alert_matcher():
+    """user feeds of a test are rolled back without signals, so alerts matcher isn't kept for the next test"""
+
+    yield
+    alert_matcher_cache.clear()
@@ -3,7 +3,7 @@ from django.utils import timezone
 from factory import Faker
 from factory.django import DjangoModelFactory
 
-from telegram_feed.models import Keyword, TelegramUpdate, UserFeed
+from telegram_feed.models import DeliveryCursor, Keyword, OutboxMessage, TelegramUpdate, UserFeed
 
 
 class TelegramUpdateFactory(DjangoModelFactory):
@@ -71,3 +71,13 @@ class KeywordFactory(DjangoModelFactory):
 
     class Meta:
         model = Keyword
+
+
+class OutboxMessageFactory(DjangoModelFactory):
+    chat_id = factory.Sequence(lambda n: n)
+    alert_type = DeliveryCursor.THREADS_BY_KEYWORDS
+    item_id = factory.Sequence(lambda n: n)
+    text = Faker("sentence")
+
+    class Meta:
+        model = OutboxMessage
@@ -0,0 +1,117 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from telegram_feed.client import TelegramClient, get_telegram_client
+from telegram_feed.exceptions import TelegramRequestError
+from telegram_feed.requests import SendMessageRequest
+from telegram_feed.types import TelegramMessage
+
+
+class TelegramAPIRequestHandler(BaseHTTPRequestHandler):
+    """Stand-in for telegram bot API, records requests and responds with {"ok": true}"""
+
+    protocol_version = "HTTP/1.1"
+    recorded_requests: list[dict] = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path.endswith("/badGateway"):
+            self.send_html_error()
+            return
+
+        self.recorded_requests.append(
+            {
+                "path": self.path,
+                "content_type": self.headers["Content-Type"],
+                "payload": json.loads(body),
+                "client_port": self.client_address[1],
+            }
+        )
+
+        response_body = json.dumps({"ok": True, "result": []}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response_body)))
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    def send_html_error(self):
+        response_body = b"<html><body>502 Bad Gateway</body></html>"
+        self.send_response(502)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(response_body)))
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def telegram_api_url():
+    TelegramAPIRequestHandler.recorded_requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TelegramAPIRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    host, port = server.server_address[:2]
+    yield f"http://{host}:{port}/"
+
+    server.shutdown()
+    server.server_close()
+
+
+class TestTelegramClient:
+    def test_call_sends_json_post_over_one_connection(self, telegram_api_url):
+        telegram_client = TelegramClient(token="token", api_url=telegram_api_url)
+
+        telegram_client.call(method="getUpdates", payload={"timeout": 2})
+        json_response = telegram_client.call(method="sendMessage", payload={"chat_id": 1, "text": "text"})
+
+        recorded_requests = TelegramAPIRequestHandler.recorded_requests
+        assert json_response == {"ok": True, "result": []}
+        assert [recorded_request["path"] for recorded_request in recorded_requests] == [
+            "/bottoken/getUpdates",
+            "/bottoken/sendMessage",
+        ]
+        assert recorded_requests[1]["content_type"] == "application/json"
+        assert recorded_requests[1]["payload"] == {"chat_id": 1, "text": "text"}
+        assert recorded_requests[0]["client_port"] == recorded_requests[1]["client_port"]
+
+    def test_call_latency_hooks(self, telegram_api_url):
+        latencies = []
+        telegram_client = TelegramClient(token="token", api_url=telegram_api_url)
+        telegram_client.add_latency_hook(latencies.append)
+
+        telegram_client.call(method="sendMessage", payload={"chat_id": 1, "text": "text"})
+
+        assert len(latencies) == 1
+        assert latencies[0].method == "sendMessage"
+        assert latencies[0].status_code == 200
+        assert latencies[0].elapsed > 0
+
+    def test_call_not_json_response_raises_request_error(self, telegram_api_url):
+        latencies = []
+        telegram_client = TelegramClient(token="token", api_url=telegram_api_url, latency_hooks=[latencies.append])
+
+        with pytest.raises(TelegramRequestError, match="badGateway request error, status code 502"):
+            telegram_client.call(method="badGateway", payload={})
+
+        assert latencies[0].status_code == 502
+
+    def test_send_message_request_reply_markup_sent_as_json(self, telegram_api_url):
+        telegram_client = TelegramClient(token="token", api_url=telegram_api_url)
+        inline_keyboard_markup = {"inline_keyboard": [[{"text": "read", "url": "https://example.com"}]]}
+        message = TelegramMessage(chat_id=1, text="text", inline_keyboard_markup=inline_keyboard_markup)
+
+        result = SendMessageRequest(telegram_client=telegram_client).send(message=message)
+
+        assert result.ok is True
+        assert TelegramAPIRequestHandler.recorded_requests[0]["payload"]["reply_markup"] == inline_keyboard_markup
+
+    def test_get_telegram_client_shared_by_token(self):
+        assert get_telegram_client(token="token") is get_telegram_client(token="token")
+        assert get_telegram_client(token="token") is not get_telegram_client(token="other token")
@@ -0,0 +1,29 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from scraper.models import Comment
+
+
+class TestBenchmarkKeywordMatchingCommand:
+    @pytest.mark.django_db
+    def test_benchmark_keyword_matching(self):
+        stdout = StringIO()
+        call_command("benchmark_keyword_matching", comments=500, repeat=1, stdout=stdout)
+
+        assert "ICONTAINS: " in stdout.getvalue()
+        assert "FULLTEXT: " in stdout.getvalue()
+        assert Comment.objects.count() == 0
+
+
+class TestExplainKeywordMatchingCommand:
+    @pytest.mark.django_db
+    def test_explain_keyword_matching(self):
+        stdout = StringIO()
+        call_command("explain_keyword_matching", comments=500, stdout=stdout)
+
+        assert "Before (without body_upper_gin_index)" in stdout.getvalue()
+        assert "After (with body_upper_gin_index)" in stdout.getvalue()
+        assert "Execution Time" in stdout.getvalue()
+        assert Comment.objects.count() == 0
@@ -0,0 +1,56 @@
+import datetime
+
+from telegram_feed.digest import MESSAGE_MAX_LENGTH, get_digest_send_after, pack_digest_messages
+from telegram_feed.types import InlineKeyboardButton, TelegramMessage
+
+
+def get_comment_message(text: str, comment_id: int = 1) -> TelegramMessage:
+    reply_button = InlineKeyboardButton(text="reply", url=f"https://news.ycombinator.com/reply?id={comment_id}")
+    context_button = InlineKeyboardButton(text="context", url=f"https://news.ycombinator.com/item?id=1#{comment_id}")
+    return TelegramMessage(
+        chat_id=1,
+        text=text,
+        inline_keyboard_markup={"inline_keyboard": [[reply_button, context_button]]},
+        item_id=comment_id,
+    )
+
+
+class TestPackDigestMessages:
+    def test_pack_digest_messages_keeps_links(self):
+        messages = [get_comment_message(text="Keyword match: python.", comment_id=comment_id) for comment_id in (1, 2)]
+
+        digest_messages = pack_digest_messages(messages=messages)
+
+        digest_message, indexes = digest_messages[0]
+        assert len(digest_messages) == 1
+        assert indexes == [0, 1]
+        assert digest_message.parse_mode == "MarkdownV2"
+        assert digest_message.item_id == 1
+        assert "Keyword match: python\\." in digest_message.text
+        assert "[reply](https://news.ycombinator.com/reply?id=1)" in digest_message.text
+        assert "[context](https://news.ycombinator.com/item?id=1#2)" in digest_message.text
+
+    def test_pack_digest_messages_within_message_length_limit(self):
+        messages = [get_comment_message(text="a" * 1000, comment_id=comment_id) for comment_id in range(10)]
+
+        digest_messages = pack_digest_messages(messages=messages)
+
+        assert len(digest_messages) == 4
+        assert [index for _, indexes in digest_messages for index in indexes] == list(range(10))
+        assert all(len(digest_message.text) <= MESSAGE_MAX_LENGTH for digest_message, _ in digest_messages)
+
+    def test_pack_digest_messages_long_message_sent_as_is(self):
+        long_message = get_comment_message(text="a" * MESSAGE_MAX_LENGTH)
+        messages = [get_comment_message(text="short"), long_message, get_comment_message(text="short")]
+
+        digest_messages = pack_digest_messages(messages=messages)
+
+        assert digest_messages == [(messages[0], [0]), (long_message, [1]), (messages[2], [2])]
+
+
+class TestGetDigestSendAfter:
+    def test_get_digest_send_after(self):
+        now = datetime.datetime(2023, 3, 1, 12, 7, tzinfo=datetime.timezone.utc)
+
+        assert get_digest_send_after(now=now, digest_interval=15) == now.replace(minute=15)
+        assert get_digest_send_after(now=now, digest_interval=0) is None
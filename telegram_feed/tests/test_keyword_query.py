@@ -0,0 +1,79 @@
+import pytest
+
+from scraper.models import Comment, Thread
+from scraper.tests.factories import CommentFactory, ThreadFactory
+from telegram_feed.keyword_query import FULL_TEXT_MATCH_MODE, match_keywords
+from telegram_feed.tests.factories import KeywordFactory, UserFeedFactory
+
+
+class TestMatchKeywords:
+    @pytest.mark.django_db
+    def test_match_keywords_in_one_query(self, django_assert_num_queries):
+        tomato_comment = CommentFactory.create(body=" Tomato and potato ")
+        potato_comment = CommentFactory.create(body=" potatoes ")
+        CommentFactory.create(body=" cucumber ")
+        user_feed = UserFeedFactory.create()
+        KeywordFactory.create(user_feed=user_feed, name="tomato")
+        KeywordFactory.create(user_feed=user_feed, name="potato")
+        keywords = list(user_feed.keywords.order_by("pk"))
+
+        with django_assert_num_queries(1):
+            comments_by_keywords = match_keywords(Comment.objects.all(), field_name="body", keywords=keywords)
+
+        assert comments_by_keywords == [
+            (tomato_comment, "tomato"),
+            (tomato_comment, "potato"),
+            (potato_comment, "potato"),
+        ]
+
+    @pytest.mark.django_db
+    def test_match_keywords_full_match(self):
+        thread = ThreadFactory.create(title=" Show HN: potato ")
+        ThreadFactory.create(title=" Show HN: potatoes ")
+        keyword = KeywordFactory.create(name="POTATO", is_full_match=True)
+
+        assert match_keywords(Thread.objects.all(), field_name="title", keywords=[keyword]) == [(thread, "POTATO")]
+
+    @pytest.mark.django_db
+    def test_match_keywords_like_wildcards_escaped(self):
+        comment = CommentFactory.create(body=" 100% done ")
+        CommentFactory.create(body=" 1000 done ")
+        keyword = KeywordFactory.create(name="100%")
+
+        assert match_keywords(Comment.objects.all(), field_name="body", keywords=[keyword]) == [(comment, "100%")]
+
+    @pytest.mark.django_db
+    def test_match_keywords_filtered_queryset(self):
+        CommentFactory.create(body=" tomato ", username="hnuser")
+        keyword = KeywordFactory.create(name="tomato")
+
+        comments = Comment.objects.filter(username="other")
+
+        assert match_keywords(comments, field_name="body", keywords=[keyword]) == []
+        assert match_keywords(Comment.objects.all(), field_name="body", keywords=[]) == []
+
+    @pytest.mark.django_db
+    def test_match_keywords_full_text_mode(self, settings):
+        settings.KEYWORD_MATCH_MODE = FULL_TEXT_MATCH_MODE
+        rust_comment = CommentFactory.create(body=" I like Rust, and machine learning. ")
+        CommentFactory.create(body=" rustacean ")
+        cpp_comment = CommentFactory.create(body=" c++ compiler ")
+        user_feed = UserFeedFactory.create()
+        for name in ("rust", "machine learning", "c++"):
+            KeywordFactory.create(user_feed=user_feed, name=name, is_full_match=True)
+        keywords = list(user_feed.keywords.order_by("pk"))
+
+        comments_by_keywords = match_keywords(Comment.objects.all(), field_name="body", keywords=keywords)
+
+        assert comments_by_keywords == [
+            (rust_comment, "rust"),
+            (rust_comment, "machine learning"),
+            (cpp_comment, "c++"),
+        ]
+
+    @pytest.mark.django_db
+    def test_match_keywords_icontains_mode_misses_words_next_to_punctuation(self):
+        CommentFactory.create(body=" I like Rust, and Go ")
+        keyword = KeywordFactory.create(name="rust", is_full_match=True)
+
+        assert match_keywords(Comment.objects.all(), field_name="body", keywords=[keyword]) == []
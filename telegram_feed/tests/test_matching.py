@@ -0,0 +1,261 @@
+import datetime
+
+import pytest
+from django.utils import timezone
+
+from scraper.models import Comment, Thread
+from scraper.tests.factories import CommentFactory, ThreadFactory
+from telegram_feed.matching import (
+    AhoCorasickAutomaton,
+    AlertMatcher,
+    AlertMatcherCache,
+    AlertPredicateIndex,
+    KeywordMatcher,
+)
+from telegram_feed.models import DeliveryCursor, FollowedUser, UserFeed
+from telegram_feed.services import ALERTS_LOOKBACK, COMMENT_CURSOR_OVERLAP, THREAD_CURSOR_OVERLAP
+from telegram_feed.tests.factories import KeywordFactory, UserFeedFactory
+
+
+class TestAhoCorasickAutomaton:
+    def test_search_overlapping_patterns(self):
+        automaton = AhoCorasickAutomaton()
+        for pattern in ["he", "she", "his", "hers"]:
+            automaton.add(pattern, pattern)
+        automaton.build()
+
+        assert sorted(automaton.search("ushers")) == ["he", "hers", "she"]
+
+    def test_search_without_patterns(self):
+        automaton = AhoCorasickAutomaton()
+        automaton.build()
+
+        assert list(automaton.search("text")) == []
+
+
+class TestKeywordMatcher:
+    @pytest.mark.django_db
+    def test_match_thread(self):
+        user_feed_1 = UserFeedFactory.create(chat_id=1)
+        user_feed_2 = UserFeedFactory.create(chat_id=2)
+
+        tomato_keyword_1 = KeywordFactory.create(user_feed=user_feed_1, name="tomato")
+        tomato_keyword_2 = KeywordFactory.create(user_feed=user_feed_2, name="Tomato")
+        KeywordFactory.create(user_feed=user_feed_1, name="potato")
+        KeywordFactory.create(user_feed=user_feed_2, name="tomato", search_threads=False)
+
+        thread = ThreadFactory.create(title=" thread with TOMATO keyword ")
+
+        matches = KeywordMatcher.from_database().match_thread(thread)
+
+        assert sorted(matches, key=lambda match: match[1].pk) == [
+            (user_feed_1, tomato_keyword_1),
+            (user_feed_2, tomato_keyword_2),
+        ]
+
+    @pytest.mark.django_db
+    def test_match_comment_full_word_match(self):
+        user_feed = UserFeedFactory.create(chat_id=1)
+
+        tomato_keyword = KeywordFactory.create(user_feed=user_feed, name="tomato", is_full_match=True)
+        KeywordFactory.create(user_feed=user_feed, name="potato", is_full_match=True)
+        KeywordFactory.create(user_feed=user_feed, name="tomato keyword", search_comments=False)
+
+        comment = CommentFactory.create(body=" comment with tomato keyword, not potatoes ")
+
+        matches = KeywordMatcher.from_database().match_comment(comment)
+
+        assert matches == [(user_feed, tomato_keyword)]
+
+    @pytest.mark.django_db
+    def test_match_comment_keyword_mentioned_multiple_times(self):
+        user_feed = UserFeedFactory.create(chat_id=1)
+        keyword = KeywordFactory.create(user_feed=user_feed, name="rust")
+
+        comment = CommentFactory.create(body=" rust, rust and rust again ")
+
+        matches = KeywordMatcher.from_database().match_comment(comment)
+
+        assert matches == [(user_feed, keyword)]
+
+
+class TestAlertMatcher:
+    @pytest.mark.django_db
+    def test_match_threads(self):
+        keyword_user_feed = UserFeedFactory.create(chat_id=1)
+        KeywordFactory.create(user_feed=keyword_user_feed, name="tomato")
+        domain_user_feed = UserFeedFactory.create(chat_id=2, domain_names=["example.com"])
+        followed_user_feed = UserFeedFactory.create(chat_id=3)
+        FollowedUser.objects.create(user_feed=followed_user_feed, username="pg")
+        UserFeedFactory.create(chat_id=4, domain_names=["example.org"])
+        UserFeedFactory.create(chat_id=5, domain_names=["e.com"])
+
+        threads = [
+            ThreadFactory.create(title=" thread with tomato keyword ", link="https://news.ycombinator.com/"),
+            ThreadFactory.create(title=" thread ", link="https://blog.EXAMPLE.com/post"),
+            ThreadFactory.create(title=" thread ", link="https://news.ycombinator.com/", creator_username="pg"),
+        ]
+
+        user_feed_ids = AlertMatcher.from_database().match(threads=threads, comments=[])
+
+        assert user_feed_ids == {keyword_user_feed.pk, domain_user_feed.pk, followed_user_feed.pk}
+
+    @pytest.mark.django_db
+    def test_match_comments(self):
+        subscribed_thread = ThreadFactory.create(thread_id=12345)
+        subscription_user_feed = UserFeedFactory.create(chat_id=1, subscription_threads=[subscribed_thread])
+        reply_user_feed = UserFeedFactory.create(chat_id=2, hn_username="replied_user")
+        keyword_user_feed = UserFeedFactory.create(chat_id=3)
+        KeywordFactory.create(user_feed=keyword_user_feed, name="potato", search_comments=False)
+
+        parent_comment = CommentFactory.create(username="replied_user")
+        comments = [
+            CommentFactory.create(thread_id_int=12345, body=" comment with potato keyword "),
+            CommentFactory.create(parent_comment=parent_comment),
+        ]
+
+        user_feed_ids = AlertMatcher.from_database().match(threads=[], comments=comments)
+
+        assert user_feed_ids == {subscription_user_feed.pk, reply_user_feed.pk}
+
+    @pytest.mark.django_db
+    def test_from_database_skips_user_feeds_without_predicates(self, django_assert_num_queries):
+        UserFeedFactory.create_batch(size=3)
+
+        # predicates aren't prefetched, no user feed can be matched
+        with django_assert_num_queries(1):
+            AlertMatcher.from_database()
+
+
+class TestAlertMatcherCache:
+    @pytest.mark.django_db
+    def test_get_keeps_matcher(self, django_assert_num_queries):
+        user_feed = UserFeedFactory.create(chat_id=1)
+        KeywordFactory.create(user_feed=user_feed, name="tomato")
+
+        alert_matcher_cache = AlertMatcherCache(max_age=300)
+        alert_matcher = alert_matcher_cache.get()
+
+        with django_assert_num_queries(0):
+            assert alert_matcher_cache.get() is alert_matcher
+
+    @pytest.mark.django_db
+    def test_get_after_predicates_changed(self):
+        user_feed = UserFeedFactory.create(chat_id=1)
+        thread = ThreadFactory.create(title=" thread with tomato keyword ")
+
+        alert_matcher_cache = AlertMatcherCache(max_age=300)
+        assert alert_matcher_cache.get().match(threads=[thread], comments=[]) == set()
+
+        KeywordFactory.create(user_feed=user_feed, name="tomato")
+
+        assert alert_matcher_cache.get().match(threads=[thread], comments=[]) == {user_feed.pk}
+
+    @pytest.mark.django_db
+    def test_get_after_max_age(self):
+        alert_matcher_cache = AlertMatcherCache(max_age=-1)
+        alert_matcher = alert_matcher_cache.get()
+
+        assert alert_matcher_cache.get() is not alert_matcher
+
+
+class TestAlertPredicateIndex:
+    @pytest.mark.django_db
+    def test_distinct_predicates_evaluated_once(self, django_assert_num_queries):
+        for chat_id in range(10):
+            user_feed = UserFeedFactory.create(chat_id=chat_id, domain_names=["example.com"])
+            KeywordFactory.create(user_feed=user_feed, name="tomato")
+            FollowedUser.objects.create(user_feed=user_feed, username="pg")
+        user_feeds = list(UserFeed.objects.prefetch_related("keywords", "follow_list", "delivery_cursors"))
+
+        # last comment id, one query per predicate type
+        with django_assert_num_queries(6):
+            AlertPredicateIndex(
+                user_feeds=user_feeds,
+                lookback=ALERTS_LOOKBACK,
+                cursor_overlap=THREAD_CURSOR_OVERLAP,
+                comment_cursor_overlap=COMMENT_CURSOR_OVERLAP,
+            )
+
+    @pytest.mark.django_db
+    def test_get_item_ids_of_user_feed_predicates(self):
+        user_feed = UserFeedFactory.create(chat_id=1, domain_names=["example.com"])
+        tomato_keyword = KeywordFactory.create(user_feed=user_feed, name="tomato")
+        potato_keyword = KeywordFactory.create(user_feed=user_feed, name="potato", is_full_match=True)
+        FollowedUser.objects.create(user_feed=user_feed, username="pg")
+
+        tomato_thread = ThreadFactory.create(title=" Tomato thread ")
+        ThreadFactory.create(title=" potatoes thread ")
+        domain_thread = ThreadFactory.create(link="https://blog.example.com/post")
+        user_thread = ThreadFactory.create(creator_username="pg")
+        tomato_comment = CommentFactory.create(body=" tomato and potato ")
+        potato_comment = CommentFactory.create(body=" potato ")
+        user_comment = CommentFactory.create(username="pg")
+
+        predicate_index = AlertPredicateIndex(
+            user_feeds=[user_feed],
+            lookback=ALERTS_LOOKBACK,
+            cursor_overlap=THREAD_CURSOR_OVERLAP,
+            comment_cursor_overlap=COMMENT_CURSOR_OVERLAP,
+        )
+
+        assert predicate_index.get_thread_ids_by_keywords(keywords=[tomato_keyword, potato_keyword]) == {
+            tomato_thread.pk
+        }
+        assert predicate_index.get_comment_ids_by_keywords(keywords=[tomato_keyword, potato_keyword]) == {
+            "tomato": {tomato_comment.pk},
+            "potato": {tomato_comment.pk, potato_comment.pk},
+        }
+        assert predicate_index.get_thread_ids_by_domain_names(domain_names=["EXAMPLE.com"]) == {domain_thread.pk}
+        assert predicate_index.get_thread_ids_by_domain_names(domain_names=["e.com"]) == set()
+        assert predicate_index.get_thread_ids_by_usernames(usernames=["pg"]) == {user_thread.pk}
+        assert predicate_index.get_comment_ids_by_usernames(usernames=["pg", "dang"]) == {user_comment.pk}
+
+    @pytest.mark.django_db
+    def test_items_behind_oldest_delivery_cursor_not_searched(self):
+        thread = ThreadFactory.create(title=" tomato ")
+        old_thread = ThreadFactory.create(title=" tomato ")
+        Thread.objects.filter(pk=old_thread.pk).update(modified=timezone.now() - datetime.timedelta(hours=2))
+
+        user_feeds = []
+        for chat_id, hours in [(1, 1), (2, 0)]:
+            user_feed = UserFeedFactory.create(chat_id=chat_id)
+            KeywordFactory.create(user_feed=user_feed, name="tomato")
+            for alert_type in AlertPredicateIndex.THREAD_ALERT_TYPES:
+                DeliveryCursor.objects.create(
+                    user_feed=user_feed,
+                    alert_type=alert_type,
+                    last_thread_modified=timezone.now() - datetime.timedelta(hours=hours),
+                )
+            user_feeds.append(user_feed)
+
+        predicate_index = AlertPredicateIndex(
+            user_feeds=user_feeds,
+            lookback=ALERTS_LOOKBACK,
+            cursor_overlap=THREAD_CURSOR_OVERLAP,
+            comment_cursor_overlap=COMMENT_CURSOR_OVERLAP,
+        )
+
+        assert predicate_index.get_thread_ids_by_keywords(keywords=user_feeds[0].keywords.all()) == {thread.pk}
+
+    @pytest.mark.django_db
+    def test_comments_committed_behind_delivery_cursor_searched(self):
+        late_comment = CommentFactory.create(username="pg")
+        old_comment = CommentFactory.create(username="pg")
+        Comment.objects.filter(pk=old_comment.pk).update(created=timezone.now() - datetime.timedelta(hours=1))
+        cursor_comment = CommentFactory.create(username="pg")
+
+        user_feed = UserFeedFactory.create(chat_id=1)
+        FollowedUser.objects.create(user_feed=user_feed, username="pg")
+        for alert_type in AlertPredicateIndex.COMMENT_ALERT_TYPES:
+            DeliveryCursor.objects.create(user_feed=user_feed, alert_type=alert_type, last_comment_id=cursor_comment.pk)
+        user_feeds = list(UserFeed.objects.prefetch_related("keywords", "follow_list", "delivery_cursors"))
+
+        predicate_index = AlertPredicateIndex(
+            user_feeds=user_feeds,
+            lookback=ALERTS_LOOKBACK,
+            cursor_overlap=THREAD_CURSOR_OVERLAP,
+            comment_cursor_overlap=COMMENT_CURSOR_OVERLAP,
+        )
+
+        assert predicate_index.get_comment_ids_by_usernames(usernames=["pg"]) == {late_comment.pk, cursor_comment.pk}
@@ -0,0 +1,132 @@
+import datetime
+from unittest import mock
+
+import pytest
+from django.utils import timezone
+
+from telegram_feed.exceptions import TelegramRequestError
+from telegram_feed.models import DeliveryCursor, OutboxMessage
+from telegram_feed.outbox import OutboxSender, OutboxWriter
+from telegram_feed.requests import SendMessageRequest
+from telegram_feed.sender import AsyncMessageSender, SyncMessageSender
+from telegram_feed.tests.factories import OutboxMessageFactory, UserFeedFactory
+from telegram_feed.types import TelegramMessage
+
+
+def get_message_sender(messages_sent: list[bool]) -> mock.Mock:
+    message_sender = mock.Mock()
+    message_sender.send_messages.return_value = messages_sent
+    return message_sender
+
+
+class TestOutboxWriter:
+    @pytest.mark.django_db
+    def test_send_messages_saves_message_once(self):
+        message = TelegramMessage(
+            chat_id=1, text="text", alert_type=DeliveryCursor.THREADS_BY_KEYWORDS, item_id=10, parse_mode="MarkdownV2"
+        )
+
+        outbox_writer = OutboxWriter()
+        messages_queued = outbox_writer.send_messages(messages=[message])
+        outbox_writer.send_messages(messages=[message])
+
+        outbox_message = OutboxMessage.objects.get()
+        assert messages_queued == [True]
+        assert outbox_message.status == OutboxMessage.PENDING
+        assert outbox_message.parse_mode == "MarkdownV2"
+        assert (outbox_message.chat_id, outbox_message.alert_type, outbox_message.item_id) == (
+            1,
+            DeliveryCursor.THREADS_BY_KEYWORDS,
+            10,
+        )
+
+    @pytest.mark.django_db
+    def test_send_messages_without_alert_item(self):
+        message = TelegramMessage(chat_id=1, text="text")
+
+        with pytest.raises(ValueError):
+            OutboxWriter().send_messages(messages=[message])
+
+        assert not OutboxMessage.objects.exists()
+
+
+class TestOutboxSender:
+    @pytest.mark.django_db
+    def test_send_pending_messages(self):
+        sent_message = OutboxMessageFactory.create()
+        failed_message = OutboxMessageFactory.create()
+        OutboxMessageFactory.create(next_attempt_at=timezone.now() + datetime.timedelta(minutes=1))
+
+        message_sender = get_message_sender(messages_sent=[True, False])
+        OutboxSender(message_sender=message_sender).send_pending_messages()
+
+        sent_message.refresh_from_db()
+        failed_message.refresh_from_db()
+        assert message_sender.send_messages.call_count == 1
+        assert sent_message.status == OutboxMessage.SENT
+        assert failed_message.status == OutboxMessage.PENDING
+        assert failed_message.attempts == 1
+        assert failed_message.next_attempt_at > timezone.now() + datetime.timedelta(seconds=25)
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize("message_sender_class", [AsyncMessageSender, SyncMessageSender])
+    def test_send_pending_messages_saves_results_after_request_error(self, message_sender_class):
+        outbox_messages = [OutboxMessageFactory.create(chat_id=chat_id) for chat_id in (1, 2, 3)]
+
+        def call(method, payload):
+            if payload["chat_id"] == 2:
+                raise TelegramRequestError("Telegram API sendMessage request error, status code 502")
+            return {"ok": True}
+
+        telegram_client = mock.Mock()
+        telegram_client.call.side_effect = call
+        message_sender = message_sender_class(send_message_request=SendMessageRequest(telegram_client=telegram_client))
+        OutboxSender(message_sender=message_sender).send_pending_messages()
+
+        for outbox_message in outbox_messages:
+            outbox_message.refresh_from_db()
+        assert [outbox_message.status for outbox_message in outbox_messages] == [
+            OutboxMessage.SENT,
+            OutboxMessage.PENDING,
+            OutboxMessage.SENT,
+        ]
+        assert outbox_messages[1].attempts == 1
+        assert outbox_messages[1].next_attempt_at > timezone.now() + datetime.timedelta(seconds=25)
+
+    @pytest.mark.django_db
+    def test_send_pending_messages_fails_after_max_attempts(self):
+        outbox_message = OutboxMessageFactory.create(attempts=2)
+
+        outbox_sender = OutboxSender(message_sender=get_message_sender(messages_sent=[False]), max_attempts=3)
+        outbox_sender.send_pending_messages()
+
+        outbox_message.refresh_from_db()
+        assert outbox_message.status == OutboxMessage.FAILED
+        assert outbox_message.attempts == 3
+        assert outbox_sender.messages_failed == 1
+
+    @pytest.mark.django_db
+    def test_claim_messages_skips_claimed_messages(self):
+        OutboxMessageFactory.create_batch(size=3)
+
+        outbox_sender = OutboxSender(message_sender=get_message_sender(messages_sent=[]), batch_size=2)
+        first_batch = outbox_sender.claim_messages()
+        second_batch = outbox_sender.claim_messages()
+
+        assert len(first_batch) == 2
+        assert len(second_batch) == 1
+        assert outbox_sender.claim_messages() == []
+
+    @pytest.mark.django_db
+    def test_send_pending_messages_packs_digest_messages(self):
+        UserFeedFactory.create(chat_id=1, digest_interval=0)
+        digest_messages = [OutboxMessageFactory.create(chat_id=1, text=f"Keyword match {n}") for n in range(3)]
+        OutboxMessageFactory.create(chat_id=2)
+
+        message_sender = get_message_sender(messages_sent=[True, True])
+        OutboxSender(message_sender=message_sender).send_pending_messages()
+
+        sent_messages = message_sender.send_messages.call_args.kwargs["messages"]
+        assert [sent_message.chat_id for sent_message in sent_messages] == [2, 1]
+        assert all(digest_message.text in sent_messages[1].text for digest_message in digest_messages)
+        assert OutboxMessage.objects.filter(status=OutboxMessage.SENT).count() == 4
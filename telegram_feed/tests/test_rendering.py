@@ -0,0 +1,62 @@
+import pytest
+
+from scraper.tests.factories import CommentFactory, ThreadFactory
+from telegram_feed.rendering import MessageRenderer
+from telegram_feed.utils import escape_markdown
+
+
+class TestMessageRenderer:
+    @pytest.mark.django_db
+    def test_render_thread_once(self):
+        thread = ThreadFactory.create(title="Show HN: tomato.py")
+        message_renderer = MessageRenderer()
+
+        rendered_message = message_renderer.render_thread(thread=thread)
+
+        assert message_renderer.render_thread(thread=thread) is rendered_message
+        assert message_renderer.cache_hits == 1
+        assert rendered_message.text.startswith("[*Show HN: tomato\\.py*]")
+        assert rendered_message.parse_mode == "MarkdownV2"
+        assert rendered_message.inline_keyboard_markup["inline_keyboard"][0][0]["url"] == thread.link
+
+    @pytest.mark.django_db
+    def test_render_updated_thread_again(self):
+        thread = ThreadFactory.create(score=10)
+        message_renderer = MessageRenderer()
+        message_renderer.render_thread(thread=thread)
+
+        thread.score = 100
+        thread.save()
+
+        assert message_renderer.render_thread(thread=thread).text.split("\n\n")[1].startswith("100\\+ points")
+        assert message_renderer.cache_hits == 0
+
+    @pytest.mark.django_db
+    def test_render_keyword_comment_by_keyword(self):
+        comment = CommentFactory.create()
+        message_renderer = MessageRenderer()
+
+        tomato_message = message_renderer.render_keyword_comment(comment=comment, keyword="tomato")
+        potato_message = message_renderer.render_keyword_comment(comment=comment, keyword="potato")
+
+        assert tomato_message.text.startswith("Keyword match: tomato\n")
+        assert potato_message.text.startswith("Keyword match: potato\n")
+        assert potato_message.parse_mode is None
+
+    @pytest.mark.django_db
+    def test_render_cache_max_size(self):
+        threads = ThreadFactory.create_batch(size=3)
+        message_renderer = MessageRenderer(max_size=2)
+
+        for thread in threads:
+            message_renderer.render_thread(thread=thread)
+        message_renderer.render_thread(thread=threads[0])
+
+        assert message_renderer.cache_hits == 0
+
+
+class TestEscapeMarkdown:
+    def test_escape_markdown(self):
+        assert escape_markdown(text="a_b*[c](d).!", version=2) == "a\\_b\\*\\[c\\]\\(d\\)\\.\\!"
+        assert escape_markdown(text="https://a.b/c_(d)", version=2, entity_type="text_link") == "https://a.b/c_(d\\)"
+        assert escape_markdown(text="a_b*c", version=1) == "a\\_b\\*c"
@@ -0,0 +1,75 @@
+from time import monotonic
+from unittest import mock
+
+from telegram_feed.sender import AsyncMessageSender, SyncMessageSender
+from telegram_feed.types import SendMessageResult, SenderStats, TelegramMessage
+
+
+class TestAsyncMessageSender:
+    def test_send_messages(self):
+        send_message_request = mock.Mock()
+        send_message_request.send.side_effect = lambda message: SendMessageResult(ok=message.text != "failed")
+
+        messages = [
+            TelegramMessage(chat_id=1, text="first"),
+            TelegramMessage(chat_id=2, text="failed"),
+            TelegramMessage(chat_id=1, text="second"),
+        ]
+        message_sender = AsyncMessageSender(send_message_request=send_message_request)
+        messages_sent = message_sender.send_messages(messages=messages)
+
+        sent_to_first_chat = [
+            call.args[0].text for call in send_message_request.send.call_args_list if call.args[0].chat_id == 1
+        ]
+        assert messages_sent == [True, False, True]
+        assert sent_to_first_chat == ["first", "second"]
+        assert message_sender.stats.sent == 2
+        assert message_sender.stats.failed == 1
+
+    def test_send_messages_retry_after_flood_control_error(self):
+        send_message_request = mock.Mock()
+        send_message_request.send.side_effect = [
+            SendMessageResult(ok=False, retry_after=0),
+            SendMessageResult(ok=True),
+        ]
+
+        message_sender = AsyncMessageSender(send_message_request=send_message_request)
+        messages_sent = message_sender.send_messages(messages=[TelegramMessage(chat_id=1, text="text")])
+
+        assert messages_sent == [True]
+        assert send_message_request.send.call_count == 2
+        assert message_sender.stats.retried == 1
+
+    def test_send_messages_chat_message_interval(self, settings):
+        settings.TELEGRAM_CHAT_MESSAGE_INTERVAL = 0.1
+        send_message_request = mock.Mock()
+        send_message_request.send.return_value = SendMessageResult(ok=True)
+
+        message_sender = AsyncMessageSender(send_message_request=send_message_request)
+        started_at = monotonic()
+        # messages to different chats are sent concurrently, messages to one chat wait for interval
+        message_sender.send_messages(messages=[TelegramMessage(chat_id=chat_id, text="text") for chat_id in range(10)])
+        elapsed_different_chats = monotonic() - started_at
+        message_sender.send_messages(messages=[TelegramMessage(chat_id=100, text="text")] * 3)
+        elapsed_one_chat = monotonic() - started_at - elapsed_different_chats
+
+        assert elapsed_different_chats < 0.1
+        assert elapsed_one_chat >= 0.2
+
+
+class TestSyncMessageSender:
+    def test_send_messages(self):
+        send_message_request = mock.Mock()
+        send_message_request.send.return_value = SendMessageResult(ok=True)
+
+        message_sender = SyncMessageSender(send_message_request=send_message_request)
+        messages_sent = message_sender.send_messages(messages=[TelegramMessage(chat_id=1, text="text")] * 2)
+
+        assert messages_sent == [True, True]
+        assert message_sender.stats.sent == 2
+
+
+class TestSenderStats:
+    def test_messages_per_second(self):
+        assert SenderStats(sent=10, elapsed=2.0).messages_per_second == 5.0
+        assert SenderStats().messages_per_second == 0.0
@@ -1,10 +1,17 @@
+import datetime
 from unittest import mock
 
 import pytest
+from django.utils import timezone
 
+from scraper.models import Comment, Thread
 from scraper.tests.factories import CommentFactory, ThreadFactory
-from telegram_feed.models import Keyword, UserFeed
+from telegram_feed.matching import AlertPredicateIndex
+from telegram_feed.models import DeliveryCursor, Keyword, UserFeed
 from telegram_feed.services import (
+    ALERTS_LOOKBACK,
+    COMMENT_CURSOR_OVERLAP,
+    THREAD_CURSOR_OVERLAP,
     RespondToMessageService,
     SendAlertsService,
     get_keywords_str,
@@ -14,6 +21,7 @@ from telegram_feed.tests.factories import (
     TelegramUpdateFactory,
     UserFeedFactory,
 )
+from telegram_feed.types import SendMessageResult
 
 
 class TestRespondToMessageService:
@@ -372,14 +380,12 @@ class TestRespondToMessageService:
     def test_response_to_watch_command_amount_restriction_fail(self):
         domain_name = "example.io"
 
-        UserFeedFactory.create(
-            chat_id=1, domain_names=["example.com", "test.com", "example.ai", "example.xyz", "test.ru"]
-        )
+        UserFeedFactory.create(chat_id=1, domain_names=[f"example{number}.com" for number in range(20)])
 
         telegram_update = TelegramUpdateFactory.create(chat_id=1, text=f"/watch {domain_name}")
         text_response = RespondToMessageService(telegram_update=telegram_update).respond_to_user_message()
 
-        assert text_response == "Fail! You are following maximum amount of domain names (5)"
+        assert text_response == "Fail! You are following maximum amount of domain names (20)"
 
     @pytest.mark.django_db
     def test_response_to_watch_command_already_following_fail(self):
@@ -468,12 +474,37 @@ class TestRespondToMessageService:
 
         assert text_response == "Fail! You have not setup reply notifications"
 
+    @pytest.mark.django_db
+    def test_response_to_digest_command(self):
+        TelegramUpdateFactory.create(chat_id=1, text="/digest")
+        telegram_update = TelegramUpdateFactory.create(chat_id=1, text="/digest 30")
+        text_response = RespondToMessageService(telegram_update=telegram_update).respond_to_user_message()
+
+        assert text_response == "Digest mode enabled, alerts will be packed into digest messages every 30 minutes"
+        assert UserFeed.objects.get(chat_id=1).digest_interval == 30
+
+    @pytest.mark.django_db
+    def test_response_to_digest_off_command(self):
+        UserFeedFactory.create(chat_id=1, digest_interval=0)
+        telegram_update = TelegramUpdateFactory.create(chat_id=1, text="/digest off")
+        text_response = RespondToMessageService(telegram_update=telegram_update).respond_to_user_message()
+
+        assert text_response == "Digest mode disabled"
+        assert UserFeed.objects.get(chat_id=1).digest_interval is None
+
+    @pytest.mark.django_db
+    def test_response_to_digest_command_interval_too_long_fail(self):
+        telegram_update = TelegramUpdateFactory.create(chat_id=1, text="/digest 2000")
+        text_response = RespondToMessageService(telegram_update=telegram_update).respond_to_user_message()
+
+        assert text_response == "Fail! Digest interval can't be longer than 1440 minutes"
+
 
 class TestSendAlertsService:
     @pytest.mark.django_db
-    @mock.patch("telegram_feed.requests.SendMessageRequest.send_message")
+    @mock.patch("telegram_feed.requests.SendMessageRequest.send")
     def test_send_subscription_comments_to_telegram_feed(self, send_message_mock):
-        send_message_mock.return_value = True
+        send_message_mock.return_value = SendMessageResult(ok=True)
 
         thread = ThreadFactory.create(title="subscription thread test", thread_id=12345)
         user_feed = UserFeedFactory.create(chat_id=1, subscription_threads=[thread])
@@ -486,9 +517,26 @@ class TestSendAlertsService:
         assert messages_sent is True
 
     @pytest.mark.django_db
-    @mock.patch("telegram_feed.requests.SendMessageRequest.send_message")
+    @mock.patch("telegram_feed.requests.SendMessageRequest.send")
+    def test_send_subscription_comments_skips_comments_out_of_lookback(self, send_message_mock):
+        send_message_mock.return_value = SendMessageResult(ok=True)
+
+        thread = ThreadFactory.create(title="subscription thread test", thread_id=12345)
+        user_feed = UserFeedFactory.create(chat_id=1, subscription_threads=[thread])
+
+        CommentFactory.create(body="new comment", thread_id_int=12345)
+        CommentFactory.create(
+            body="comment of pruned alert", thread_id_int=12345, created=timezone.now() - datetime.timedelta(days=2)
+        )
+
+        SendAlertsService(user_feed=user_feed).send_subscription_comments_to_telegram_feed()
+
+        assert send_message_mock.call_count == 1
+
+    @pytest.mark.django_db
+    @mock.patch("telegram_feed.requests.SendMessageRequest.send")
     def test_send_threads_to_telegram_feed(self, send_message_mock):
-        send_message_mock.return_value = True
+        send_message_mock.return_value = SendMessageResult(ok=True)
 
         user_feed = UserFeedFactory.create(chat_id=1)
         threads = ThreadFactory.create_batch(size=50)
@@ -498,9 +546,9 @@ class TestSendAlertsService:
         assert messages_sent is True
 
     @pytest.mark.django_db
-    @mock.patch("telegram_feed.requests.SendMessageRequest.send_message")
+    @mock.patch("telegram_feed.requests.SendMessageRequest.send")
     def test_send_comments_to_telegram_feed(self, send_message_mock):
-        send_message_mock.return_value = True
+        send_message_mock.return_value = SendMessageResult(ok=True)
 
         user_feed = UserFeedFactory.create(chat_id=1)
         comments_by_keywords = {
@@ -520,6 +568,21 @@ class TestSendAlertsService:
 
         assert messages_sent is True
 
+    @pytest.mark.django_db
+    def test_send_threads_to_telegram_feed_digest_interval(self):
+        user_feed = UserFeedFactory.create(chat_id=1, digest_interval=30)
+        thread = ThreadFactory.create()
+
+        message_sender = mock.Mock()
+        message_sender.send_messages.return_value = [True]
+        SendAlertsService(user_feed=user_feed, message_sender=message_sender).send_threads_to_telegram_feed(
+            threads=[thread]
+        )
+
+        message = message_sender.send_messages.call_args.kwargs["messages"][0]
+        assert message.send_after > timezone.now()
+        assert message.send_after.minute in (0, 30)
+
     @pytest.mark.django_db
     def test_find_new_threads_by_keywords(self):
         ThreadFactory.create(title="new thread with potato keyword")
@@ -536,6 +599,46 @@ class TestSendAlertsService:
         assert len(new_threads) == 2
         assert sent_thread not in new_threads
 
+    @pytest.mark.django_db
+    def test_find_new_stories_by_domain_names(self):
+        domain_thread = ThreadFactory.create(link="https://x.com/post")
+        subdomain_thread = ThreadFactory.create(link="https://api.X.com/docs")
+        ThreadFactory.create(link="https://netflix.com/x.com")
+        path_thread = ThreadFactory.create(link="https://github.com/lawxls/HackerNews-Alerts-Bot")
+
+        user_feed = UserFeedFactory.create(chat_id=1, domain_names=["x.com", "github.com/lawxls"])
+
+        new_stories = SendAlertsService(user_feed=user_feed).find_new_stories_by_domain_names()
+
+        assert set(new_stories) == {domain_thread, subdomain_thread, path_thread}
+
+    @pytest.mark.django_db
+    def test_find_new_alerts_with_predicate_index(self):
+        sent_thread = ThreadFactory.create(title="already sent thread with tomato keyword")
+        thread = ThreadFactory.create(title="new thread with tomato keyword")
+        domain_thread = ThreadFactory.create(link="https://example.com/post", score=5)
+        comment = CommentFactory.create(body="new comment with tomato keyword")
+
+        user_feed = UserFeedFactory.create(chat_id=1, threads=[sent_thread], domain_names=["example.com"])
+        KeywordFactory.create(user_feed=user_feed, name="tomato")
+        other_user_feed = UserFeedFactory.create(chat_id=2, domain_names=["example.com"], score_threshold=10)
+        KeywordFactory.create(user_feed=other_user_feed, name="tomato")
+
+        predicate_index = AlertPredicateIndex(
+            user_feeds=[user_feed, other_user_feed],
+            lookback=ALERTS_LOOKBACK,
+            cursor_overlap=THREAD_CURSOR_OVERLAP,
+            comment_cursor_overlap=COMMENT_CURSOR_OVERLAP,
+        )
+        send_alerts = SendAlertsService(user_feed=user_feed, predicate_index=predicate_index)
+        other_send_alerts = SendAlertsService(user_feed=other_user_feed, predicate_index=predicate_index)
+
+        assert send_alerts.find_new_threads_by_keywords() == [thread]
+        assert send_alerts.find_new_comments_by_keywords() == ([comment], {"tomato": [comment]})
+        assert list(send_alerts.find_new_stories_by_domain_names()) == [domain_thread]
+        assert other_send_alerts.find_new_threads_by_keywords() == [sent_thread, thread]
+        assert not other_send_alerts.find_new_stories_by_domain_names().exists()
+
     @pytest.mark.django_db
     def test_find_new_threads_by_keywords_full_word_match(self):
         ThreadFactory.create(title="new thread with tomato keyword")
@@ -595,3 +698,86 @@ class TestSendAlertsService:
         assert unmatched_comment_2 not in new_comments
         assert len(new_comments_by_keywords_dict["tomato"]) == 1
         assert len(new_comments_by_keywords_dict["potato"]) == 1
+
+    @pytest.mark.django_db
+    def test_find_new_comments_by_keywords_skips_comments_behind_delivery_cursor(self):
+        searched_comment = CommentFactory.create(body="searched comment with tomato keyword")
+        Comment.objects.filter(pk=searched_comment.pk).update(created=timezone.now() - datetime.timedelta(hours=1))
+        cursor_comment = CommentFactory.create(body="searched comment")
+        user_feed = UserFeedFactory.create(chat_id=1)
+        KeywordFactory.create(user_feed=user_feed, name="tomato", search_threads=False)
+
+        send_alerts = SendAlertsService(user_feed=user_feed)
+        new_comments = list(send_alerts.find_new_comments_by_keywords()[0])
+        send_alerts.save_delivery_cursors()
+
+        new_comment = CommentFactory.create(body="new comment with tomato keyword")
+        delivery_cursor = user_feed.delivery_cursors.get(alert_type=DeliveryCursor.COMMENTS_BY_KEYWORDS)
+        new_comments_after_cursor, _ = SendAlertsService(user_feed=user_feed).find_new_comments_by_keywords()
+
+        assert new_comments == [searched_comment]
+        assert delivery_cursor.last_comment_id == cursor_comment.pk
+        assert list(new_comments_after_cursor) == [new_comment]
+
+    @pytest.mark.django_db
+    def test_find_new_comments_by_keywords_finds_comment_committed_behind_delivery_cursor(self):
+        # comment of another scraper got lower pk, but was committed after the cursor moved past it
+        late_comment = CommentFactory.create(body="late comment with tomato keyword")
+        cursor_comment = CommentFactory.create(body="sent comment with tomato keyword")
+        user_feed = UserFeedFactory.create(chat_id=1, comments=[cursor_comment])
+        KeywordFactory.create(user_feed=user_feed, name="tomato", search_threads=False)
+        DeliveryCursor.objects.create(
+            user_feed=user_feed, alert_type=DeliveryCursor.COMMENTS_BY_KEYWORDS, last_comment_id=cursor_comment.pk
+        )
+
+        new_comments, _ = SendAlertsService(user_feed=user_feed).find_new_comments_by_keywords()
+
+        assert list(new_comments) == [late_comment]
+
+    @pytest.mark.django_db
+    def test_find_new_threads_by_keywords_finds_thread_updated_after_delivery_cursor(self):
+        thread = ThreadFactory.create(title="thread with tomato keyword", score=1)
+        user_feed = UserFeedFactory.create(chat_id=1, score_threshold=10)
+        KeywordFactory.create(user_feed=user_feed, name="tomato", search_comments=False)
+
+        send_alerts = SendAlertsService(user_feed=user_feed)
+        new_threads = list(send_alerts.find_new_threads_by_keywords())
+        send_alerts.save_delivery_cursors()
+
+        thread.score = 20
+        thread.save()
+        new_threads_after_update = SendAlertsService(user_feed=user_feed).find_new_threads_by_keywords()
+
+        assert new_threads == []
+        assert list(new_threads_after_update) == [thread]
+
+    @pytest.mark.django_db
+    def test_find_new_threads_by_keywords_skips_threads_behind_delivery_cursor(self):
+        thread = ThreadFactory.create(title="thread with tomato keyword")
+        Thread.objects.filter(pk=thread.pk).update(modified=timezone.now() - datetime.timedelta(hours=1))
+        user_feed = UserFeedFactory.create(chat_id=1)
+        KeywordFactory.create(user_feed=user_feed, name="tomato", search_comments=False)
+        DeliveryCursor.objects.create(
+            user_feed=user_feed, alert_type=DeliveryCursor.THREADS_BY_KEYWORDS, last_thread_modified=timezone.now()
+        )
+
+        new_threads = SendAlertsService(user_feed=user_feed).find_new_threads_by_keywords()
+
+        assert list(new_threads) == []
+
+    @pytest.mark.django_db
+    def test_add_keyword_command_resets_delivery_cursors(self):
+        thread = ThreadFactory.create(title="thread with potato keyword")
+        Thread.objects.filter(pk=thread.pk).update(modified=timezone.now() - datetime.timedelta(hours=1))
+        user_feed = UserFeedFactory.create(chat_id=1)
+        KeywordFactory.create(user_feed=user_feed, name="tomato")
+        DeliveryCursor.objects.create(
+            user_feed=user_feed, alert_type=DeliveryCursor.THREADS_BY_KEYWORDS, last_thread_modified=timezone.now()
+        )
+
+        telegram_update = TelegramUpdateFactory.create(chat_id=1, text="/add potato")
+        RespondToMessageService(telegram_update=telegram_update).respond_to_user_message()
+        new_threads = SendAlertsService(user_feed=user_feed).find_new_threads_by_keywords()
+
+        assert user_feed.delivery_cursors.count() == 0
+        assert list(new_threads) == [thread]
@@ -1,17 +1,35 @@
+import datetime
 from unittest import mock
 
 import pytest
+from django.utils import timezone
 
+from config import celery_app
+from scraper.signals import items_upserted
 from scraper.tests.factories import CommentFactory, ThreadFactory
-from telegram_feed.tasks import send_alerts_task
-from telegram_feed.tests.factories import KeywordFactory, UserFeedFactory
+from scraper.thread_scraper import ThreadScraper
+from telegram_feed.models import OutboxMessage
+from telegram_feed.tasks import (
+    delete_sent_alerts_task,
+    match_alerts_task,
+    send_alerts_task,
+    send_outbox_messages_task,
+)
+from telegram_feed.tests.factories import KeywordFactory, OutboxMessageFactory, UserFeedFactory
+from telegram_feed.types import SendMessageResult
 
 
 class TestSendStoriesToUserChatsTask:
+    @pytest.fixture(autouse=True)
+    def run_tasks_eagerly(self, monkeypatch):
+        # send_alerts_task dispatches group of send_alerts_chunk_task, tasks are run in process,
+        # their results are stored in CELERY_RESULT_BACKEND (cache+memory:// in CI)
+        monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
+
     @pytest.mark.django_db
-    @mock.patch("telegram_feed.requests.SendMessageRequest.send_message")
+    @mock.patch("telegram_feed.requests.SendMessageRequest.send")
     def test_send_alerts_task(self, send_message_mock):
-        send_message_mock.return_value = True
+        send_message_mock.return_value = SendMessageResult(ok=True)
 
         user_feed = UserFeedFactory.create(chat_id=1)
 
@@ -31,9 +49,9 @@ class TestSendStoriesToUserChatsTask:
         assert comment_2 in user_feed.comments.all()
 
     @pytest.mark.django_db
-    @mock.patch("telegram_feed.requests.SendMessageRequest.send_message")
+    @mock.patch("telegram_feed.requests.SendMessageRequest.send")
     def test_send_alerts_task_send_to_multiple_user_feeds(self, send_message_mock):
-        send_message_mock.return_value = True
+        send_message_mock.return_value = SendMessageResult(ok=True)
 
         user_feed_1 = UserFeedFactory.create(chat_id=1)
         user_feed_2 = UserFeedFactory.create(chat_id=2)
@@ -51,3 +69,114 @@ class TestSendStoriesToUserChatsTask:
 
         assert thread in user_feed_2.threads.all()
         assert comment in user_feed_2.comments.all()
+
+    @pytest.mark.django_db
+    @mock.patch("telegram_feed.tasks.group")
+    def test_send_alerts_task_splits_user_feeds_in_chunks(self, group_mock, settings):
+        settings.SEND_ALERTS_CHUNK_SIZE = 2
+        user_feeds = UserFeedFactory.create_batch(size=5)
+
+        chunks_count = send_alerts_task()
+
+        chunk_tasks = list(group_mock.call_args.args[0])
+        assert chunks_count == 3
+        assert [chunk_task.kwargs["user_feed_ids"] for chunk_task in chunk_tasks] == [
+            [user_feeds[0].pk, user_feeds[1].pk],
+            [user_feeds[2].pk, user_feeds[3].pk],
+            [user_feeds[4].pk],
+        ]
+        group_mock.return_value.apply_async.assert_called_once_with()
+
+
+class TestMatchAlertsTask:
+    @pytest.mark.django_db
+    def test_match_alerts_task(self):
+        user_feed = UserFeedFactory.create(chat_id=1)
+        idle_user_feed = UserFeedFactory.create(chat_id=2)
+        KeywordFactory.create(user_feed=user_feed, name="tomato")
+        KeywordFactory.create(user_feed=idle_user_feed, name="potato")
+
+        thread = ThreadFactory.create(title="thread with tomato keyword")
+        comment = CommentFactory.create(body="comment with tomato keyword")
+        not_pushed_thread = ThreadFactory.create(title="another thread with tomato keyword")
+
+        result = match_alerts_task(thread_ids=[thread.pk], comment_ids=[comment.pk])
+
+        assert result == {
+            "threads": 1,
+            "comments": 1,
+            "user_feeds_matched": 1,
+            "messages_queued": 2,
+            "messages_rendered_from_cache": 0,
+        }
+        assert list(user_feed.threads.all()) == [thread]
+        assert list(user_feed.comments.all()) == [comment]
+        assert not_pushed_thread not in user_feed.threads.all()
+        assert not user_feed.delivery_cursors.exists()
+        assert OutboxMessage.objects.filter(chat_id=1, status=OutboxMessage.PENDING).count() == 2
+
+    @mock.patch("telegram_feed.tasks.match_alerts_task.delay")
+    def test_items_upserted_signal_enqueues_match_alerts_task(self, match_alerts_task_mock):
+        items_upserted.send(sender=ThreadScraper, thread_ids=[1, 2], comment_ids=[3])
+
+        match_alerts_task_mock.assert_called_once_with(thread_ids=[1, 2], comment_ids=[3])
+
+
+class TestSendOutboxMessagesTask:
+    @pytest.mark.django_db
+    @mock.patch("telegram_feed.requests.SendMessageRequest.send")
+    def test_send_outbox_messages_task(self, send_message_mock):
+        send_message_mock.return_value = SendMessageResult(ok=True)
+        OutboxMessageFactory.create_batch(size=3)
+
+        result = send_outbox_messages_task()
+
+        assert result["sent"] == 3
+        assert result["messages_dropped"] == 0
+        assert OutboxMessage.objects.filter(status=OutboxMessage.SENT).count() == 3
+
+
+class TestDeleteSentAlertsTask:
+    @pytest.mark.django_db
+    def test_delete_sent_alerts_task(self):
+        expired_at = timezone.now() - datetime.timedelta(days=2)
+
+        expired_thread = ThreadFactory.create(created=expired_at)
+        recent_thread = ThreadFactory.create()
+        expired_comment = CommentFactory.create(created=expired_at)
+        recent_comment = CommentFactory.create()
+
+        user_feed = UserFeedFactory.create(
+            threads=[expired_thread, recent_thread],
+            comments=[expired_comment, recent_comment],
+            subscription_threads=[expired_thread],
+            subscription_comments=[expired_comment],
+        )
+
+        deleted_counts = delete_sent_alerts_task()
+
+        assert deleted_counts["telegram_feed_userfeed_threads"] == 1
+        assert deleted_counts["telegram_feed_userfeed_comments"] == 1
+        assert deleted_counts["telegram_feed_userfeed_subscription_comments"] == 1
+        assert deleted_counts["telegram_feed_userfeed_reply_comments"] == 0
+        assert list(user_feed.threads.all()) == [recent_thread]
+        assert list(user_feed.comments.all()) == [recent_comment]
+        assert list(user_feed.subscription_threads.all()) == [expired_thread]
+        assert not user_feed.subscription_comments.exists()
+
+    @pytest.mark.django_db
+    def test_delete_sent_alerts_task_deletes_sent_outbox_messages(self):
+        expired_at = timezone.now() - datetime.timedelta(days=2)
+
+        sent_message = OutboxMessageFactory.create(status=OutboxMessage.SENT)
+        pending_message = OutboxMessageFactory.create()
+        OutboxMessage.objects.filter(pk__in=[sent_message.pk, pending_message.pk]).update(modified=expired_at)
+        recent_sent_message = OutboxMessageFactory.create(status=OutboxMessage.SENT)
+
+        deleted_counts = delete_sent_alerts_task()
+
+        assert deleted_counts["telegram_feed_outboxmessage"] == 1
+        assert sorted(OutboxMessage.objects.values_list("pk", flat=True)) == [
+            pending_message.pk,
+            recent_sent_message.pk,
+        ]
@@ -1,4 +1,6 @@
+from collections.abc import Mapping
 from dataclasses import dataclass
+from datetime import datetime
 from typing import TypedDict
 
 from telegram_feed.models import UserFeed
@@ -38,3 +40,79 @@ class FollowedUserData:
 class InlineKeyboardButton(TypedDict):
     text: str
     url: str | None
+
+
+@dataclass(frozen=True)
+class KeywordPattern:
+    """Upper-cased keyword search pattern, searched with LIKE or in full text search vector"""
+
+    text: str
+    full_text: bool = False
+
+
+@dataclass(frozen=True)
+class TelegramMessage:
+    """Message to send with telegram sendMessage method"""
+
+    chat_id: int
+    text: str
+    inline_keyboard_markup: Mapping[str, list[list[InlineKeyboardButton]]] | None = None
+    parse_mode: str | None = None
+    disable_web_page_preview: bool = False
+    # alert type and thread or comment pk of alert messages, with chat id they are idempotency key of outbox
+    alert_type: str | None = None
+    item_id: int | None = None
+    # outbox message isn't sent before this time (end of digest interval)
+    send_after: datetime | None = None
+
+
+@dataclass(frozen=True)
+class RenderedMessage:
+    """Text and inline keyboard of an alert message, shared by messages of the item to all chats"""
+
+    text: str
+    inline_keyboard_markup: Mapping[str, list[list[InlineKeyboardButton]]]
+    parse_mode: str | None = None
+
+    def to_telegram_message(self, chat_id: int, alert_type: str, item_id: int) -> TelegramMessage:
+        return TelegramMessage(
+            chat_id=chat_id,
+            alert_type=alert_type,
+            item_id=item_id,
+            text=self.text,
+            inline_keyboard_markup=self.inline_keyboard_markup,
+            parse_mode=self.parse_mode,
+        )
+
+
+@dataclass(frozen=True)
+class SendMessageResult:
+    """Result of telegram sendMessage method"""
+
+    ok: bool
+    # seconds to wait before the next message to the chat, set by flood control error (429)
+    retry_after: int | None = None
+
+
+@dataclass
+class SenderStats:
+    """Throughput counters of message sender"""
+
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass(frozen=True)
+class TelegramCallLatency:
+    """Latency of one telegram API call, passed to latency hooks of TelegramClient"""
+
+    method: str
+    elapsed: float
+    # None if request failed before a response was received
+    status_code: int | None
@@ -1,4 +1,15 @@
-import re
+# escaped characters of telegram markdown versions and MarkdownV2 entity types
+MARKDOWN_ESCAPE_CHARS = {
+    (1, None): "_*`[",
+    (2, "pre"): "\\`",
+    (2, "code"): "\\`",
+    (2, "text_link"): "\\)",
+    (2, None): "_*[]()~`>#+-=|{}.!",
+}
+MARKDOWN_ESCAPE_TABLES = {
+    key: str.maketrans({char: f"\\{char}" for char in escape_chars})
+    for key, escape_chars in MARKDOWN_ESCAPE_CHARS.items()
+}
 
 
 def escape_markdown(text: str, version: int = 1, entity_type: str | None = None) -> str:
@@ -14,15 +25,13 @@ def escape_markdown(text: str, version: int = 1, entity_type: str | None = None)
             ``version=2``, will be ignored else.
     """
     if version == 1:
-        escape_chars = r"_*`["
+        escape_table = MARKDOWN_ESCAPE_TABLES[(1, None)]
     elif version == 2:
-        if entity_type in {"pre", "code"}:
-            escape_chars = r"\`"
-        elif entity_type == "text_link":
-            escape_chars = r"\)"
+        if entity_type in {"pre", "code", "text_link"}:
+            escape_table = MARKDOWN_ESCAPE_TABLES[(2, entity_type)]
         else:
-            escape_chars = r"_*[]()~`>#+-=|{}.!"
+            escape_table = MARKDOWN_ESCAPE_TABLES[(2, None)]
     else:
         raise ValueError("Markdown version must be either 1 or 2!")
 
-    return re.sub(f"([{re.escape(escape_chars)}])", r"\\\1", text)
+    return text.translate(escape_table)